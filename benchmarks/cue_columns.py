@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+"""
+Compares the cost of bulk edits of the waits of a large cue sheet: with a
+loop over its Cue objects, and with its columns, with and without NumPy.
+
+Usage:
+    PYTHONPATH=$PWD python ./benchmarks/cue_columns.py [number of cues]
+"""
+import sys
+import time
+from openshow import columns
+from openshow import cue
+
+NUM_CUES = 100000
+NUM_REPEATS = 10
+
+
+def edit_cues(cue_sheet):
+    for _cue in cue_sheet.get_cues():
+        _cue.set_pre_wait(_cue.get_pre_wait() * 0.9)
+        _cue.set_post_wait(_cue.get_post_wait() * 0.9)
+        _cue.set_pre_wait(max(0.0, _cue.get_pre_wait() + 2.0))
+
+
+def edit_columns(cols):
+    cols.scale_waits(0.9)
+    cols.shift_pre_waits(2.0)
+
+
+def measure(function, arg):
+    """
+    @return: Milliseconds per call.
+    @rtype: C{float}
+    """
+    started = time.time()
+    for i in range(NUM_REPEATS):
+        function(arg)
+    return (time.time() - started) / NUM_REPEATS * 1000
+
+
+def run(num_cues):
+    cue_sheet = cue.CueSheet()
+    cue_sheet.set_cues([cue.Cue(str(i), 1.0, 2.0) for i in range(num_cues)])
+    cols = columns.from_cue_sheet(cue_sheet)
+    print("Scaling all the waits, then shifting all the pre-waits, of %d "
+            "cues" % (num_cues))
+    print("%-20s %10.2f ms" % ("per cue", measure(edit_cues, cue_sheet)))
+    numpy = columns.numpy
+    columns.numpy = None
+    print("%-20s %10.2f ms" % ("columns", measure(edit_columns, cols)))
+    if numpy is None:
+        print("%-20s %13s" % ("columns, NumPy", "not installed"))
+    else:
+        columns.numpy = numpy
+        print("%-20s %10.2f ms" % ("columns, NumPy",
+                measure(edit_columns, cols)))
+
+
+if __name__ == "__main__":
+    num_cues = NUM_CUES
+    if len(sys.argv) > 1:
+        num_cues = int(sys.argv[1])
+    run(num_cues)
@@ -0,0 +1,46 @@
+#!/usr/bin/env python
+"""
+Reports how many bytes an idle cue takes in a large cue sheet, and how many
+it takes once it has run, with its timers and signals.
+
+Usage:
+    PYTHONPATH=$PWD python ./benchmarks/cue_memory.py [number of cues]
+"""
+import sys
+import time
+from openshow import cue
+from openshow.test import test_cue
+
+NUM_CUES = 100000
+NUM_SAMPLES = 100
+
+
+def run(num_cues):
+    started = time.time()
+    cue_sheet = cue.CueSheet()
+    cue_sheet.set_cues([cue.Cue(str(i), 1.0, 1.0, "title")
+            for i in range(num_cues)])
+    print("Created a %d-cue sheet in %.2f s" % (num_cues,
+            time.time() - started))
+    sample = cue_sheet.get_cues()[::max(1, num_cues // NUM_SAMPLES)]
+    excluded = [cue_sheet, cue_sheet.get_event_bus(), "title", 1.0]
+    idle_size = sum(test_cue._get_deep_size(item, excluded)
+            for item in sample)
+    for item in sample:
+        item.go()
+        item.cancel()
+        for name in ["go", "done_trigger", "done_pre_wait", "done_post_wait",
+                "cancelled", "log"]:
+            getattr(item, "signal_" + name)
+    allocated_size = sum(test_cue._get_deep_size(item, excluded)
+            for item in sample)
+    print("Bytes per idle cue: %.0f, with timers and signals: %.0f" % (
+            float(idle_size) / len(sample),
+            float(allocated_size) / len(sample)))
+
+
+if __name__ == "__main__":
+    num_cues = NUM_CUES
+    if len(sys.argv) > 1:
+        num_cues = int(sys.argv[1])
+    run(num_cues)
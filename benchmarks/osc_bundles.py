@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+"""
+Compares sending the messages of a chain of cues one by one and as bundles:
+how many datagrams leave, and how long the receiver takes to parse them.
+
+Usage:
+    PYTHONPATH=$PWD python ./benchmarks/osc_bundles.py [number of cues]
+"""
+import sys
+import time
+from txosc import osc as txosc
+from openshow.actions import bundles
+from openshow.actions import osc
+
+NUM_CUES = 10
+NUM_REPEATS = 2000
+
+
+def measure_parsing(datagrams):
+    """
+    @return: Microseconds to parse all the datagrams once.
+    @rtype: C{float}
+    """
+    started = time.time()
+    for i in range(NUM_REPEATS):
+        for datagram in datagrams:
+            txosc._elementFromBinary(datagram)
+    return (time.time() - started) / NUM_REPEATS * 1000000
+
+
+def run(num_cues):
+    packets = [osc.create_message_auto("/mapmap/paint/opacity", str(i),
+            "0.5").toBinary() for i in range(num_cues)]
+    bundled = bundles.make_datagrams(packets)
+    print("%d cues without waits, to the same destination" % (num_cues))
+    print("%-12s %10s %10s %14s" % ("", "datagrams", "bytes", "parsing (us)"))
+    for name, datagrams in (("one by one", packets), ("bundled", bundled)):
+        print("%-12s %10d %10d %14.1f" % (name, len(datagrams),
+                sum(len(datagram) for datagram in datagrams),
+                measure_parsing(datagrams)))
+
+
+if __name__ == "__main__":
+    num_cues = NUM_CUES
+    if len(sys.argv) > 1:
+        num_cues = int(sys.argv[1])
+    run(num_cues)
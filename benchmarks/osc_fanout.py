@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+"""
+Compares the cost of executing an OSC action for more and more receivers:
+with a list of destinations, and with a multicast group.
+
+Usage:
+    PYTHONPATH=$PWD python ./benchmarks/osc_fanout.py [number of repeats]
+"""
+import sys
+import time
+from openshow.actions import osc
+from openshow.actions import udp
+
+NUM_REPEATS = 2000
+NUM_RECEIVERS = (1, 10, 40, 100)
+GROUP = "239.255.0.1"
+FIRST_PORT = 40000 # nobody listens there
+
+
+_errors = []
+
+
+def measure(action, num_repeats):
+    """
+    @return: Microseconds per execution.
+    @rtype: C{float}
+    """
+    action.prepare()
+    started = time.time()
+    for i in range(num_repeats):
+        # The kernel refuses what does not fit in its queues anymore:
+        action.execute().addErrback(_errors.append)
+    return (time.time() - started) / num_repeats * 1000000
+
+
+def run(num_repeats):
+    multicast = osc.OscAction(GROUP, FIRST_PORT, "/mapmap/play")
+    print("%10s %16s %16s" % ("receivers", "list (us)", "multicast (us)"))
+    for num_receivers in NUM_RECEIVERS:
+        destinations = ", ".join(["127.0.0.1:%d" % (FIRST_PORT + i)
+                for i in range(num_receivers)])
+        action = osc.OscAction(path="/mapmap/play", destinations=destinations)
+        print("%10d %16.1f %16.1f" % (num_receivers,
+                measure(action, num_repeats), measure(multicast, num_repeats)))
+    print("%d sockets open, %d executions dropped by the kernel" % (
+            udp.get_pool().get_socket_count(), len(_errors)))
+    udp.close_pool()
+
+
+if __name__ == "__main__":
+    num_repeats = NUM_REPEATS
+    if len(sys.argv) > 1:
+        num_repeats = int(sys.argv[1])
+    run(num_repeats)
@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+"""
+Measures how long it takes to fire an OSC action, when its message is encoded
+each time, and when it was prepared once. Nothing is sent.
+
+Usage:
+    PYTHONPATH=$PWD python ./benchmarks/osc_messages.py [number of fires]
+"""
+import sys
+import time
+from twisted.internet import defer
+from openshow.actions import osc
+
+NUM_FIRES = 100000
+PATH = "/mapmap/paint/opacity"
+ARGS = ["1", "0.75", "fade", "2"]
+
+
+def _send_udp_packet(packet, port, host):
+    return defer.succeed(None)
+
+
+def measure(function, num_fires):
+    """
+    @return: Microseconds per call.
+    @rtype: C{float}
+    """
+    started = time.time()
+    for i in range(num_fires):
+        function()
+    return (time.time() - started) / num_fires * 1000000
+
+
+def run(num_fires):
+    # Only the cost of getting the bytes to send is measured:
+    osc.send_udp_packet = _send_udp_packet
+    action = osc.OscAction("127.0.0.1", 12345, PATH, ARGS)
+    action.prepare()
+
+    def _encode_each_time():
+        osc.send_async_udp(osc.create_message_auto(PATH, *ARGS), 12345,
+                "127.0.0.1")
+
+    print("%d fires of %s %s" % (num_fires, PATH, " ".join(ARGS)))
+    print("%-20s %10s" % ("", "us/fire"))
+    print("%-20s %10.3f" % ("encoded each time",
+            measure(_encode_each_time, num_fires)))
+    print("%-20s %10.3f" % ("prepared", measure(action.execute, num_fires)))
+
+
+if __name__ == "__main__":
+    num_fires = NUM_FIRES
+    if len(sys.argv) > 1:
+        num_fires = int(sys.argv[1])
+    run(num_fires)
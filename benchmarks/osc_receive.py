@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+"""
+Load test of the OSC server: how many messages per second it handles.
+
+Without arguments, measures the time to decode and dispatch a message, then
+starts a server and a client in another process, which sends messages over
+UDP at a given rate, and tells how many the server received. Among the
+registered addresses are those of a thousand paint layers, as in a big
+project.
+
+With "send", it is only the client, to load an instance of openshow that is
+running, with its -p option.
+
+Usage:
+    PYTHONPATH=$PWD python ./benchmarks/osc_receive.py [rate] [seconds]
+    PYTHONPATH=$PWD python ./benchmarks/osc_receive.py send host port [rate] [seconds]
+"""
+import socket
+import subprocess
+import sys
+import time
+from txosc import osc as txosc
+
+RATE = 20000 # messages per second
+SECONDS = 5.0
+NUM_ADDRESSES = 1000
+NUM_REPEATS = 100000
+
+
+def _create_messages():
+    return [txosc.Message("/openshow/select", 12).toBinary(),
+            txosc.Message("/mapmap/paint/%d/opacity" % (NUM_ADDRESSES // 2),
+            0.5).toBinary(),
+            txosc.Message("/mapmap/paint/1?/opacity", 0.5).toBinary(),
+            txosc.Message("/openshow/stop").toBinary()]
+
+
+def send(host, port, rate, seconds):
+    """
+    Sends messages at a given rate, in small bursts.
+    @return: How many were sent.
+    """
+    messages = _create_messages()
+    sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    destination = (host, port)
+    count = 0
+    started = time.time()
+    while True:
+        elapsed = time.time() - started
+        if elapsed >= seconds:
+            break
+        due = int(elapsed * rate)
+        while count < due:
+            sender.sendto(messages[count % len(messages)], destination)
+            count += 1
+        time.sleep(0.001)
+    sender.close()
+    print("Sent %d messages in %.2f s (%.0f/s)" % (count, elapsed,
+            count / elapsed))
+    return count
+
+
+def _create_server():
+    from openshow import remote
+    server = remote.OscServer()
+    counter = [0]
+
+    def _count(address, args):
+        counter[0] += 1
+
+    for address in (remote.ADDRESS_GO, remote.ADDRESS_STOP,
+            remote.ADDRESS_SELECT):
+        server.add_handler(address, _count)
+    for i in range(NUM_ADDRESSES):
+        server.add_handler("/mapmap/paint/%d/opacity" % (i), _count)
+    return server, counter
+
+
+def measure_dispatch():
+    server, counter = _create_server()
+    messages = _create_messages()
+    started = time.time()
+    for i in range(NUM_REPEATS):
+        server.handle_packet(messages[i % len(messages)])
+    duration = time.time() - started
+    print("Decoding and dispatching: %.1f us per message (%.0f/s), %d "
+            "handlers called" % (duration / NUM_REPEATS * 1000000,
+            NUM_REPEATS / duration, counter[0]))
+
+
+def run(rate, seconds):
+    from twisted.internet import reactor
+    measure_dispatch()
+    server, counter = _create_server()
+    port = server.listen_udp(0, "127.0.0.1").getHost().port
+    client = subprocess.Popen([sys.executable, __file__, "send", "127.0.0.1",
+            str(port), str(rate), str(seconds)])
+
+    def _check():
+        if client.poll() is None:
+            reactor.callLater(0.1, _check)
+        else:
+            # What is still in the socket buffer:
+            reactor.callLater(0.5, reactor.stop)
+
+    reactor.callLater(0.1, _check)
+    reactor.run()
+    print("Received %d messages (%.0f/s), %d invalid" % (
+            server.get_message_count(),
+            server.get_message_count() / seconds, server.get_error_count()))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "send":
+        rate = RATE
+        seconds = SECONDS
+        if len(sys.argv) > 4:
+            rate = int(sys.argv[4])
+        if len(sys.argv) > 5:
+            seconds = float(sys.argv[5])
+        send(sys.argv[2], int(sys.argv[3]), rate, seconds)
+    else:
+        rate = RATE
+        seconds = SECONDS
+        if len(sys.argv) > 1:
+            rate = int(sys.argv[1])
+        if len(sys.argv) > 2:
+            seconds = float(sys.argv[2])
+        run(rate, seconds)
@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+"""
+Measures how late the sequencer calls what is scheduled, with and without its
+precision mode.
+
+Usage:
+    PYTHONPATH=$PWD python ./benchmarks/precision.py [number of calls]
+"""
+import sys
+import time
+from twisted.internet import defer
+from twisted.internet import reactor
+from openshow import timer
+
+NUM_CALLS = 500
+INTERVAL = 0.01 # seconds
+SPIN_BUDGETS = [0.0, 0.001, 0.002, 0.005]
+
+
+def _percentile(values, ratio):
+    return values[min(len(values) - 1, int(len(values) * ratio))]
+
+
+def measure(spin_budget, num_calls):
+    """
+    Schedules calls one after the other, and returns how late each of them
+    was called.
+    @rtype: L{twisted.internet.defer.Deferred}
+    """
+    timer.set_spin_budget(spin_budget)
+    deferred = defer.Deferred()
+    errors = []
+    first = timer.get_clock().seconds() + INTERVAL
+
+    def _cb(index):
+        planned = first + index * INTERVAL
+        errors.append(timer.get_clock().seconds() - planned)
+        if index + 1 < num_calls:
+            timer.call_at(planned + INTERVAL, _cb, index + 1)
+        else:
+            deferred.callback(errors)
+
+    timer.call_at(first, _cb, 0)
+    return deferred
+
+
+@defer.inlineCallbacks
+def run(num_calls):
+    print("%d calls, %.0f ms apart" % (num_calls, INTERVAL * 1000))
+    print("%10s %10s %10s %10s %10s" % ("spin (ms)", "p50 (ms)", "p99 (ms)",
+            "max (ms)", "CPU (%)"))
+    for spin_budget in SPIN_BUDGETS:
+        spin_time = timer.get_sequencer().get_spin_time()
+        errors = yield measure(spin_budget, num_calls)
+        spin_time = timer.get_sequencer().get_spin_time() - spin_time
+        errors.sort()
+        print("%10.1f %10.3f %10.3f %10.3f %10.1f" % (spin_budget * 1000,
+                _percentile(errors, 0.5) * 1000,
+                _percentile(errors, 0.99) * 1000, errors[-1] * 1000,
+                spin_time / (num_calls * INTERVAL) * 100))
+    timer.set_spin_budget(0.0)
+    reactor.stop()
+
+
+if __name__ == "__main__":
+    num_calls = NUM_CALLS
+    if len(sys.argv) > 1:
+        num_calls = int(sys.argv[1])
+    reactor.callWhenRunning(run, num_calls)
+    reactor.run()
@@ -0,0 +1,40 @@
+#!/usr/bin/env python
+"""
+Reports how long it takes to record an event in the trace of a cue sheet,
+and how long it takes to read the clock, which the cues do anyway.
+
+Usage:
+    PYTHONPATH=$PWD python ./benchmarks/trace_overhead.py [number of events]
+"""
+import sys
+import time
+from openshow import cue
+from openshow import events
+from openshow import timer
+from openshow import trace
+
+NUM_EVENTS = 1000000
+
+
+def run(num_events):
+    event_trace = trace.EventTrace()
+    cue_item = cue.Cue("1")
+    clock = timer.get_clock()
+    record = event_trace.record
+    started = time.time()
+    for i in range(num_events):
+        record(events.EVENT_DONE_PRE_WAIT, cue_item, 0.0, 0.0)
+    recorded = time.time() - started
+    started = time.time()
+    for i in range(num_events):
+        clock.seconds()
+    read = time.time() - started
+    print("Recording an event takes %.3f us, reading the clock %.3f us" % (
+            recorded / num_events * 1e6, read / num_events * 1e6))
+
+
+if __name__ == "__main__":
+    num_events = NUM_EVENTS
+    if len(sys.argv) > 1:
+        num_events = int(sys.argv[1])
+    run(num_events)
@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+"""
+Sends many OSC messages through the UDP sender pool, and checks that the
+number of open file descriptors stays the same.
+
+Usage:
+    PYTHONPATH=$PWD python ./benchmarks/udp_pool.py [number of messages]
+"""
+import os
+import socket
+import sys
+import time
+from openshow.actions import osc
+from openshow.actions import udp
+
+NUM_MESSAGES = 1000000
+NUM_DESTINATIONS = 4
+FD_DIRECTORY = "/proc/self/fd"
+
+
+def _get_fd_count():
+    if not os.path.isdir(FD_DIRECTORY):
+        return -1
+    return len(os.listdir(FD_DIRECTORY))
+
+
+def run(num_messages):
+    # Nobody reads them: the kernel drops what does not fit in their buffers.
+    receivers = []
+    for i in range(NUM_DESTINATIONS):
+        receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        receiver.bind(("127.0.0.1", 0))
+        receivers.append(receiver)
+    ports = [receiver.getsockname()[1] for receiver in receivers]
+    packet = osc.create_message_auto("/mapmap/paint/opacity", "0.5"
+            ).toBinary()
+    pool = udp.get_pool()
+    for port in ports:
+        pool.send(packet, "127.0.0.1", port)
+    fd_count = _get_fd_count()
+    print("%d messages to %d destinations" % (num_messages, len(ports)))
+    print("%12s %12s %12s" % ("sent", "open FDs", "us/message"))
+    started = time.time()
+    report_every = max(1, num_messages // 10)
+    for i in range(1, num_messages + 1):
+        pool.send(packet, "127.0.0.1", ports[i % len(ports)])
+        if i % report_every == 0:
+            print("%12d %12d %12.3f" % (i, _get_fd_count(),
+                    (time.time() - started) / i * 1000000))
+    if _get_fd_count() != fd_count:
+        print("Error: the number of open FDs went from %d to %d" % (fd_count,
+                _get_fd_count()))
+        return 1
+    udp.close_pool()
+    for receiver in receivers:
+        receiver.close()
+    return 0
+
+
+if __name__ == "__main__":
+    num_messages = NUM_MESSAGES
+    if len(sys.argv) > 1:
+        num_messages = int(sys.argv[1])
+    sys.exit(run(num_messages))
@@ -0,0 +1,215 @@
+#!/usr/bin/env python
+# -*- coding: utf-8; tab-width: 4; mode: python -*-
+"""
+The BundlingSender class.
+
+When a chain of cues without waits fires, their actions all send in the same
+turn of the reactor, often to the same receiver. Instead of sending each
+message right away, the sender keeps them until the end of the turn, and
+sends the messages to each destination as one OSC bundle, which the receiver
+handles at once. Bundles that would not fit in one datagram are split.
+
+When the messages are sent by the calls of a wake-up of the sequencer, the
+end of the turn is the end of that wake-up: they are sent right after, not
+in a later turn of the reactor, which would make them late.
+
+Usage:
+    sender = bundles.get_sender()
+    sender.send(packet_1, "127.0.0.1", 12345)
+    sender.send(packet_2, "127.0.0.1", 12345) # in the same bundle
+"""
+import struct
+from twisted.python import log
+from openshow import timer
+from openshow.actions import udp
+
+# Largest UDP payload that fits in an Ethernet frame without fragmentation:
+# 1500 bytes, minus 20 for the IPv4 header and 8 for the UDP header.
+MAX_DATAGRAM_SIZE = 1472
+BUNDLE_TAG = b"#bundle\0"
+TIMETAG_IMMEDIATELY = 1 # the special OSC time tag
+NTP_EPOCH_OFFSET = 2208988800 # seconds from 1900 to 1970
+_BUNDLE_HEADER = struct.Struct(">8sQ")
+_SIZE = struct.Struct(">i")
+BUNDLE_HEADER_SIZE = _BUNDLE_HEADER.size
+ELEMENT_HEADER_SIZE = _SIZE.size
+
+
+def get_timetag(wall_time):
+    """
+    Returns the OSC time tag of a time of day.
+    @param wall_time: As returned by C{time.time()}.
+    @type wall_time: C{float}
+    @return: NTP time, in 1/2**32 seconds.
+    @rtype: C{int}
+    """
+    return int(round((wall_time + NTP_EPOCH_OFFSET) * 4294967296.0))
+
+
+def encode_bundle(packets, timetag=TIMETAG_IMMEDIATELY):
+    """
+    Encodes an OSC bundle of encoded messages or bundles.
+    @param packets: List of C{bytes}.
+    @type packets: C{list}
+    @param timetag: NTP time, in 1/2**32 seconds.
+    @type timetag: C{int}
+    @rtype: C{bytes}
+    """
+    parts = [_BUNDLE_HEADER.pack(BUNDLE_TAG, timetag)]
+    for packet in packets:
+        parts.append(_SIZE.pack(len(packet)))
+        parts.append(packet)
+    return b"".join(parts)
+
+
+def make_datagrams(packets, max_size=MAX_DATAGRAM_SIZE,
+        timetag=TIMETAG_IMMEDIATELY):
+    """
+    Groups encoded messages in as few bundles as possible, in the same order,
+    each no bigger than a maximum size. A message that is alone in its group,
+    with the immediate time tag, is not put in a bundle.
+    @param packets: List of C{bytes}.
+    @type packets: C{list}
+    @rtype: C{list}
+    """
+    ret = []
+    group = []
+    size = BUNDLE_HEADER_SIZE
+
+    def _add_group():
+        if len(group) == 1 and timetag == TIMETAG_IMMEDIATELY:
+            ret.append(group[0])
+        else:
+            ret.append(encode_bundle(group, timetag))
+
+    for packet in packets:
+        packet_size = ELEMENT_HEADER_SIZE + len(packet)
+        if len(group) > 0 and size + packet_size > max_size:
+            _add_group()
+            group = []
+            size = BUNDLE_HEADER_SIZE
+        group.append(packet)
+        size += packet_size
+    if len(group) > 0:
+        _add_group()
+    return ret
+
+
+class BundlingSender(object):
+    """
+    Sends the messages for the same destination in the same turn of the
+    reactor as bundles.
+    """
+    def __init__(self, pool=None, max_size=MAX_DATAGRAM_SIZE, reactor=None,
+            sequencer=None):
+        """
+        @param pool: Sends the datagrams. The one of L{udp.get_pool} if None.
+        @type pool: L{udp.UdpSenderPool}
+        @param max_size: Maximum size of a datagram, in bytes.
+        @type max_size: C{int}
+        @param reactor: Tells when the turn ends. The global one if None.
+        @param sequencer: Sends at the end of its wake-ups what they sent.
+        The one of L{timer.get_sequencer} if None.
+        @type sequencer: L{openshow.sequencer.Sequencer}
+        """
+        if reactor is None:
+            from twisted.internet import reactor
+        self._reactor = reactor
+        self._sequencer = sequencer
+        self._pool = pool
+        self._max_size = max_size
+        self._pending = {} # (host, port) -> list of packets
+        self._destinations = [] # in the order of their first packet
+        self._flush_call = None
+        self._is_flush_planned = False # at the end of a wake-up
+        self._message_count = 0
+        self._datagram_count = 0
+
+    def send(self, packet, host, port):
+        """
+        Sends a message at the end of the turn of the reactor, or of the
+        wake-up of the sequencer.
+        @type packet: C{bytes}
+        @param host: IP address, not a host name.
+        @type host: C{str}
+        @type port: C{int}
+        """
+        destination = (host, port)
+        packets = self._pending.get(destination)
+        if packets is None:
+            packets = []
+            self._pending[destination] = packets
+            self._destinations.append(destination)
+        packets.append(packet)
+        self._message_count += 1
+        if self._flush_call is None and not self._is_flush_planned:
+            sequencer = self._sequencer
+            if sequencer is None:
+                sequencer = timer.get_sequencer()
+            if sequencer.is_waking_up():
+                sequencer.call_after_wake_up(self.flush)
+                self._is_flush_planned = True
+            else:
+                self._flush_call = self._reactor.callLater(0, self.flush)
+
+    def flush(self):
+        """
+        Sends what is pending right away.
+        """
+        if self._flush_call is not None:
+            if self._flush_call.active():
+                self._flush_call.cancel()
+            self._flush_call = None
+        self._is_flush_planned = False
+        pending = self._pending
+        destinations = self._destinations
+        self._pending = {}
+        self._destinations = []
+        pool = self._pool
+        if pool is None:
+            pool = udp.get_pool()
+        for destination in destinations:
+            host, port = destination
+            for datagram in make_datagrams(pending[destination],
+                    self._max_size):
+                try:
+                    pool.send(datagram, host, port)
+                except:
+                    log.err(None, "Could not send to %s:%s" % (host, port))
+                self._datagram_count += 1
+
+    def get_message_count(self):
+        """
+        Returns how many messages were sent so far.
+        @rtype: C{int}
+        """
+        return self._message_count
+
+    def get_datagram_count(self):
+        """
+        Returns how many datagrams they were sent in.
+        @rtype: C{int}
+        """
+        return self._datagram_count
+
+
+_sender = None # created when first needed
+
+
+def get_sender():
+    """
+    Returns the sender that the actions send with.
+    @rtype: L{BundlingSender}
+    """
+    global _sender
+    if _sender is None:
+        _sender = BundlingSender()
+    return _sender
+
+
+def flush_sender():
+    """
+    Sends what the sender of the actions has pending, if anything.
+    """
+    if _sender is not None:
+        _sender.flush()
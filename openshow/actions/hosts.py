@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+# -*- coding: utf-8; tab-width: 4; mode: python -*-
+"""
+The HostCache class.
+
+It keeps the addresses of the hosts that the actions send to, so that
+executing an action never waits for a name to be resolved. The names are
+resolved when the actions are prepared, with the resolver of the reactor,
+which does not block it. An address is kept for a while - its time to live -
+after which it is still used, but resolved again in the background.
+
+Usage:
+    cache = hosts.get_cache()
+    cache.prepare("localhost") # when loading the project
+    ...
+    address = cache.get_address("localhost") # None if not resolved yet
+"""
+from twisted.internet import abstract
+from twisted.internet import defer
+from twisted.python import log
+
+DEFAULT_TTL = 300.0 # seconds
+
+
+def is_address(host):
+    """
+    Tells if a host is an IPv4 or IPv6 address, rather than a name.
+    @rtype: C{bool}
+    """
+    return abstract.isIPAddress(host) or abstract.isIPv6Address(host)
+
+
+class HostCache(object):
+    """
+    Addresses of host names, resolved without blocking.
+    """
+    def __init__(self, ttl=DEFAULT_TTL, reactor=None):
+        """
+        @param ttl: How many seconds an address is used before being resolved
+        again.
+        @type ttl: C{float}
+        @param reactor: Resolves the names and tells the time. The global one
+        if None.
+        @type reactor: L{twisted.internet.interfaces.IReactorCore}
+        """
+        if reactor is None:
+            from twisted.internet import reactor
+        self._reactor = reactor
+        self._ttl = ttl
+        self._addresses = {} # host name -> (address, time when it expires)
+        self._lookups = {} # host name -> list of Deferreds waiting for it
+
+    def get_ttl(self):
+        """
+        @rtype: C{float}
+        """
+        return self._ttl
+
+    def prepare(self, host):
+        """
+        Starts resolving a host name, unless its address is known.
+        @type host: C{str}
+        """
+        if not is_address(host) and host not in self._addresses:
+            self._lookup(host)
+
+    def get_address(self, host):
+        """
+        Returns the address of a host right away. If it has expired, it is
+        resolved again in the background.
+        @type host: C{str}
+        @return: The address, or None if it was never resolved.
+        @rtype: C{str}
+        """
+        if is_address(host):
+            return host
+        entry = self._addresses.get(host)
+        if entry is None:
+            self._lookup(host)
+            entry = self._addresses.get(host) # if resolved right away
+            if entry is None:
+                return None
+        address, expires = entry
+        if self._reactor.seconds() >= expires:
+            self._lookup(host)
+        return address
+
+    def resolve(self, host):
+        """
+        Returns the address of a host, once it is resolved if it was never.
+        @type host: C{str}
+        @rtype: L{twisted.internet.defer.Deferred}
+        """
+        address = self.get_address(host)
+        if address is not None:
+            return defer.succeed(address)
+        if host not in self._lookups: # failed right away
+            return defer.fail(RuntimeError("Could not resolve %s" % (host)))
+        d = defer.Deferred()
+        self._lookups[host].append(d)
+        return d
+
+    def _lookup(self, host):
+        if host in self._lookups:
+            return # already being resolved
+        self._lookups[host] = []
+        d = self._reactor.resolve(host)
+        d.addCallbacks(self._resolved_cb, self._failed_cb,
+                callbackArgs=(host,), errbackArgs=(host,))
+
+    def _resolved_cb(self, address, host):
+        self._addresses[host] = (address, self._reactor.seconds() + self._ttl)
+        for d in self._lookups.pop(host):
+            d.callback(address)
+
+    def _failed_cb(self, failure, host):
+        waiting = self._lookups.pop(host)
+        if host in self._addresses:
+            # Keeps the address it had, until the next attempt.
+            log.msg("Could not resolve %s again: %s" % (host,
+                    failure.getErrorMessage()))
+            address = self._addresses[host][0]
+            self._addresses[host] = (address,
+                    self._reactor.seconds() + self._ttl)
+            for d in waiting:
+                d.callback(address)
+        else:
+            log.msg("Could not resolve %s: %s" % (host,
+                    failure.getErrorMessage()))
+            for d in waiting:
+                d.errback(failure)
+
+    def clear(self):
+        """
+        Forgets all the addresses.
+        """
+        self._addresses.clear()
+
+
+_cache = None # created when first needed
+
+
+def get_cache():
+    """
+    Returns the cache that the actions resolve their hosts with.
+    @rtype: L{HostCache}
+    """
+    global _cache
+    if _cache is None:
+        _cache = HostCache()
+    return _cache
@@ -2,12 +2,205 @@
 # -*- coding: utf-8; tab-width: 4; mode: python -*-
 """
 OscAction
+
+An OSC action never changes between two executions: its message is encoded
+once, when it is prepared, and each execution only sends the same bytes. Its
+host name is resolved when it is prepared, too. See L{hosts}.
+
+It sends over UDP by default, or over a TCP connection that stays open, with
+its "transport" attribute set to "tcp". See L{tcp}.
+
+Over UDP, its host can be a multicast group, and its "destinations"
+attribute a list of hosts, such as "10.0.0.1, 10.0.0.2:7000", instead of
+its host and port. The same bytes are then sent to each, without bundling,
+from the sockets that L{udp} keeps for that.
 """
 from openshow import cue
+from openshow import timer
+from openshow.actions import bundles
+from openshow.actions import hosts
+from openshow.actions import tcp
+from openshow.actions import udp
 from twisted.internet import defer
-from twisted.internet import reactor
+from twisted.python import log
 from txosc import osc
-from txosc import async
+
+
+try:
+    _string_types = (str, unicode) # Python 2
+except NameError:
+    _string_types = (str,)
+
+TRANSPORT_UDP = "udp"
+TRANSPORT_TCP = "tcp"
+TRANSPORTS = (TRANSPORT_UDP, TRANSPORT_TCP)
+
+_is_bundling = True # see set_bundling
+
+
+def set_bundling(enabled):
+    """
+    Sets whether the messages that leave in the same turn of the reactor for
+    the same destination are sent together, as an OSC bundle. See
+    L{bundles}. On by default; turn it off for receivers that do not
+    understand bundles.
+    @type enabled: C{bool}
+    """
+    global _is_bundling
+    if not enabled:
+        bundles.flush_sender()
+    _is_bundling = enabled
+
+
+def _send_udp_to_address(packet, address, port):
+    if _is_bundling:
+        bundles.get_sender().send(packet, address, port)
+    else:
+        udp.get_pool().send(packet, address, port)
+
+
+def _send_to_host(send, packet, port, host):
+    """
+    Calls a function that sends a packet to an address, once the host name
+    is resolved, right away if it ever was.
+    """
+    address = hosts.get_cache().get_address(host)
+    if address is not None:
+        send(packet, address, port)
+        return defer.succeed(None) # FIXME: there is no way to actually wait for when done
+    d = hosts.get_cache().resolve(host)
+    d.addCallback(lambda address: send(packet, address, port))
+    return d
+
+
+def _split_destinations(destinations):
+    """
+    Sorts destinations in multicast groups, addresses and host names, once
+    and for all.
+    @rtype: C{tuple}
+    """
+    groups = []
+    addresses = []
+    names = []
+    for destination in destinations:
+        host = destination[0]
+        if udp.is_multicast(host):
+            groups.append(destination)
+        elif hosts.is_address(host):
+            addresses.append(destination)
+        else:
+            names.append(destination)
+    return groups, addresses, names
+
+
+def _send_fanout(packet, groups, addresses, names, ttl, loopback):
+    pool = udp.get_pool()
+    for group, port in groups:
+        pool.send_multicast(packet, group, port, ttl, loopback)
+    waiting = []
+    if names:
+        cache = hosts.get_cache()
+        addresses = list(addresses)
+        for host, port in names:
+            address = cache.get_address(host)
+            if address is not None:
+                addresses.append((address, port))
+            else:
+                d = cache.resolve(host)
+                d.addCallback(lambda address, port: udp.get_pool().send_many(
+                        packet, [(address, port)]), port)
+                waiting.append(d)
+    if addresses:
+        pool.send_many(packet, addresses)
+    if not waiting:
+        return defer.succeed(None)
+    return defer.gatherResults(waiting)
+
+
+def send_udp_fanout(packet, destinations, ttl=udp.DEFAULT_MULTICAST_TTL,
+        loopback=True):
+    """
+    Sends an encoded OSC message or bundle to many receivers at once, right
+    away: to each multicast group, and to each other destination, as soon
+    as its host name is resolved.
+
+    @param packet: The encoded message.
+    @type packet: C{bytes}
+    @param destinations: List of (host, port). Hosts can be names,
+    addresses or multicast groups.
+    @type destinations: C{list}
+    @param ttl: Time to live of the multicast datagrams.
+    @type ttl: C{int}
+    @param loopback: Whether the receivers on this host get the multicast
+    datagrams too.
+    @type loopback: C{bool}
+    """
+    groups, addresses, names = _split_destinations(destinations)
+    return _send_fanout(packet, groups, addresses, names, ttl, loopback)
+
+
+def parse_destinations(value, default_port):
+    """
+    Parses a list of destinations, separated by commas or spaces.
+    @param value: Such as "10.0.0.1, lighting:7000".
+    @type value: C{str}
+    @param default_port: Port of the hosts given without one.
+    @type default_port: C{int}
+    @return: List of (host, port).
+    @rtype: C{list}
+    @raise: L{RuntimeError} if a port is not a number.
+    """
+    destinations = []
+    for item in value.replace(",", " ").split():
+        host = item
+        port = default_port
+        if item.count(":") == 1: # not an IPv6 address
+            host, port = item.split(":")
+            try:
+                port = int(port)
+            except ValueError:
+                raise RuntimeError("Invalid OSC port in %s" % (item))
+        destinations.append((host, port))
+    return destinations
+
+
+def _parse_bool(value):
+    if isinstance(value, bool):
+        return value
+    return str(value).lower() in ("true", "yes", "on", "1")
+
+
+def send_udp_packet(packet, port, host):
+    """
+    Sends an encoded OSC message or bundle using UDP. Sends it right away,
+    or at the end of the turn of the reactor if bundling, unless the host
+    name was never resolved.
+
+    @param packet: The encoded message.
+    @type packet: C{bytes}
+    @type port: C{int}
+    @param host: Host name or address.
+    @type host: C{str}
+    """
+    return _send_to_host(_send_udp_to_address, packet, port, host)
+
+
+def send_tcp_packet(packet, port, host, framing=tcp.FRAMING_SLIP):
+    """
+    Sends an encoded OSC message or bundle over the TCP connection to its
+    destination, which is opened if needed. See L{tcp}.
+
+    @param packet: The encoded message.
+    @type packet: C{bytes}
+    @type port: C{int}
+    @param host: Host name or address.
+    @type host: C{str}
+    @param framing: One of the FRAMING_* constants of L{tcp}.
+    """
+    def _send(packet, address, port):
+        tcp.get_pool().send(packet, address, port, framing)
+
+    return _send_to_host(_send, packet, port, host)
 
 
 def send_async_udp(message, port, host):
@@ -20,47 +213,32 @@ def send_async_udp(message, port, host):
     @type host: C{str}
     """
     # TODO: support explicit type tags
-    client = async.DatagramClientProtocol()
-    _client_port = reactor.listenUDP(0, client)
-    client.send(message, (host, port))
-    defer.succeed(None) # FIXME: there is no way to actually wait for when done
+    return send_udp_packet(message.toBinary(), port, host)
+
 
 def send_async_tcp(message, port, host):
     """
-    Is this working at all?
-    """
-    client = async.ClientFactory()
-    _client_port = None
-    d = defer.Deferred()
-
-    def _callback(result):
-        # print("Connected.")
-        client.send(message)
-        # print("Sent %s to %s:%d" % (message, host, port))
-        reactor.callLater(0.001, d.callback(None))
+    Sends a message using TCP, with the framing of OSC 1.0, like the TCP
+    clients of txosc.
 
-    def _errback(reason):
-        # print("An error occurred: %s" % (reason.getErrorMessage()))
-        pass
-        reactor.callLater(0.001, d.callback(None))
-
-    _client_port = reactor.connectTCP(host, port, client)
-    client.deferred.addCallback(_callback)
-    client.deferred.addErrback(_errback)
-    return d
+    @param message: OSC message
+    @type message: L{txosc.osc.Message}
+    @type port: C{int}
+    @type host: C{str}
+    """
+    return send_tcp_packet(message.toBinary(), port, host,
+            tcp.FRAMING_LENGTH)
 
 
 def create_message_auto(path, *args):
     """
     Trying to guess the type tags.
+    @raise: L{RuntimeError} if an argument cannot be sent.
     """
     message = osc.Message(path)
     for arg in args:
-        if type(arg) == int:
-            value = arg
-        elif type(arg) == float:
-            value = arg
-        elif type(arg) == str:
+        value = arg
+        if isinstance(arg, _string_types):
             # TODO: check for quotes
             try:
                 value = int(arg)
@@ -68,8 +246,13 @@ def create_message_auto(path, *args):
                 try:
                     value = float(arg)
                 except ValueError:
-                    value = str(arg)
-        message.add(value)
+                    if not isinstance(arg, str):
+                        value = arg.encode("utf-8") # unicode in Python 2
+        try:
+            message.add(value)
+        except osc.OscError:
+            raise RuntimeError("Cannot send %r in an OSC message to %s" % (
+                    arg, path))
     return message
 
 
@@ -79,13 +262,43 @@ class OscAction(cue.Action):
     """
     OpenSoundControl action.
     """
-    def __init__(self, host="localhost", port=31337, path="/default", args=[]):
+    def __init__(self, host="localhost", port=31337, path="/default", args=[],
+            cancel_path="", cancel_args=[], transport=TRANSPORT_UDP,
+            framing=tcp.FRAMING_SLIP, destinations="",
+            multicast_ttl=udp.DEFAULT_MULTICAST_TTL, multicast_loopback=True):
+        """
+        @param cancel_path: Path of the message that undoes this one, if it
+        was sent ahead and its cue is cancelled. None if empty.
+        See L{openshow.lookahead}.
+        @param transport: One of the TRANSPORT_* constants.
+        @param framing: With TCP, one of the FRAMING_* constants of L{tcp}.
+        @param destinations: Hosts to send to instead of the host, separated
+        by commas, each with its port or with the port of the action. See
+        L{parse_destinations}.
+        @param multicast_ttl: How many routers the datagrams sent to a
+        multicast group can go through.
+        @param multicast_loopback: Whether the receivers on this host get the
+        datagrams sent to a multicast group too.
+        """
         super(OscAction, self).__init__()
+        self._packet = None # encoded message, once prepared
+        self._cancel_packet = None # encoded cancel message, if any
+        self._destination = None # (host, port), once prepared
+        self._framing = None # with TCP, once prepared
+        self._fanout = None # (groups, addresses, names, ttl, loopback), if any
+        self._ahead_timetag = None # of the message sent ahead, if any
         # Attributes:
         self._add_attribute("host", host)
         self._add_attribute("port", port)
         self._add_attribute("path", path)
         self._add_attribute("args", args)
+        self._add_attribute("cancel_path", cancel_path)
+        self._add_attribute("cancel_args", cancel_args)
+        self._add_attribute("transport", transport)
+        self._add_attribute("framing", framing)
+        self._add_attribute("destinations", destinations)
+        self._add_attribute("multicast_ttl", multicast_ttl)
+        self._add_attribute("multicast_loopback", multicast_loopback)
 
     def __str__(self):
         return "%s(%s %s %s %s)" % (self.__class__.__name__,
@@ -117,20 +330,133 @@ class OscAction(cue.Action):
             value = [value]
         self.set_attribute("args", value)
 
+    # Override
+    def set_attribute(self, name, value):
+        super(OscAction, self).set_attribute(name, value)
+        self._packet = None # to prepare again
+
     # Override
     def get_type(self):
         return "osc"
 
-    @defer.inlineCallbacks
-    def execute(self):
+    # Override
+    def prepare(self):
         """
-        @rtype: L{twisted.internet.defer.Deferred}
+        Encodes the message, checks the port and the transport, and starts
+        resolving the hosts.
+        @raise: L{RuntimeError} if the port is not a number, if the
+        transport or the framing is unknown, or if a multicast group or a
+        list of destinations is not sent over UDP.
         """
-        yield defer.succeed(None)
+        try:
+            port = int(self.get_port())
+        except ValueError:
+            raise RuntimeError("Invalid OSC port %s" % (self.get_port()))
+        transport = self.get_attribute("transport")
+        framing = self.get_attribute("framing")
+        if transport not in TRANSPORTS:
+            raise RuntimeError("Unknown OSC transport %s" % (transport))
+        if framing not in tcp.FRAMINGS:
+            raise RuntimeError("Unknown OSC framing %s" % (framing))
+        destinations = parse_destinations(self.get_attribute("destinations"),
+                port)
+        if not destinations and udp.is_multicast(self.get_host()):
+            destinations = [(self.get_host(), port)]
+        try:
+            ttl = int(self.get_attribute("multicast_ttl"))
+        except ValueError:
+            ttl = -1
+        if not 0 <= ttl <= 255:
+            raise RuntimeError("Invalid multicast TTL %s" % (
+                    self.get_attribute("multicast_ttl")))
+        self._framing = None
+        self._fanout = None
+        if transport == TRANSPORT_TCP:
+            if destinations:
+                raise RuntimeError("OSC over TCP has a single destination")
+            self._framing = framing
+        elif destinations:
+            self._fanout = _split_destinations(destinations) + (ttl,
+                    _parse_bool(self.get_attribute("multicast_loopback")))
         message = create_message_auto(self.get_attribute("path"),
                 *self.get_attribute("args"))
-        # FIXME: check for an int port earlier
-        yield send_async_udp(message, int(self.get_port()), self.get_host())
-        # TODO: support TCP as well
-        # print("OscAction.execute: TODO")
-        defer.returnValue(None)
+        self._cancel_packet = None
+        if self.get_attribute("cancel_path"):
+            self._cancel_packet = create_message_auto(
+                    self.get_attribute("cancel_path"),
+                    *self.get_attribute("cancel_args")).toBinary()
+        self._destination = (self.get_host(), port)
+        self._packet = message.toBinary()
+        if self._fanout is None:
+            hosts.get_cache().prepare(self.get_host())
+        else:
+            for host, port in self._fanout[2]:
+                hosts.get_cache().prepare(host)
+
+    def _send(self, packet):
+        """
+        Sends a packet to the destination, with the transport of the action.
+        @rtype: L{twisted.internet.defer.Deferred}
+        """
+        if self._fanout is not None:
+            return _send_fanout(packet, *self._fanout)
+        host, port = self._destination
+        if self._framing is None:
+            return send_udp_packet(packet, port, host)
+        return send_tcp_packet(packet, port, host, self._framing)
+
+    def get_packet(self):
+        """
+        Returns the encoded message, or None if not prepared.
+        @rtype: C{bytes}
+        """
+        return self._packet
+
+    def execute(self):
+        """
+        @rtype: L{twisted.internet.defer.Deferred}
+        """
+        if self._ahead_timetag is not None:
+            self._ahead_timetag = None
+            return defer.succeed(None) # already sent
+        try:
+            if self._packet is None:
+                self.prepare()
+            return self._send(self._packet)
+        except Exception:
+            return defer.fail()
+
+    # Override
+    def send_ahead(self, planned_time):
+        """
+        Sends the message now, in a bundle whose time tag is the planned time.
+        """
+        try:
+            if self._packet is None:
+                self.prepare()
+            timetag = bundles.get_timetag(timer.to_wall_time(planned_time))
+            self._send(bundles.encode_bundle([self._packet], timetag))
+        except Exception:
+            log.err(None, "Could not send %s ahead" % (self))
+            return False
+        self._ahead_timetag = timetag
+        return True
+
+    # Override
+    def can_cancel_ahead(self):
+        return bool(self.get_attribute("cancel_path"))
+
+    # Override
+    def cancel_ahead(self):
+        """
+        Sends the cancel message, with the time tag of the message sent ahead,
+        so that receivers that got both in time do it right after the other.
+        """
+        timetag = self._ahead_timetag
+        if timetag is None:
+            return
+        self._ahead_timetag = None
+        if self._cancel_packet is None:
+            log.msg("%s was sent ahead and cannot be undone" % (self))
+            return
+        self._send(bundles.encode_bundle([self._cancel_packet], timetag))
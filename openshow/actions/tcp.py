@@ -0,0 +1,327 @@
+#!/usr/bin/env python
+# -*- coding: utf-8; tab-width: 4; mode: python -*-
+"""
+The TcpConnectionPool class.
+
+It keeps one TCP connection open per destination, over which the actions
+send their OSC packets one after the other, without waiting for anything in
+between. If the connection is lost, it connects again after a short delay,
+and the packets sent meanwhile are kept until then, up to a limit.
+
+A stream has no datagrams to tell where a packet ends. OSC 1.1 frames them
+with SLIP: each packet ends with an END byte, and the END and ESC bytes it
+contains are escaped. OSC 1.0 gives the size of each packet before it
+instead, as a 32-bit integer.
+
+Usage:
+    pool = tcp.get_pool()
+    pool.send(packet, "127.0.0.1", 12345)
+    ...
+    pool.close()
+"""
+import collections
+import struct
+from twisted.internet import defer
+from twisted.internet import protocol
+from twisted.python import log
+
+FRAMING_SLIP = "slip" # OSC 1.1
+FRAMING_LENGTH = "length" # OSC 1.0
+FRAMINGS = (FRAMING_SLIP, FRAMING_LENGTH)
+
+SLIP_END = b"\xc0"
+SLIP_ESC = b"\xdb"
+SLIP_ESC_END = b"\xdc"
+SLIP_ESC_ESC = b"\xdd"
+_LENGTH = struct.Struct(">i")
+
+DEFAULT_MAX_QUEUED = 1024 # packets kept while disconnected
+MAX_RECONNECT_DELAY = 2.0 # seconds
+
+
+def encode_slip(packet):
+    """
+    Frames a packet with SLIP, with an END byte before it too, as OSC 1.1
+    recommends, to flush whatever noise came before it.
+    @type packet: C{bytes}
+    @rtype: C{bytes}
+    """
+    return SLIP_END + packet.replace(SLIP_ESC, SLIP_ESC + SLIP_ESC_ESC
+            ).replace(SLIP_END, SLIP_ESC + SLIP_ESC_END) + SLIP_END
+
+
+def decode_slip(data):
+    """
+    Splits a SLIP stream in packets.
+    @type data: C{bytes}
+    @return: The complete packets, and the bytes of the incomplete one.
+    @rtype: C{tuple}
+    """
+    frames = data.split(SLIP_END)
+    rest = frames.pop()
+    packets = [frame.replace(SLIP_ESC + SLIP_ESC_END, SLIP_END).replace(
+            SLIP_ESC + SLIP_ESC_ESC, SLIP_ESC) for frame in frames if frame]
+    return packets, rest
+
+
+def encode_length(packet):
+    """
+    Frames a packet with its size before it.
+    @type packet: C{bytes}
+    @rtype: C{bytes}
+    """
+    return _LENGTH.pack(len(packet)) + packet
+
+
+def get_length_frame_size(data, offset=0):
+    """
+    Tells how many bytes the frame at an offset of a stream of packets
+    prefixed with their size takes, with its size.
+    @type data: C{bytes}
+    @return: Its size, or how many bytes are needed to read it.
+    @rtype: C{int}
+    @raise: L{RuntimeError} if the size is negative.
+    """
+    if len(data) - offset < _LENGTH.size:
+        return _LENGTH.size
+    size = _LENGTH.unpack_from(data, offset)[0]
+    if size < 0:
+        raise RuntimeError("Invalid OSC packet size %d" % (size))
+    return _LENGTH.size + size
+
+
+def decode_length(data):
+    """
+    Splits a stream of packets prefixed with their size.
+    @type data: C{bytes}
+    @return: The complete packets, and the bytes of the incomplete one.
+    @rtype: C{tuple}
+    @raise: L{RuntimeError} if a size is negative.
+    """
+    packets = []
+    offset = 0
+    while len(data) - offset >= _LENGTH.size:
+        end = offset + get_length_frame_size(data, offset)
+        if end > len(data):
+            break
+        packets.append(data[offset + _LENGTH.size:end])
+        offset = end
+    return packets, data[offset:]
+
+
+def decode_frames(data, framing):
+    """
+    @param framing: One of the FRAMING_* constants.
+    @return: The complete packets, and the bytes of the incomplete one.
+    @rtype: C{tuple}
+    @raise: L{RuntimeError} if the stream is invalid.
+    """
+    if framing == FRAMING_SLIP:
+        return decode_slip(data)
+    return decode_length(data)
+
+
+def encode_frame(packet, framing):
+    """
+    @param framing: One of the FRAMING_* constants.
+    @rtype: C{bytes}
+    """
+    if framing == FRAMING_SLIP:
+        return encode_slip(packet)
+    return encode_length(packet)
+
+
+class _SenderProtocol(protocol.Protocol):
+    """
+    Ignores what the receiver sends back.
+    """
+    def connectionMade(self):
+        self.factory.connected(self)
+
+    def connectionLost(self, reason):
+        self.factory.disconnected(self)
+
+
+class _SenderFactory(protocol.ReconnectingClientFactory):
+    """
+    The connection to one destination.
+    """
+    protocol = _SenderProtocol
+    maxDelay = MAX_RECONNECT_DELAY
+    initialDelay = 0.1
+    noisy = False
+
+    def __init__(self, destination, max_queued):
+        self._destination = destination
+        self._queue = collections.deque()
+        self._max_queued = max_queued
+        self._dropped_count = 0
+        self._sender = None # protocol, while connected
+        self._connector = None # of the first attempt, then of the last one
+        self._waiting_for_close = [] # Deferreds
+
+    def startedConnecting(self, connector):
+        # ReconnectingClientFactory only knows the connector once an attempt
+        # has failed: closing during the first one would not stop it.
+        self._connector = connector
+
+    def buildProtocol(self, address):
+        self.resetDelay()
+        return protocol.ReconnectingClientFactory.buildProtocol(self,
+                address)
+
+    def is_connected(self):
+        return self._sender is not None
+
+    def send(self, frame):
+        if self._sender is not None:
+            self._sender.transport.write(frame)
+            return
+        if len(self._queue) == self._max_queued:
+            self._queue.popleft()
+            self._dropped_count += 1
+            if self._dropped_count == 1:
+                log.msg("Not connected to %s:%s: dropping the oldest packets"
+                        % self._destination)
+        self._queue.append(frame)
+
+    def get_queued_count(self):
+        return len(self._queue)
+
+    def connected(self, sender):
+        self._sender = sender
+        self._dropped_count = 0
+        if self._queue:
+            sender.transport.writeSequence(list(self._queue))
+            self._queue.clear()
+
+    def disconnected(self, sender):
+        self._sender = None
+        waiting = self._waiting_for_close
+        self._waiting_for_close = []
+        for d in waiting:
+            d.callback(None)
+
+    def close(self):
+        """
+        @rtype: L{twisted.internet.defer.Deferred}
+        """
+        self.stopTrying()
+        self._queue.clear()
+        if self._sender is None:
+            if self._connector is not None:
+                self._connector.disconnect() # stops connecting, if it was
+            return defer.succeed(None)
+        d = defer.Deferred()
+        self._waiting_for_close.append(d)
+        self._sender.transport.loseConnection()
+        return d
+
+
+class TcpConnectionPool(object):
+    """
+    Sends packets over TCP connections that stay open.
+    """
+    def __init__(self, max_queued=DEFAULT_MAX_QUEUED, reactor=None):
+        """
+        @param max_queued: How many packets to keep for a destination while
+        it is not connected. The oldest ones are dropped.
+        @type max_queued: C{int}
+        @param reactor: The reactor to connect with. The global one if None.
+        """
+        if reactor is None:
+            from twisted.internet import reactor
+        self._reactor = reactor
+        self._max_queued = max_queued
+        self._connections = {} # (host, port) -> _SenderFactory
+        self._is_closed = False
+
+    def _get_connection(self, host, port):
+        destination = (host, port)
+        connection = self._connections.get(destination)
+        if connection is None:
+            if self._is_closed:
+                raise RuntimeError("The TCP connection pool is closed")
+            connection = _SenderFactory(destination, self._max_queued)
+            self._connections[destination] = connection
+            self._reactor.connectTCP(host, port, connection)
+        return connection
+
+    def send(self, packet, host, port, framing=FRAMING_SLIP):
+        """
+        Sends a packet right away if connected, or once connected.
+        @type packet: C{bytes}
+        @type host: C{str}
+        @type port: C{int}
+        @param framing: One of the FRAMING_* constants.
+        @raise: L{RuntimeError} if the pool is closed.
+        """
+        self._get_connection(host, port).send(encode_frame(packet, framing))
+
+    def is_connected(self, host, port):
+        """
+        @rtype: C{bool}
+        """
+        connection = self._connections.get((host, port))
+        return connection is not None and connection.is_connected()
+
+    def get_queued_count(self, host, port):
+        """
+        Returns how many packets wait for a destination to be connected.
+        @rtype: C{int}
+        """
+        connection = self._connections.get((host, port))
+        if connection is None:
+            return 0
+        return connection.get_queued_count()
+
+    def get_connection_count(self):
+        """
+        @rtype: C{int}
+        """
+        return len(self._connections)
+
+    def is_closed(self):
+        """
+        @rtype: C{bool}
+        """
+        return self._is_closed
+
+    def close(self):
+        """
+        Closes all the connections, and stops connecting again. Nothing can
+        be sent afterwards.
+        @rtype: L{twisted.internet.defer.Deferred}
+        """
+        self._is_closed = True
+        connections = list(self._connections.values())
+        self._connections.clear()
+        return defer.gatherResults([connection.close()
+                for connection in connections])
+
+
+_pool = None # created when first needed
+
+
+def get_pool():
+    """
+    Returns the pool that the actions send with.
+    @rtype: L{TcpConnectionPool}
+    """
+    global _pool
+    if _pool is None or _pool.is_closed():
+        _pool = TcpConnectionPool()
+    return _pool
+
+
+def close_pool():
+    """
+    Closes the pool that the actions send with, if it was ever used.
+    @rtype: L{twisted.internet.defer.Deferred}
+    """
+    global _pool
+    if _pool is None:
+        return defer.succeed(None)
+    pool = _pool
+    _pool = None
+    return pool.close()
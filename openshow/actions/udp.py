@@ -0,0 +1,215 @@
+#!/usr/bin/env python
+# -*- coding: utf-8; tab-width: 4; mode: python -*-
+"""
+The UdpSenderPool class.
+
+It keeps the UDP sockets that the actions send from, instead of opening one
+per message. Each destination gets its own connected socket, so that the
+kernel does not have to route each datagram again, up to a maximum number of
+them. Other destinations share one unconnected socket.
+
+A packet for many receivers is sent either to a multicast group, from one
+socket per time to live and loopback mode, or to each of a list of
+destinations, from the shared socket. Either way, no socket is opened per
+receiver.
+
+The sockets stay open until the pool is closed, which the application does
+when it quits.
+
+Usage:
+    pool = udp.get_pool()
+    pool.send(packet, "127.0.0.1", 12345)
+    ...
+    pool.close()
+"""
+from twisted.internet import abstract
+from twisted.internet import defer
+from twisted.internet import protocol
+
+DEFAULT_MAX_CONNECTED = 64 # destinations with their own socket
+DEFAULT_MULTICAST_TTL = 1 # hops: the local network only
+
+
+def is_multicast(host):
+    """
+    Tells if an address is an IPv4 multicast group, from 224.0.0.0 to
+    239.255.255.255.
+    @type host: C{str}
+    @rtype: C{bool}
+    """
+    if not abstract.isIPAddress(host):
+        return False
+    return 224 <= int(host.split(".", 1)[0]) <= 239
+
+
+class _SenderProtocol(protocol.DatagramProtocol):
+    """
+    Ignores what is received, and the ICMP errors of the connected sockets:
+    an OSC receiver that is not listening yet is not an error.
+    """
+    def connectionRefused(self):
+        pass
+
+
+class UdpSenderPool(object):
+    """
+    Sends UDP datagrams from a bounded set of sockets that stay open.
+    """
+    def __init__(self, max_connected=DEFAULT_MAX_CONNECTED, reactor=None):
+        """
+        @param max_connected: How many destinations can have their own
+        connected socket.
+        @type max_connected: C{int}
+        @param reactor: The reactor to listen with. The global one if None.
+        """
+        if reactor is None:
+            from twisted.internet import reactor
+        self._reactor = reactor
+        self._max_connected = max_connected
+        self._connected = {} # (host, port) -> listening port
+        self._shared = {} # interface -> unconnected listening port
+        self._multicast = {} # (ttl, loopback) -> multicast listening port
+        self._is_closed = False
+
+    def _get_interface(self, host):
+        if abstract.isIPv6Address(host):
+            return "::"
+        return ""
+
+    def _listen(self, interface):
+        return self._reactor.listenUDP(0, _SenderProtocol(),
+                interface=interface)
+
+    def send(self, packet, host, port):
+        """
+        Sends a datagram.
+        @type packet: C{bytes}
+        @param host: IP address, not a host name.
+        @type host: C{str}
+        @type port: C{int}
+        @raise: L{RuntimeError} if the pool is closed.
+        """
+        destination = (host, port)
+        listening_port = self._connected.get(destination)
+        if listening_port is not None:
+            listening_port.write(packet)
+            return
+        if self._is_closed:
+            raise RuntimeError("The UDP sender pool is closed")
+        interface = self._get_interface(host)
+        if len(self._connected) < self._max_connected:
+            listening_port = self._listen(interface)
+            listening_port.connect(host, port)
+            self._connected[destination] = listening_port
+            listening_port.write(packet)
+            return
+        self._get_shared(interface).write(packet, destination)
+
+    def _get_shared(self, interface):
+        listening_port = self._shared.get(interface)
+        if listening_port is None:
+            if self._is_closed:
+                raise RuntimeError("The UDP sender pool is closed")
+            listening_port = self._listen(interface)
+            self._shared[interface] = listening_port
+        return listening_port
+
+    def send_many(self, packet, destinations):
+        """
+        Sends the same datagram to each of a list of destinations, from the
+        shared socket.
+        @type packet: C{bytes}
+        @param destinations: List of (IP address, port).
+        @type destinations: C{list}
+        @raise: L{RuntimeError} if the pool is closed.
+        """
+        shared = None
+        for destination in destinations:
+            if ":" in destination[0]: # IPv6
+                self._get_shared("::").write(packet, destination)
+            else:
+                if shared is None:
+                    shared = self._get_shared("")
+                shared.write(packet, destination)
+
+    def send_multicast(self, packet, group, port, ttl=DEFAULT_MULTICAST_TTL,
+            loopback=True):
+        """
+        Sends a datagram to a multicast group.
+        @type packet: C{bytes}
+        @param group: IPv4 multicast address.
+        @type group: C{str}
+        @type port: C{int}
+        @param ttl: How many routers it can go through.
+        @type ttl: C{int}
+        @param loopback: Whether the receivers on this host get it too.
+        @type loopback: C{bool}
+        @raise: L{RuntimeError} if the pool is closed.
+        """
+        options = (ttl, bool(loopback))
+        listening_port = self._multicast.get(options)
+        if listening_port is None:
+            if self._is_closed:
+                raise RuntimeError("The UDP sender pool is closed")
+            listening_port = self._reactor.listenMulticast(0,
+                    _SenderProtocol())
+            listening_port.setTTL(ttl)
+            listening_port.setLoopbackMode(options[1])
+            self._multicast[options] = listening_port
+        listening_port.write(packet, (group, port))
+
+    def get_socket_count(self):
+        """
+        Returns how many sockets are open.
+        @rtype: C{int}
+        """
+        return len(self._connected) + len(self._shared) + len(
+                self._multicast)
+
+    def is_closed(self):
+        """
+        @rtype: C{bool}
+        """
+        return self._is_closed
+
+    def close(self):
+        """
+        Closes all the sockets. Nothing can be sent afterwards.
+        @rtype: L{twisted.internet.defer.Deferred}
+        """
+        self._is_closed = True
+        listening_ports = list(self._connected.values()) + list(
+                self._shared.values()) + list(self._multicast.values())
+        self._connected.clear()
+        self._shared.clear()
+        self._multicast.clear()
+        return defer.gatherResults([defer.maybeDeferred(
+                listening_port.stopListening)
+                for listening_port in listening_ports])
+
+
+_pool = None # created when first needed
+
+
+def get_pool():
+    """
+    Returns the pool that the actions send with.
+    @rtype: L{UdpSenderPool}
+    """
+    global _pool
+    if _pool is None or _pool.is_closed():
+        _pool = UdpSenderPool()
+    return _pool
+
+
+def close_pool():
+    """
+    Closes the pool that the actions send with, if it was ever used.
+    @rtype: L{twisted.internet.defer.Deferred}
+    """
+    global _pool
+    if _pool is None:
+        return defer.succeed(None)
+    pool = _pool
+    _pool = None
+    return pool.close()
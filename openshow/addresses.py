@@ -0,0 +1,196 @@
+#!/usr/bin/env python
+# -*- coding: utf-8; tab-width: 4; mode: python -*-
+"""
+The AddressTrie class.
+
+It finds the handlers of the OSC addresses that an incoming address pattern
+matches. The registered addresses are split in parts, in a tree: a pattern
+without wildcards is one dictionary lookup per part, and a wildcard part is
+only compared with the children of the nodes that matched so far, never with
+every address. The handlers of the last patterns are cached, so that a
+controller that keeps sending the same address finds them with one lookup.
+
+The wildcards are those of OSC 1.0, within a part of the address:
+    ? matches any character
+    * matches any sequence of characters
+    [abc] matches one of those characters, [a-z] one in that range, and
+        [!abc] any other one
+    {foo,bar} matches one of those strings
+
+Usage:
+    trie = AddressTrie()
+    trie.add("/openshow/go", handler)
+    for handler in trie.match("/openshow/g?"):
+        handler(pattern, args)
+"""
+import re
+
+DEFAULT_CACHE_SIZE = 1024 # patterns
+WILDCARD_CHARS = "*?[]{}"
+
+
+def is_pattern(address):
+    """
+    Tells if an address contains wildcards.
+    @type address: C{str}
+    @rtype: C{bool}
+    """
+    for char in WILDCARD_CHARS:
+        if char in address:
+            return True
+    return False
+
+
+def compile_part(pattern):
+    """
+    Translates a part of an address pattern to a regular expression. A
+    bracket or a brace that is not closed is taken literally.
+    @param pattern: Part between two slashes.
+    @type pattern: C{str}
+    @return: The match method of the compiled expression.
+    """
+    regex = []
+    index = 0
+    while index < len(pattern):
+        char = pattern[index]
+        index += 1
+        if char == "*":
+            regex.append(".*")
+        elif char == "?":
+            regex.append(".")
+        elif char == "[" and "]" in pattern[index:]:
+            end = pattern.index("]", index)
+            chars = pattern[index:end]
+            index = end + 1
+            negated = chars.startswith("!")
+            if negated:
+                chars = chars[1:]
+            escaped = "".join(["\\" + c if c in "\\^]" else c for c in chars])
+            regex.append("[%s%s]" % ("^" if negated else "", escaped))
+        elif char == "{" and "}" in pattern[index:]:
+            end = pattern.index("}", index)
+            choices = pattern[index:end].split(",")
+            index = end + 1
+            regex.append("(?:%s)" % ("|".join([re.escape(choice)
+                    for choice in choices])))
+        else:
+            regex.append(re.escape(char))
+    return re.compile("".join(regex) + r"\Z", re.DOTALL).match
+
+
+class _Node(object):
+    """
+    A part of some addresses.
+    """
+    __slots__ = ("children", "handlers")
+
+    def __init__(self):
+        self.children = {} # part -> _Node
+        self.handlers = [] # of the address that ends here
+
+
+class AddressTrie(object):
+    """
+    Handlers of OSC addresses, found by address pattern.
+    """
+    def __init__(self, cache_size=DEFAULT_CACHE_SIZE):
+        """
+        @param cache_size: How many patterns to keep the handlers of.
+        @type cache_size: C{int}
+        """
+        self._root = _Node()
+        self._cache = {} # pattern -> tuple of handlers
+        self._cache_size = cache_size
+        self._handler_count = 0
+
+    def add(self, address, handler):
+        """
+        Adds a handler to an address.
+        @param address: Address without wildcards, such as "/openshow/go".
+        @type address: C{str}
+        @param handler: Anything, usually a function that handles the
+        messages whose pattern matches the address.
+        @raise: L{RuntimeError} if the address is invalid.
+        """
+        if not address.startswith("/") or is_pattern(address):
+            raise RuntimeError("Invalid OSC address %s" % (address))
+        node = self._root
+        for part in address.split("/")[1:]:
+            child = node.children.get(part)
+            if child is None:
+                child = _Node()
+                node.children[part] = child
+            node = child
+        node.handlers.append(handler)
+        self._handler_count += 1
+        self._cache.clear()
+
+    def remove(self, address, handler):
+        """
+        Removes a handler from an address.
+        @raise: L{RuntimeError} if it was not added.
+        """
+        path = [self._root]
+        parts = address.split("/")[1:]
+        for part in parts:
+            node = path[-1].children.get(part)
+            if node is None:
+                break
+            path.append(node)
+        if len(path) != len(parts) + 1 or handler not in path[-1].handlers:
+            raise RuntimeError("No such handler for %s" % (address))
+        path[-1].handlers.remove(handler)
+        self._handler_count -= 1
+        self._cache.clear()
+        # Prunes the parts that lead nowhere anymore:
+        for index in range(len(parts), 0, -1):
+            node = path[index]
+            if node.children or node.handlers:
+                break
+            del path[index - 1].children[parts[index - 1]]
+
+    def match(self, pattern):
+        """
+        Returns the handlers of the addresses that a pattern matches.
+        @param pattern: Address, with or without wildcards.
+        @type pattern: C{str}
+        @rtype: C{tuple}
+        """
+        handlers = self._cache.get(pattern)
+        if handlers is None:
+            handlers = self._match(pattern)
+            if len(self._cache) >= self._cache_size:
+                self._cache.clear()
+            self._cache[pattern] = handlers
+        return handlers
+
+    def _match(self, pattern):
+        if not pattern.startswith("/"):
+            return ()
+        nodes = [self._root]
+        for part in pattern.split("/")[1:]:
+            matched = []
+            if is_pattern(part):
+                part_match = compile_part(part)
+                for node in nodes:
+                    for name, child in node.children.items():
+                        if part_match(name):
+                            matched.append(child)
+            else:
+                for node in nodes:
+                    child = node.children.get(part)
+                    if child is not None:
+                        matched.append(child)
+            if not matched:
+                return ()
+            nodes = matched
+        handlers = []
+        for node in nodes:
+            handlers.extend(node.handlers)
+        return tuple(handlers)
+
+    def get_handler_count(self):
+        """
+        @rtype: C{int}
+        """
+        return self._handler_count
@@ -0,0 +1,175 @@
+#!/usr/bin/env python
+# -*- coding: utf-8; tab-width: 4; mode: python -*-
+"""
+Columnar representation of a cue sheet.
+
+Each attribute of the cues is stored in its own typed array, so that bulk
+operations on thousands of cues are single passes over contiguous memory
+instead of method calls on each Cue object. If NumPy is installed, the
+arithmetic on the waits is done by NumPy, in place, on these arrays.
+
+Usage:
+    columns = columns.from_cue_sheet(cue_sheet)
+    columns.scale_waits(0.9)
+    columns.shift_pre_waits(2.0, 200, 400)
+    columns.apply_to_cue_sheet(cue_sheet)
+"""
+import array
+import sys
+from openshow import cue
+
+try:
+    _intern = intern # Python 2
+except NameError:
+    _intern = sys.intern
+
+try:
+    import numpy
+except ImportError:
+    numpy = None # the same in Python loops
+
+FOLLOW_CODES = {
+        cue.FOLLOW_AUTO_CONTINUE: 0,
+        cue.FOLLOW_WHEN_DONE: 1,
+        cue.FOLLOW_DO_NOT_CONTINUE: 2,
+        }
+FOLLOW_VALUES = dict((code, value) for value, code in FOLLOW_CODES.items())
+
+
+class CueColumns(object):
+    """
+    The timing attributes of a list of cues, one array per attribute.
+
+    Ranges are given as indices, first and last included. Their default is
+    the whole list.
+    """
+    def __init__(self):
+        self._identifiers = []
+        self._pre_waits = array.array("d")
+        self._post_waits = array.array("d")
+        self._follows = array.array("b")
+
+    def __len__(self):
+        return len(self._identifiers)
+
+    def append(self, identifier, pre_wait=0.0, post_wait=0.0,
+            follow=cue.FOLLOW_AUTO_CONTINUE):
+        """
+        @type identifier: C{str}
+        @type pre_wait: C{float}
+        @type post_wait: C{float}
+        @type follow: C{str}
+        """
+        if isinstance(identifier, str):
+            identifier = _intern(identifier)
+        self._identifiers.append(identifier)
+        self._pre_waits.append(pre_wait)
+        self._post_waits.append(post_wait)
+        self._follows.append(FOLLOW_CODES[follow])
+
+    def get_identifier(self, index):
+        return self._identifiers[index]
+
+    def get_pre_wait(self, index):
+        return self._pre_waits[index]
+
+    def get_post_wait(self, index):
+        return self._post_waits[index]
+
+    def get_follow(self, index):
+        return FOLLOW_VALUES[self._follows[index]]
+
+    def _slice(self, first, last):
+        if last is None:
+            last = len(self) - 1
+        return slice(first, last + 1)
+
+    def _get_view(self, column, span):
+        """
+        Returns a NumPy array that shares the memory of a range of a column.
+        """
+        return numpy.frombuffer(column, numpy.float64)[span]
+
+    def scale_waits(self, factor, first=0, last=None):
+        """
+        Multiplies the pre-wait and post-wait of a range of cues.
+        @type factor: C{float}
+        """
+        span = self._slice(first, last)
+        for column in (self._pre_waits, self._post_waits):
+            if numpy is not None and len(column) > 0:
+                values = self._get_view(column, span)
+                values *= factor
+            else:
+                column[span] = array.array("d",
+                        [value * factor for value in column[span]])
+
+    def shift_pre_waits(self, delta, first=0, last=None):
+        """
+        Adds a delay to the pre-wait of a range of cues.
+        Pre-waits never become negative.
+        @type delta: C{float}
+        """
+        span = self._slice(first, last)
+        if numpy is not None and len(self) > 0:
+            values = self._get_view(self._pre_waits, span)
+            values += delta
+            numpy.maximum(values, 0.0, out=values)
+        else:
+            self._pre_waits[span] = array.array("d", [max(0.0, value + delta)
+                    for value in self._pre_waits[span]])
+
+    def get_total_duration(self, first=0, last=None):
+        """
+        Returns the sum of the pre-waits and post-waits of a range of cues.
+        That is the running time of an auto-continue chain, if its actions
+        take no time.
+        @rtype: C{float}
+        """
+        span = self._slice(first, last)
+        if numpy is not None and len(self) > 0:
+            return float(numpy.sum(self._get_view(self._pre_waits, span)) +
+                    numpy.sum(self._get_view(self._post_waits, span)))
+        return sum(self._pre_waits[span]) + sum(self._post_waits[span])
+
+    def count_follow(self, follow, first=0, last=None):
+        """
+        Returns how many cues in a range have a given follow value.
+        @rtype: C{int}
+        """
+        return self._follows[self._slice(first, last)].count(
+                FOLLOW_CODES[follow])
+
+    def apply_to_cue_sheet(self, cue_sheet):
+        """
+        Writes the waits and follow values back to the cues of a cue sheet.
+
+        The cue sheet must contain the same cues, in the same order, as when
+        these columns were created.
+        @type cue_sheet: L{openshow.cue.CueSheet}
+        @raise: L{RuntimeError}
+        """
+        cues = cue_sheet.get_cues()
+        if len(cues) != len(self):
+            raise RuntimeError("Cue sheet has %d cues, not %d" % (
+                    len(cues), len(self)))
+        for index, _cue in enumerate(cues):
+            if _cue.get_identifier() != self._identifiers[index]:
+                raise RuntimeError("Cue %s is not at index %d" % (
+                        self._identifiers[index], index))
+            _cue.set_pre_wait(self._pre_waits[index])
+            _cue.set_post_wait(self._post_waits[index])
+            _cue.set_follow(FOLLOW_VALUES[self._follows[index]])
+
+
+def from_cue_sheet(cue_sheet):
+    """
+    Creates the columns for all the cues of a cue sheet.
+    @type cue_sheet: L{openshow.cue.CueSheet}
+    @rtype: L{CueColumns}
+    """
+    ret = CueColumns()
+    for _cue in cue_sheet.get_cues():
+        ret.append(_cue.get_identifier(), _cue.get_pre_wait(),
+                _cue.get_post_wait(), _cue.get_follow())
+    return ret
@@ -3,10 +3,13 @@
 """
 A project contains cues. XML files are used to describe projects.
 """
+from openshow import cuelist
+from openshow import events
+from openshow import numbering
 from openshow import sig
 from openshow import timer
 from twisted.internet import defer
-from twisted.internet import reactor
+from twisted.python import log
 
 
 # Constants
@@ -14,10 +17,21 @@ FOLLOW_AUTO_CONTINUE = "auto_continue" # trigger next cue right away (after its
 FOLLOW_WHEN_DONE = "follow_when_done"
 # trigger next cue once this one's duration is done (after its post_wait)
 FOLLOW_DO_NOT_CONTINUE = "no_continue" # stop after this cue is done (but select next one)
+# Cues that are later than that are reported with an EVENT_LATE:
+LATENESS_THRESHOLD = 0.001 # seconds
 # TODO: LOG_LEVEL_INFO = "info"
 # TODO: LOG_LEVEL_DEBUG = "debug"
 
 
+def _lazy_signal(name):
+    """
+    A Cue signal that is only created when someone accesses it.
+    """
+    def _get(self):
+        return self._get_signal(name)
+    return property(_get)
+
+
 class Cue(object):
     """
     Cue.
@@ -28,9 +42,36 @@ class Cue(object):
 
     Cues can have a pre-wait delay, and a post-wait delay.
     Post-wait delay is only useful if in FOLLOW_AUTO_CONTINUE continue mode.
+
+    Show files contain thousands of cues that are idle most of the time, so a
+    cue only allocates its timers when it runs, and its signals when someone
+    connects to them. Its events are also posted to the event bus of the cue
+    sheet that contains it, without connecting anything.
+
+    Its waits are scheduled against its planned timeline: each one ends at a
+    fixed time after the planned end of the previous one, not after the
+    actual one, so that the lateness of the reactor does not pile up along a
+    chain of cues. Lateness is reported with an EVENT_LATE instead.
     """
+    __slots__ = ("_identifier", "_deferred", "_pre_wait", "_post_wait",
+            "_title", "_follow", "_delayed_call_pre_wait",
+            "_delayed_call_post_wait", "_timer_pre_wait", "_timer_post_wait",
+            "_action", "_signals", "_bus", "_planned_time", "_trigger")
+
+    # Public attributes:
+    signal_go = _lazy_signal(events.EVENT_GO) # param: self
+    # param: self
+    signal_done_trigger = _lazy_signal(events.EVENT_DONE_TRIGGER)
+    # param: self
+    signal_done_pre_wait = _lazy_signal(events.EVENT_DONE_PRE_WAIT)
+    # param: self
+    signal_done_post_wait = _lazy_signal(events.EVENT_DONE_POST_WAIT)
+    signal_cancelled = _lazy_signal(events.EVENT_CANCELLED) # param: self
+    signal_late = _lazy_signal(events.EVENT_LATE) # params: self, seconds
+    signal_log = _lazy_signal("log") # params: self, message, level
+
     def __init__(self, identifier="", pre_wait=0.0, post_wait=0.0, title="",
-            action=None, follow=None):
+            action=None, follow=None, trigger=None):
         self._identifier = identifier # or "Number"
         self._deferred = None
         self._pre_wait = pre_wait
@@ -42,17 +83,46 @@ class Cue(object):
             self._follow = follow
         self._delayed_call_pre_wait  = None
         self._delayed_call_post_wait = None
-        self._timer_pre_wait = timer.Timer()
-        self._timer_post_wait = timer.Timer()
+        self._timer_pre_wait = None # created by go()
+        self._timer_post_wait = None
         self._action = action
-
-        # Public attributes:
-        self.signal_go = sig.Signal() # param: self
-        self.signal_done_trigger = sig.Signal() # param: self
-        self.signal_done_pre_wait = sig.Signal() # param: self
-        self.signal_done_post_wait = sig.Signal() # param: self
-        self.signal_cancelled = sig.Signal() # param: self
-        self.signal_log = sig.Signal() # params: self, message, level
+        self._signals = None # name -> sig.Signal, created on demand
+        self._bus = None # event bus of the CueSheet that contains this cue
+        self._planned_time = None # when its current step should end
+        self._trigger = trigger # see openshow.triggers
+
+    def _get_signal(self, name):
+        if self._signals is None:
+            self._signals = {}
+        signal = self._signals.get(name)
+        if signal is None:
+            signal = sig.Signal()
+            self._signals[name] = signal
+        return signal
+
+    def _emit(self, name, value=None, time=None):
+        """
+        Calls the signal with the given name, if anyone connected to it,
+        and posts the event to the event bus. Only the bus gets the value,
+        except for signal_late: the other signals keep their old parameters.
+        @param time: When it happened, if known.
+        """
+        if self._signals is not None:
+            signal = self._signals.get(name)
+            if signal is not None:
+                if name == events.EVENT_LATE:
+                    signal(self, value)
+                else:
+                    signal(self)
+        if self._bus is not None:
+            self._bus.post(name, self, value, time)
+
+    def _set_event_bus(self, bus):
+        """
+        Called by the L{CueSheet} that this cue is added to or removed from.
+        @type bus: L{openshow.events.EventBus}
+        """
+        self._bus = bus
 
     def set_action(self, action):
         self._action = action
@@ -63,43 +133,95 @@ class Cue(object):
         """
         return self._action
 
-    def go(self):
+    def go(self, offset=0.0, planned_time=None):
         """
         Starts the pre-wait timer, then execute its actions,
         and then starts the post-wait timer.
 
+        @param offset: How many seconds into the cue to start it at. If it is
+        past the pre-wait, the actions are executed right away, and only the
+        rest of the post-wait is waited for.
+        @type offset: C{float}
+        @param planned_time: When it should have been started, in the time
+        of the clock of L{openshow.timer}. Its waits are anchored on it, and
+        it is reported late if that was a while ago. Now if None.
+        @type planned_time: C{float}
         @return: A Deferred whose result is True if done normally,
         False if cancelled.
         @rtype: L{twisted.internet.defer.Deferred}
-        """
-        self._deferred = defer.Deferred()
-        self.signal_go(self)
-        self._timer_pre_wait.reset()
-        if self._pre_wait == 0.0:
-            self._do_after_pre_wait()
+        @raise: L{RuntimeError} if it is already running.
+        """
+        if self._deferred is not None:
+            raise RuntimeError("Cue %s is already running" % (
+                    self._identifier))
+        deferred = defer.Deferred()
+        self._deferred = deferred
+        if self._timer_pre_wait is None:
+            self._timer_pre_wait = timer.Timer()
+            self._timer_post_wait = timer.Timer()
+        now = timer.get_sequencer().seconds()
+        is_planned = planned_time is not None
+        if not is_planned:
+            planned_time = now
+        started = planned_time - offset
+        action_time = started + self._pre_wait
+        # Known to whoever handles EVENT_GO, through get_planned_time():
+        self._planned_time = action_time
+        self._emit(events.EVENT_GO, None, now)
+        self._timer_pre_wait.reset(now - started)
+        if action_time <= now:
+            # Skipping the pre-wait is not being late, unless it was planned.
+            self._do_after_pre_wait(action_time, is_planned)
         else:
-            self._delayed_call_pre_wait = reactor.callLater(self._pre_wait,
-                    self._do_after_pre_wait)
-        return self._deferred
+            self._delayed_call_pre_wait = timer.call_at(action_time,
+                    self._do_after_pre_wait, action_time, True)
+        return deferred
 
     def cancel(self):
         if self._delayed_call_pre_wait is not None:
             self._delayed_call_pre_wait.cancel()
+            self._delayed_call_pre_wait = None
         if self._delayed_call_post_wait is not None:
             self._delayed_call_post_wait.cancel()
-        if self._callback_deferred is not None:
-            self.signal_cancelled(self)
+            self._delayed_call_post_wait = None
+        if self._deferred is not None:
+            self._emit(events.EVENT_CANCELLED, None,
+                    timer.get_sequencer().seconds())
             done_normally = False
             self._callback_deferred(done_normally)
-            self._callback_deferred = None
 
-    @defer.inlineCallbacks
-    def _do_after_pre_wait(self):
+    def get_planned_time(self):
+        """
+        Returns when its current wait is planned to end, or when its last
+        one was planned to end if it is done, in the time of the clock of
+        L{openshow.timer}. None if it never ran.
+        @rtype: C{float}
+        """
+        return self._planned_time
+
+    def _report_lateness(self, planned_time, now):
+        """
+        @return: How many seconds after the planned time it is.
+        @rtype: C{float}
+        """
+        lateness = now - planned_time
+        if lateness > LATENESS_THRESHOLD:
+            self._emit(events.EVENT_LATE, lateness, now)
+        return lateness
+
+    def _do_after_pre_wait(self, planned_time, check_lateness=False):
         """
         After the pre_wait (if any)
         Executes its actions.
+
+        @param planned_time: When the pre-wait was planned to end.
         """
-        self.signal_done_pre_wait(self)
+        self._planned_time = planned_time
+        now = timer.get_sequencer().seconds()
+        lateness = 0.0
+        if check_lateness:
+            lateness = self._report_lateness(planned_time, now)
+        self._emit(events.EVENT_DONE_PRE_WAIT, lateness, now)
         # we should not wait for it to be done
         # if FOLLOW_AUTO_CONTINUE 
         wait_for_when_done_before_post_wait = False
@@ -109,20 +231,48 @@ class Cue(object):
         elif self._follow == FOLLOW_DO_NOT_CONTINUE:
             wait_for_when_done_before_post_wait = True
             # we can also wait, why not?
+        # Plain callbacks rather than inlineCallbacks: a generator and its
+        # Deferreds per cue are a lot for long chains of cues without waits.
+        executed_time = now
+        d = self._do_execute()
+        d.addErrback(log.err, "Action of cue %s failed" % (self._identifier))
+        d.addCallback(self._done_trigger, executed_time)
         if wait_for_when_done_before_post_wait:
-            yield self._do_execute()
+            d.addCallback(self._start_post_wait, planned_time, executed_time)
         else:
-            # This waits for the execution to be done
-            yield defer.succeed(None)
-            d = self._do_execute() # discard the Deferred
-            d = None
+            d = None # discard the Deferred
+            self._start_post_wait(None, planned_time)
+
+    def _done_trigger(self, result, executed_time):
+        """
+        When its actions are done.
+        """
+        now = timer.get_sequencer().seconds()
+        self._emit(events.EVENT_DONE_TRIGGER, now - executed_time, now)
+        return result
+
+    def _start_post_wait(self, result, planned_time, executed_time=None):
+        """
+        After the actions have been executed, or triggered.
+
+        @param planned_time: When the pre-wait was planned to end.
+        @param executed_time: When we started to wait for the actions to be
+        done, if we did. How long they took is added to the planned time.
+        """
+        if self._deferred is None:
+            return # cancelled while executing its action
         self._delayed_call_pre_wait = None
-        self._timer_post_wait.reset()
-        if self._post_wait == 0.0:
-            self._done_post_wait()
+        now = timer.get_sequencer().seconds()
+        if executed_time is not None:
+            planned_time += now - executed_time
+        self._timer_post_wait.reset(now - planned_time)
+        done_time = planned_time + self._post_wait
+        self._planned_time = done_time
+        if done_time <= now:
+            self._done_post_wait(False, now)
         else:
-            self._delayed_call_post_wait = reactor.callLater(self._post_wait,
-                    self._done_post_wait)
+            self._delayed_call_post_wait = timer.call_at(done_time,
+                    self._done_post_wait, True)
 
     def get_elapsed_pre_wait(self):
         """
@@ -146,6 +296,12 @@ class Cue(object):
             print("post-wait is not running")
             return 0.0
 
+    def is_running(self):
+        """
+        @rtype: C{bool}
+        """
+        return self._deferred is not None
+
     def is_pre_waiting(self):
         """
         @rtype: C{bool}
@@ -158,13 +314,20 @@ class Cue(object):
         """
         return self._delayed_call_post_wait is not None
 
-    def _done_post_wait(self):
-        self.signal_done_post_wait(self)
+    def _done_post_wait(self, check_lateness=False, now=None):
+        if now is None:
+            now = timer.get_sequencer().seconds()
+        lateness = 0.0
+        if check_lateness:
+            lateness = self._report_lateness(self._planned_time, now)
+        self._emit(events.EVENT_DONE_POST_WAIT, lateness, now)
         self._delayed_call_post_wait = None
         self._callback_deferred()
 
     def _callback_deferred(self, done_normally=True):
-        self._deferred.callback(done_normally)
+        deferred = self._deferred
+        self._deferred = None
+        deferred.callback(done_normally)
 
     def __str__(self):
         return "Cue(\"%s\" \"%s\" %s %s): %s" % (self._identifier, self._title,
@@ -200,6 +363,22 @@ class Cue(object):
         """
         return self._follow
 
+    def get_trigger(self):
+        """
+        Returns the condition on incoming OSC messages that starts this cue,
+        if any.
+        @rtype: L{openshow.triggers.Trigger}
+        """
+        return self._trigger
+
+    def set_trigger(self, value):
+        """
+        @param value: None to remove it.
+        @type value: L{openshow.triggers.Trigger}
+        """
+        self._trigger = value
+        self._emit(events.EVENT_CHANGED)
+
     def set_identifier(self, value):
         """
         @type value: C{str}
@@ -211,12 +390,21 @@ class Cue(object):
         @type value: C{float}
         """
         self._pre_wait = float(value)
+        self._emit(events.EVENT_CHANGED)
 
     def set_post_wait(self, value):
         """
         @type value: C{float}
         """
         self._post_wait = float(value)
+        self._emit(events.EVENT_CHANGED)
+
+    def get_duration(self):
+        """
+        Returns how long this cue lasts, if its action takes no time.
+        @rtype: C{float}
+        """
+        return self._pre_wait + self._post_wait
 
     def set_title(self, value):
         """
@@ -259,6 +447,42 @@ class Action(object):
     def execute(self):
         return defer.succeed(None)
 
+    def prepare(self):
+        """
+        Does, once and for all, the work that does not need to be done each
+        time it is executed. Called when the project is loaded. An action
+        whose attributes change afterwards must prepare itself again before
+        its next execution.
+        """
+        pass
+
+    def send_ahead(self, planned_time):
+        """
+        Sends now what its next execution would send, to be acted upon at a
+        given time by receivers that can wait until then. Its next execution
+        then does not send it again. See L{openshow.lookahead}.
+        @param planned_time: When it is planned to be executed, in the time
+        of the clock of L{openshow.timer}.
+        @type planned_time: C{float}
+        @return: False if it cannot be sent ahead.
+        @rtype: C{bool}
+        """
+        return False
+
+    def can_cancel_ahead(self):
+        """
+        Tells if what it sent ahead can be undone by L{cancel_ahead}.
+        @rtype: C{bool}
+        """
+        return False
+
+    def cancel_ahead(self):
+        """
+        Called when the execution it was sent ahead for is cancelled: undoes
+        it if it can, and executes normally next time.
+        """
+        pass
+
     def set_attribute(self, name, value):
         """
         @type name: C{str}
@@ -291,10 +515,19 @@ class CueSheet(object):
     A Cue sheet is a list of Cues.
     """
     def __init__(self):
-        self._cues = []
+        self._cues = cuelist.CueList()
+        self._cue_nodes = {} # identifier -> node in self._cues
+        self._numbering = numbering.CueNumberIndex()
         # self._selected_index = 0
         self._selected_identifier = ""
         self._is_running = False
+        self._deferred = None # fired when the sheet is done
+        # state of _run_cues:
+        self._running_cue = None
+        self._next_cue = None
+        self._next_planned_time = None
+        self._is_waiting = False
+        self._is_looping = False
 
         # Public attributes:
         # signals for this sheet:
@@ -308,6 +541,17 @@ class CueSheet(object):
         self.signal_cue_done_pre_wait = sig.Signal() # param: cue
         self.signal_cue_done_post_wait = sig.Signal() # param: cue
         self.signal_cue_cancelled = sig.Signal() # param: cue
+        self._cue_signals = {
+                events.EVENT_GO: self.signal_cue_go,
+                events.EVENT_DONE_TRIGGER: self.signal_cue_done_trigger,
+                events.EVENT_DONE_PRE_WAIT: self.signal_cue_done_pre_wait,
+                events.EVENT_DONE_POST_WAIT: self.signal_cue_done_post_wait,
+                events.EVENT_CANCELLED: self.signal_cue_cancelled,
+                }
+        # All the cues of this sheet post their events to it:
+        self._event_bus = events.EventBus(self._get_event_cue_index)
+        self._event_bus.subscribe(self._cue_event_cb)
+        self._event_bus.subscribe(self._cue_changed_cb, [events.EVENT_CHANGED])
 
     def go(self):
         """
@@ -326,33 +570,121 @@ class CueSheet(object):
         # FIXME: could be ""
         # No need to do self.select_cue(identifier)
         _cue = self.get_cue_by_identifier(identifier)
-        d = self._go_cue(_cue) # FIXME: will this Deferred trigger when the
-        # cue sheet is done? I think so
-        self.signal_sheet_go()
-        return d
+        return self._go_cue(_cue)
 
-    @defer.inlineCallbacks
-    def _go_cue(self, cue_item):
+    def go_from_time(self, position):
         """
-        Triggers a cue
+        Starts the cue sheet at a given time of its planned timeline.
+
+        Selects the cue that is planned to be active at that time and starts
+        it with what is left of its pre-wait or post-wait. The earlier cues
+        are not triggered. Finding the cue takes O(log n).
+        See L{get_cue_at_time}.
+
+        @param position: Seconds from the beginning. See L{timer.parse_time}.
+        @type position: C{float}
+        @rtype: L{twisted.internet.defer.Deferred}
+        @raise: L{RuntimeError} if it is past the end of the cue sheet.
         """
-        # maybe use the signals, not the deferreds, in order to trigger next?
-        # well, I think it's simpler like this, in the end
-        yield cue_item.go()
+        if self._is_running:
+            print("already running")
+            return defer.succeed(None)
+
+        node = self._cues.find_by_weight(position)
+        if node is None:
+            raise RuntimeError("No cue at %s" % (position))
+        _cue = node.item
+        self.select_cue(_cue.get_identifier())
+        self._is_running = True
+        offset = position - self._cues.get_weight_before(node)
+        return self._go_cue(_cue, offset)
+
+    def _go_cue(self, cue_item, offset=0.0):
+        """
+        Triggers a cue, and the ones that follow it.
+
+        @return: A Deferred that fires when the cue sheet is done or stopped.
+        @rtype: L{twisted.internet.defer.Deferred}
+        """
+        deferred = defer.Deferred()
+        self._deferred = deferred
+        self.signal_sheet_go()
+        self._run_cues(cue_item, offset)
+        return deferred
+
+    def _run_cues(self, cue_item, offset=0.0, planned_time=None):
+        """
+        Triggers cues until one of them has to wait.
+
+        Cues without any wait are done as soon as they are triggered, so this
+        is a loop, not a recursion: a long chain of them does not pile up
+        stack frames or Deferreds. When a cue has to wait, _cue_done_cb calls
+        this again once it is done.
+
+        Each cue that follows another one is planned to start when the other
+        one was planned to be done. See L{Cue.go}.
+        """
+        self._is_looping = True
+        while cue_item is not None:
+            if cue_item.is_running():
+                # Started on its own, by its trigger: goes on without it.
+                cue_item = self._get_cue_to_follow(cue_item, True)
+                offset = 0.0
+                continue
+            self._running_cue = cue_item
+            self._next_cue = None
+            self._is_waiting = True
+            cue_item.go(offset, planned_time).addCallback(self._cue_done_cb,
+                    cue_item)
+            offset = 0.0
+            if self._is_waiting:
+                break
+            cue_item = self._next_cue
+            planned_time = self._next_planned_time
+        self._is_looping = False
+
+    def _cue_done_cb(self, done_normally, cue_item):
+        """
+        Called when a cue triggered by this sheet is done or cancelled.
+        """
+        self._is_waiting = False
+        self._running_cue = None
+        next_cue = self._get_cue_to_follow(cue_item, done_normally)
+        planned_time = None # now, if it was cancelled before its end
+        if done_normally:
+            planned_time = cue_item.get_planned_time()
+        if self._is_looping:
+            self._next_cue = next_cue
+            self._next_planned_time = planned_time
+        elif next_cue is not None:
+            self._run_cues(next_cue, 0.0, planned_time)
+
+    def _get_cue_to_follow(self, cue_item, done_normally):
+        """
+        Selects the cue after a cue that is done.
+
+        @return: The cue to trigger next, or None if we are done.
+        """
+        if not self._is_running:
+            self._done()
+            return None # stopped
         next_cue = self.get_cue_after(cue_item.get_identifier())
-        if next_cue is None:
-            self.signal_sheet_done()
-            self._is_running = False # we are done
-        else:
+        if next_cue is not None:
             self.select_cue(next_cue.get_identifier())
-            if cue_item.get_follow() == FOLLOW_AUTO_CONTINUE:
-                # Pretty tricky: recursive inlineCallbacks deferreds
-                # But it seems to work OK
-                yield self._go_cue(next_cue)
-            else:
-                # that's it. We are done.
-                self.signal_sheet_done()
-                self._is_running = False # we are done
+            if cue_item.get_follow() in (FOLLOW_AUTO_CONTINUE,
+                    FOLLOW_WHEN_DONE):
+                return next_cue
+        # that's it. We are done.
+        self._is_running = False
+        self.signal_sheet_done()
+        self._done()
+        return None
+
+    def _done(self):
+        deferred = self._deferred
+        self._deferred = None
+        if deferred is not None:
+            deferred.callback(None)
 
     def stop(self):
         """
@@ -360,8 +692,8 @@ class CueSheet(object):
         """
         if self._is_running:
             self._is_running = False
-            for _cue in self._cues:
-                _cue.cancel()
+            if self._running_cue is not None:
+                self._running_cue.cancel()
         self.signal_sheet_stop()
 
     def get_selected_cue_index(self):
@@ -385,8 +717,25 @@ class CueSheet(object):
         return self._selected_identifier
 
     def rename_cue(self, identifier, new_identifier):
-        raise NotImplementedError("TODO")
-        return False
+        """
+        Changes the identifier of a cue.
+
+        Use this rather than L{Cue.set_identifier}, so that the cue sheet can
+        keep its index up to date.
+        @raise: L{RuntimeError}
+        """
+        if identifier == new_identifier:
+            return
+        if new_identifier in self._cue_nodes:
+            raise RuntimeError("There is already a cue %s" % (new_identifier))
+        node = self._get_cue_node(identifier)
+        del self._cue_nodes[identifier]
+        self._numbering.remove(identifier)
+        node.item.set_identifier(new_identifier)
+        self._cue_nodes[new_identifier] = node
+        self._numbering.add(new_identifier)
+        if self._selected_identifier == identifier:
+            self._selected_identifier = new_identifier
 
     def select_cue(self, identifier):
         """
@@ -421,8 +770,36 @@ class CueSheet(object):
         raise NotImplementedError("TODO")
 
     def generate_name_for_cue_after(self, identifier):
-        # TODO
-        raise NotImplementedError("TODO")
+        """
+        Returns an unused identifier that is numbered right after a cue.
+        @rtype: C{str}
+        @raise: L{RuntimeError}
+        """
+        if not self.has_cue(identifier):
+            raise RuntimeError("No such cue %s" % (identifier))
+        return self._numbering.generate_number_after(identifier)
+
+    def get_cues_in_number_range(self, first, last):
+        """
+        Returns the cues numbered from first to last, inclusively, sorted by
+        number.
+        @type first: C{str}, C{float} or C{int}
+        @type last: C{str}, C{float} or C{int}
+        @rtype: C{list}
+        """
+        return [self.get_cue_by_identifier(identifier)
+                for identifier in self._numbering.get_range(first, last)]
+
+    def get_first_cue_after_number(self, number):
+        """
+        Returns the cue with the smallest number greater than the given one.
+        @type number: C{str}, C{float} or C{int}
+        @return: Cue or None
+        """
+        identifier = self._numbering.get_first_after(number)
+        if identifier is None:
+            return None
+        return self.get_cue_by_identifier(identifier)
 
     def _select_next_cue(self):
         """
@@ -452,46 +829,109 @@ class CueSheet(object):
         """
         @rtype: C{list}
         """
-        return self._cues
+        return list(self._cues)
 
     def append_cue(self, value):
         """
         @param identifier: Number/identifier for the cue.
         @type value: L{Cue}
         """
+        self.insert_cue(len(self._cues), value)
+
+    def insert_cue(self, index, value):
+        """
+        Inserts a cue before the given index.
+        @type index: C{int}
+        @type value: L{Cue}
+        @raise: L{RuntimeError} if there is already a cue with that identifier.
+        """
+        identifier = value.get_identifier()
+        if identifier in self._cue_nodes:
+            raise RuntimeError("There is already a cue %s" % (identifier))
         was_empty = False
         if len(self._cues) == 0:
             was_empty = True
-        self._cues.append(value)
+        self._cue_nodes[identifier] = self._cues.insert(index, value,
+                value.get_duration())
+        self._numbering.add(identifier)
         if was_empty:
-            self._selected_identifier = value.get_identifier()
+            self._selected_identifier = identifier
 
-        # register to its signals
-        value.signal_go.connect(self._cue_go_cb)
-        value.signal_done_trigger.connect(self._cue_done_trigger_cb)
-        value.signal_done_pre_wait.connect(self._cue_cancelled_cb)
-        value.signal_done_post_wait.connect(self._cue_cancelled_cb)
-        value.signal_cancelled.connect(self._cue_cancelled_cb)
+        value._set_event_bus(self._event_bus)
+        self._event_bus.post(events.EVENT_ADDED, value)
 
-    def _cue_go_cb(self, cue_item):
-        self.signal_cue_go(cue_item)
+    def get_event_bus(self):
+        """
+        Returns the event bus that the cues of this sheet post to.
+        @rtype: L{openshow.events.EventBus}
+        """
+        return self._event_bus
 
-    def _cue_done_trigger_cb(self, cue_item):
-        self.signal_cue_done_trigger(cue_item)
+    def _get_event_cue_index(self, cue_item):
+        return self.get_cue_index(cue_item.get_identifier())
 
-    def _cue_done_pre_wait(self, cue_item):
-        self.signal_cue_done_pre_wait(cue_item)
+    def _cue_event_cb(self, event):
+        """
+        Emits the signal_cue_* signals of this sheet.
+        """
+        self._cue_signals[event.kind](event.cue)
 
-    def _cue_done_post_wait_cb(self, cue_item):
-        self.signal_cue_done_post_wait(cue_item)
+    def _cue_changed_cb(self, event):
+        """
+        Updates the timeline when the waits of a cue change.
+        """
+        self._cues.set_weight(self._get_cue_node(event.cue.get_identifier()),
+                event.cue.get_duration())
 
-    def _cue_cancelled_cb(self, cue_item):
-        self.signal_cue_cancelled(cue_item)
+    def get_cue_start_time(self, identifier):
+        """
+        Returns when a cue is planned to start, in seconds from the beginning
+        of the cue sheet.
 
-    def insert_cue(self, index, value):
-        # TODO: check current selected cue and change it accordingly
-        # TODO: check if identifier already exists
-        raise NotImplementedError("TODO")
+        The timeline assumes that each cue is followed by the next one, and
+        that actions take no time. Computed in O(log n).
+        @rtype: C{float}
+        @raise: L{RuntimeError}
+        """
+        return self._cues.get_weight_before(self._get_cue_node(identifier))
+
+    def get_cue_end_time(self, identifier):
+        """
+        Returns when a cue is planned to be done - after its post-wait.
+        @rtype: C{float}
+        @raise: L{RuntimeError}
+        """
+        node = self._get_cue_node(identifier)
+        return self._cues.get_weight_before(node) + node.weight
+
+    def get_total_duration(self):
+        """
+        Returns the planned duration of the whole cue sheet.
+        @rtype: C{float}
+        """
+        return self._cues.get_total_weight()
+
+    def get_cue_at_time(self, position):
+        """
+        Returns the cue that is planned to be active at a given time, in
+        seconds from the beginning of the cue sheet. Computed in O(log n).
+        @type position: C{float}
+        @return: Cue or None
+        """
+        node = self._cues.find_by_weight(position)
+        if node is None:
+            return None
+        return node.item
+
+    def _get_cue_node(self, identifier):
+        """
+        @rtype: L{openshow.cuelist.CueList} node
+        @raise: L{RuntimeError}
+        """
+        try:
+            return self._cue_nodes[identifier]
+        except KeyError:
+            raise RuntimeError("No such cue %s" % (identifier))
 
     def get_cue_by_identifier(self, identifier):
         """
@@ -501,11 +941,7 @@ class CueSheet(object):
         @rtype: L{Cue}
         @raise: L{RuntimeError}
         """
-        for _cue in self._cues:
-            if _cue.get_identifier() == identifier:
-                return _cue
-        raise RuntimeError("No such cue %s" % (identifier))
-        # return None
+        return self._get_cue_node(identifier).item
 
     def get_cue_index(self, identifier):
         """
@@ -514,25 +950,42 @@ class CueSheet(object):
         @raise: RuntimeError
         @type identifier: C{str}
         """
-        for i in range(len(self._cues)):
-            _cue = self._cues[i]
-            if _cue.get_identifier() == identifier:
-                return i
-        raise RuntimeError("No such cue %s" % (identifier))
+        return self._cues.index_of(self._get_cue_node(identifier))
 
     def has_cue(self, identifier):
         """
         @rtype: C{bool}
         """
-        try:
-            self.get_cue_by_identifier(identifier)
-            return True
-        except RuntimeError:
-            return False
+        return identifier in self._cue_nodes
 
     def remove_cue(self, identifier):
-        raise NotImplementedError("TODO")
-    
+        """
+        Removes a cue from this cue sheet.
+
+        If it was the selected cue, the cue that took its place is selected.
+        If it is running, it is cancelled first: if this sheet was running it,
+        it goes on with the cues that follow it, as if it were done.
+        @rtype: L{Cue}
+        @raise: L{RuntimeError}
+        """
+        node = self._get_cue_node(identifier)
+        node.item.cancel()
+        self._event_bus.post(events.EVENT_REMOVED, node.item)
+        index = self._cues.index_of(node)
+        _cue = self._cues.remove_node(node)
+        del self._cue_nodes[identifier]
+        self._numbering.remove(identifier)
+
+        _cue._set_event_bus(None)
+
+        if self._selected_identifier == identifier:
+            if len(self._cues) == 0:
+                self._selected_identifier = ""
+            else:
+                index = min(index, len(self._cues) - 1)
+                self.select_cue(self._cues[index].get_identifier())
+        return _cue
+
     def get_size(self):
         """
         @rtype: C{int}
@@ -0,0 +1,332 @@
+#!/usr/bin/env python
+# -*- coding: utf-8; tab-width: 4; mode: python -*-
+"""
+The CueList class: the ordered storage behind a cue sheet.
+
+It is an implicit treap: a randomized balanced binary tree in which each node
+knows the size of its subtree. The position of an item is never stored, it is
+computed from the shape of the tree, so that inserting or removing an item in
+the middle of a long list does not require to shift or renumber what follows.
+Looking up an item by index, finding the index of a node, inserting and
+removing all take O(log n) on average.
+
+Each item also has a weight, and each node knows the total weight of its
+subtree. A cue sheet uses it for the durations of its cues: the sum of the
+weights before an item is then its start time, and finding the item at a
+given time is a descent in the tree.
+"""
+import random
+
+
+class _Node(object):
+    """
+    A node of the treap. Its handle is given to the users of the list.
+    """
+    __slots__ = ("item", "priority", "size", "weight", "total", "left",
+            "right", "parent")
+
+    def __init__(self, item, weight):
+        self.item = item
+        self.priority = random.random()
+        self.size = 1
+        self.weight = weight
+        self.total = weight
+        self.left = None
+        self.right = None
+        self.parent = None
+
+
+def _size(node):
+    if node is None:
+        return 0
+    return node.size
+
+
+def _total(node):
+    if node is None:
+        return 0.0
+    return node.total
+
+
+def _update(node):
+    node.size = 1 + _size(node.left) + _size(node.right)
+    node.total = node.weight + _total(node.left) + _total(node.right)
+
+
+class CueList(object):
+    """
+    Ordered list of items with O(log n) positional access and edition.
+
+    Inserting an item returns its node. The node stays valid until the item
+    is removed, so that callers can keep an index of nodes (per identifier,
+    for example) and ask for their current position at any time.
+    """
+    def __init__(self, items=None):
+        self._root = None
+        if items is not None:
+            for item in items:
+                self.append(item)
+
+    def __len__(self):
+        return _size(self._root)
+
+    def __iter__(self):
+        stack = []
+        node = self._root
+        while stack or node is not None:
+            if node is not None:
+                stack.append(node)
+                node = node.left
+            else:
+                node = stack.pop()
+                yield node.item
+                node = node.right
+
+    def __getitem__(self, index):
+        return self.get_node(index).item
+
+    def get_node(self, index):
+        """
+        Returns the node at a given index.
+        @type index: C{int}
+        @raise: L{IndexError}
+        """
+        size = len(self)
+        if index < 0:
+            index += size
+        if index < 0 or index >= size:
+            raise IndexError("CueList index out of range: %s" % (index))
+        node = self._root
+        while True:
+            left_size = _size(node.left)
+            if index < left_size:
+                node = node.left
+            elif index == left_size:
+                return node
+            else:
+                index -= left_size + 1
+                node = node.right
+
+    def index_of(self, node):
+        """
+        Returns the current index of a node.
+        @rtype: C{int}
+        """
+        index = _size(node.left)
+        while node.parent is not None:
+            parent = node.parent
+            if parent.right is node:
+                index += _size(parent.left) + 1
+            node = parent
+        return index
+
+    def append(self, item, weight=0.0):
+        """
+        Appends an item at the end of the list.
+        @return: Its node.
+        """
+        # Walk down the right spine rather than splitting the whole tree:
+        # loading a project appends every cue, one after the other.
+        node = _Node(item, weight)
+        parent = None
+        current = self._root
+        while current is not None and current.priority > node.priority:
+            parent = current
+            current = current.right
+        node.left = current
+        if current is not None:
+            current.parent = node
+        _update(node)
+        node.parent = parent
+        if parent is None:
+            self._root = node
+        else:
+            parent.right = node
+            while parent is not None:
+                parent.size += 1
+                parent.total += weight
+                parent = parent.parent
+        return node
+
+    def insert(self, index, item, weight=0.0):
+        """
+        Inserts an item before the given index. Like list.insert, a negative
+        index counts from the end.
+        @return: Its node.
+        """
+        if index >= len(self):
+            return self.append(item, weight)
+        if index < 0:
+            index = max(index + len(self), 0)
+        node = _Node(item, weight)
+        left, right = self._split(self._root, index)
+        self._root = self._merge(self._merge(left, node), right)
+        self._root.parent = None
+        return node
+
+    def remove_node(self, node):
+        """
+        Removes a node from the list.
+        @return: Its item.
+        """
+        child = self._merge(node.left, node.right)
+        parent = node.parent
+        if child is not None:
+            child.parent = parent
+        if parent is None:
+            self._root = child
+        else:
+            if parent.left is node:
+                parent.left = child
+            else:
+                parent.right = child
+            while parent is not None:
+                _update(parent)
+                parent = parent.parent
+        node.left = None
+        node.right = None
+        node.parent = None
+        _update(node)
+        return node.item
+
+    def get_total_weight(self):
+        """
+        @rtype: C{float}
+        """
+        return _total(self._root)
+
+    def set_weight(self, node, weight):
+        """
+        Changes the weight of a node, in O(log n).
+        """
+        node.weight = weight
+        while node is not None:
+            _update(node)
+            node = node.parent
+
+    def get_weight_before(self, node):
+        """
+        Returns the sum of the weights of the items before a node.
+        @rtype: C{float}
+        """
+        ret = _total(node.left)
+        while node.parent is not None:
+            parent = node.parent
+            if parent.right is node:
+                ret += _total(parent.left) + parent.weight
+            node = parent
+        return ret
+
+    def find_by_weight(self, position):
+        """
+        Returns the node whose weight spans a given position, that is the
+        first node for which the sum of its weight and of the weights before
+        it is greater than the position. Nodes with no weight are never
+        returned.
+        @return: A node, or None if the position is out of bounds.
+        """
+        if position < 0.0 or position >= self.get_total_weight():
+            return None
+        node = self._root
+        while True:
+            left_total = _total(node.left)
+            if position < left_total:
+                node = node.left
+            elif position < left_total + node.weight:
+                return node
+            elif node.right is None:
+                return node # rounding errors
+            else:
+                position -= left_total + node.weight
+                node = node.right
+
+    def bisect_left(self, value, key=None):
+        """
+        Returns where to insert a value in a list sorted by key(item), before
+        the items that are equal to it, as L{bisect.bisect_left} does.
+        @param key: Function that returns what to compare an item with. The
+        item itself if None.
+        @rtype: C{int}
+        """
+        index = 0
+        node = self._root
+        while node is not None:
+            item_key = node.item if key is None else key(node.item)
+            if item_key < value:
+                index += _size(node.left) + 1
+                node = node.right
+            else:
+                node = node.left
+        return index
+
+    def bisect_right(self, value, key=None):
+        """
+        Returns where to insert a value in a list sorted by key(item), after
+        the items that are equal to it, as L{bisect.bisect_right} does.
+        @rtype: C{int}
+        """
+        index = 0
+        node = self._root
+        while node is not None:
+            item_key = node.item if key is None else key(node.item)
+            if value < item_key:
+                node = node.left
+            else:
+                index += _size(node.left) + 1
+                node = node.right
+        return index
+
+    def pop(self, index=-1):
+        """
+        Removes the item at a given index and returns it.
+        @raise: L{IndexError}
+        """
+        return self.remove_node(self.get_node(index))
+
+    def _split(self, node, count):
+        """
+        Splits a subtree into one that contains its first count items and one
+        that contains the others.
+        """
+        if node is None:
+            return None, None
+        left_size = _size(node.left)
+        if count <= left_size:
+            left, right = self._split(node.left, count)
+            node.left = right
+            if right is not None:
+                right.parent = node
+            _update(node)
+            if left is not None:
+                left.parent = None
+            node.parent = None
+            return left, node
+        else:
+            left, right = self._split(node.right, count - left_size - 1)
+            node.right = left
+            if left is not None:
+                left.parent = node
+            _update(node)
+            if right is not None:
+                right.parent = None
+            node.parent = None
+            return node, right
+
+    def _merge(self, left, right):
+        """
+        Merges two subtrees. All the items of left come before those of right.
+        """
+        if left is None:
+            return right
+        if right is None:
+            return left
+        if left.priority > right.priority:
+            left.right = self._merge(left.right, right)
+            left.right.parent = left
+            _update(left)
+            return left
+        else:
+            right.left = self._merge(left, right.left)
+            right.left.parent = right
+            _update(right)
+            return right
@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+# -*- coding: utf-8; tab-width: 4; mode: python -*-
+"""
+The EventBus class: where the cues of a cue sheet post what happens to them.
+
+Each cue posts its events to the bus of its cue sheet, which calls the
+subscribers interested in that kind of event - and in that cue, if they
+subscribed to a range of cues. Nothing is connected per cue.
+"""
+
+# Kinds of events:
+EVENT_GO = "go"
+EVENT_DONE_TRIGGER = "done_trigger" # value: how many seconds its action took
+EVENT_DONE_PRE_WAIT = "done_pre_wait" # value: how many seconds late
+EVENT_DONE_POST_WAIT = "done_post_wait" # value: how many seconds late
+EVENT_CANCELLED = "cancelled"
+CUE_EVENTS = (EVENT_GO, EVENT_DONE_TRIGGER, EVENT_DONE_PRE_WAIT,
+        EVENT_DONE_POST_WAIT, EVENT_CANCELLED)
+# Not part of CUE_EVENTS, since it is not about running the cue:
+EVENT_CHANGED = "changed" # its pre-wait, post-wait or trigger changed
+EVENT_ADDED = "added" # to the cue sheet
+EVENT_REMOVED = "removed" # from the cue sheet, posted right before
+# Not part of CUE_EVENTS either, since only some subscribers care:
+EVENT_LATE = "late" # value: how many seconds after its planned time
+
+
+class CueEvent(object):
+    """
+    Something that happened to a cue.
+
+    @ivar kind: One of the EVENT_* constants.
+    @ivar cue: The L{openshow.cue.Cue}.
+    @ivar value: Extra information, depending on the kind of event.
+    @ivar time: When it happened, in the time of the clock of
+    L{openshow.timer}, or None if the cue did not tell.
+    """
+    __slots__ = ("kind", "cue", "value", "time")
+
+    def __init__(self, kind, cue, value=None, time=None):
+        self.kind = kind
+        self.cue = cue
+        self.value = value
+        self.time = time
+
+    def __str__(self):
+        return "CueEvent(%s %s %s)" % (self.kind, self.cue.get_identifier(),
+                self.value)
+
+
+class Subscription(object):
+    """
+    Returned by L{EventBus.subscribe}. Give it back to unsubscribe.
+    """
+    __slots__ = ("callback", "kinds", "first", "last")
+
+    def __init__(self, callback, kinds, first, last):
+        self.callback = callback
+        self.kinds = kinds
+        self.first = first
+        self.last = last
+
+    def is_ranged(self):
+        return self.first is not None or self.last is not None
+
+    def is_in_range(self, index):
+        if self.first is not None and index < self.first:
+            return False
+        if self.last is not None and index > self.last:
+            return False
+        return True
+
+
+class EventBus(object):
+    """
+    Dispatches cue events to the subscribers of their kind.
+
+    Unlike L{openshow.sig.Signal}, the bus keeps strong references to the
+    callbacks: unsubscribe when you are done.
+    """
+    def __init__(self, get_cue_index=None):
+        """
+        @param get_cue_index: Returns the index of a cue. Needed to subscribe
+        to a range of cues.
+        @type get_cue_index: C{callable}
+        """
+        self._get_cue_index = get_cue_index
+        self._subscribers = {} # kind -> tuple of Subscription
+        self._recorder = None
+
+    def subscribe(self, callback, kinds=None, first=None, last=None):
+        """
+        Calls a callback with a L{CueEvent} for each event of the given kinds
+        posted by the cues whose index is from first to last, inclusively.
+
+        @param kinds: Kinds of events. All the CUE_EVENTS if None.
+        @type kinds: C{list}
+        @param first: Index of the first cue. The first one if None.
+        @param last: Index of the last cue. The last one if None.
+        @rtype: L{Subscription}
+        """
+        if kinds is None:
+            kinds = CUE_EVENTS
+        subscription = Subscription(callback, tuple(kinds), first, last)
+        if subscription.is_ranged() and self._get_cue_index is None:
+            raise RuntimeError("This event bus does not know cue indices.")
+        for kind in subscription.kinds:
+            # Replaced rather than modified, so that a callback can
+            # (un)subscribe while we iterate on it.
+            self._subscribers[kind] = self._subscribers.get(kind, ()) + (
+                    subscription,)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """
+        @type subscription: L{Subscription}
+        """
+        for kind in subscription.kinds:
+            remaining = tuple(item for item in self._subscribers.get(kind, ())
+                    if item is not subscription)
+            if remaining:
+                self._subscribers[kind] = remaining
+            elif kind in self._subscribers:
+                del self._subscribers[kind]
+
+    def set_recorder(self, recorder):
+        """
+        Sets a function that is called with the kind, the cue, the value and
+        the time of every event that is posted, before the subscribers are called and
+        without creating a L{CueEvent}, for recording them at a low cost.
+        There is only one: see L{openshow.trace.EventTrace}.
+        @param recorder: The function, or None.
+        @type recorder: C{callable}
+        """
+        self._recorder = recorder
+
+    def has_subscribers(self, kind):
+        """
+        @rtype: C{bool}
+        """
+        return kind in self._subscribers
+
+    def post(self, kind, cue, value=None, time=None):
+        """
+        Called by a cue when something happens to it.
+        @param time: When it happened, if the cue knows: the recorder does not
+        read the clock. Given for all the events of CUE_EVENTS and EVENT_LATE.
+        @type time: C{float}
+        """
+        if self._recorder is not None:
+            self._recorder(kind, cue, value, time)
+        subscribers = self._subscribers.get(kind)
+        if subscribers is None:
+            return
+        event = CueEvent(kind, cue, value, time)
+        index = None
+        for subscription in subscribers:
+            if subscription.first is not None or subscription.last is not None:
+                if index is None:
+                    index = self._get_cue_index(cue)
+                if not subscription.is_in_range(index):
+                    continue
+            subscription.callback(event)
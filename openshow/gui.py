@@ -11,7 +11,12 @@ import sys
 import wx
 import os
 from openshow import cue
+from openshow import lookahead
 from openshow import project
+from openshow import remote
+from openshow import stats
+from openshow import trace
+from openshow import triggers
 
 
 def show_open_file_dialog(parent):
@@ -89,6 +94,11 @@ class MainFrame(wx.Frame):
         self.SetAutoLayout(True)
         self._columns_created = False
         self._cue_sheet = cue.CueSheet()
+        self._stats = stats.CueStats()
+        self._trace = trace.EventTrace()
+        self._lookahead = lookahead.Lookahead()
+        self._remote = remote.RemoteControl()
+        self._triggers = triggers.TriggerIndex()
         self._connect_to_new_cue_sheet_signals()
         self._current_item = 0 # Do this before _populate_list_ctrl
         self._populate_list_ctrl()
@@ -98,9 +108,52 @@ class MainFrame(wx.Frame):
     def set_status_bar_text(self, text):
         self._widget_status_bar.PushStatusText(text)
 
+    def get_stats(self):
+        """
+        Returns the latency statistics of the cues that were run.
+        @rtype: L{openshow.stats.CueStats}
+        """
+        return self._stats
+
+    def get_lookahead(self):
+        """
+        Returns what sends the actions of the cues ahead of time. Disabled
+        unless its lookahead is set.
+        @rtype: L{openshow.lookahead.Lookahead}
+        """
+        return self._lookahead
+
+    def get_remote(self):
+        """
+        Returns what operates the cue sheet with OSC messages, once
+        registered with a server.
+        @rtype: L{openshow.remote.RemoteControl}
+        """
+        return self._remote
+
+    def get_triggers(self):
+        """
+        Returns what starts the cues that have a trigger, once registered
+        with a server.
+        @rtype: L{openshow.triggers.TriggerIndex}
+        """
+        return self._triggers
+
+    def get_trace(self):
+        """
+        Returns the trace of the last events of the cues.
+        @rtype: L{openshow.trace.EventTrace}
+        """
+        return self._trace
+
     def _connect_to_new_cue_sheet_signals(self):
         self._cue_sheet.signal_sheet_selected_cue_changed.connect(
                 self._cue_sheet_selected_cue_changed_cb)
+        self._stats.attach(self._cue_sheet)
+        self._trace.attach(self._cue_sheet)
+        self._lookahead.attach(self._cue_sheet)
+        self._remote.attach(self._cue_sheet)
+        self._triggers.attach(self._cue_sheet)
 
     def load_cue_sheet(self, project_file_path):
         try:
@@ -0,0 +1,196 @@
+#!/usr/bin/env python
+# -*- coding: utf-8; tab-width: 4; mode: python -*-
+"""
+The Lookahead class.
+
+However precise the sequencer is, the network and the receivers add their
+own latency between the time a cue is executed and the time a device acts.
+OSC bundles carry a time tag for that: a receiver that honors it acts at
+that time, not when the bundle arrives.
+
+In lookahead mode, the actions of the cues that are about to be executed
+are sent a while before their planned time, stamped with it. When their
+cues are executed, they do not send again. The times of the cues are known
+in advance along a chain of cues that auto-continue; the lookahead stops at
+a cue that waits for its action to be done, and resumes when the next cue
+starts.
+
+If a cue is cancelled after its action was sent ahead, the action sends its
+cancel message, if it has one, stamped with the same time. The actions that
+cannot be undone are only sent ahead within the guard window, which is
+shorter, or not at all if it is 0.
+
+Usage:
+    lookahead = Lookahead(0.02)
+    lookahead.attach(cue_sheet)
+    cue_sheet.go()
+"""
+from openshow import cue
+from openshow import events
+from openshow import timer
+
+_EVENTS = (events.EVENT_GO, events.EVENT_DONE_PRE_WAIT,
+        events.EVENT_CANCELLED)
+
+
+class Lookahead(object):
+    """
+    Sends the actions of the cues of a cue sheet ahead of time.
+    """
+    def __init__(self, lookahead=0.0, guard=0.0):
+        """
+        @param lookahead: How many seconds ahead to send. 0 disables it.
+        @type lookahead: C{float}
+        @param guard: How many seconds ahead to send the actions that cannot
+        be undone. At most the lookahead.
+        @type guard: C{float}
+        """
+        self._lookahead = lookahead
+        self._guard = guard
+        self._cue_sheet = None
+        self._subscription = None
+        self._cursor = None # (cue, action time) next cue to look at
+        self._cursor_call = None # when to look at it
+        self._ahead = {} # cue -> (action time, call to send it, or None once sent)
+
+    def set_lookahead(self, lookahead, guard=0.0):
+        """
+        @param lookahead: How many seconds ahead to send. 0 disables it.
+        @type lookahead: C{float}
+        @param guard: How many seconds ahead to send the actions that cannot
+        be undone. At most the lookahead.
+        @type guard: C{float}
+        """
+        self._lookahead = lookahead
+        self._guard = guard
+
+    def get_lookahead(self):
+        """
+        @rtype: C{float}
+        """
+        return self._lookahead
+
+    def get_guard(self):
+        """
+        @rtype: C{float}
+        """
+        return self._guard
+
+    def attach(self, cue_sheet):
+        """
+        Starts to send the actions of the cues of a cue sheet ahead, instead
+        of the one it was attached to, if any.
+        @type cue_sheet: L{openshow.cue.CueSheet}
+        """
+        self.detach()
+        self._cue_sheet = cue_sheet
+        self._subscription = cue_sheet.get_event_bus().subscribe(
+                self._cue_event_cb, _EVENTS)
+
+    def detach(self):
+        """
+        Stops sending ahead, and undoes what was sent ahead.
+        """
+        if self._cue_sheet is not None:
+            self.cancel()
+            self._cue_sheet.get_event_bus().unsubscribe(self._subscription)
+            self._cue_sheet = None
+            self._subscription = None
+
+    def is_sent_ahead(self, cue_item):
+        """
+        Tells if the action of a cue was sent ahead of its next execution.
+        @type cue_item: L{openshow.cue.Cue}
+        @rtype: C{bool}
+        """
+        entry = self._ahead.get(cue_item)
+        return entry is not None and entry[1] is None
+
+    def _cue_event_cb(self, event):
+        if event.kind == events.EVENT_DONE_PRE_WAIT:
+            entry = self._ahead.pop(event.cue, None)
+            if entry is not None and entry[1] is not None:
+                entry[1].cancel() # executed before it was sent
+        elif event.kind == events.EVENT_GO:
+            if self._lookahead > 0.0 and self._cursor is None:
+                action_time = event.cue.get_planned_time()
+                if event.cue in self._ahead:
+                    self._cursor = self._get_next(event.cue, action_time)
+                else:
+                    self._cursor = (event.cue, action_time)
+                self._look()
+        elif event.kind == events.EVENT_CANCELLED:
+            # What follows it no longer happens when planned.
+            self.cancel()
+
+    def _get_next(self, cue_item, action_time):
+        """
+        Returns the cue that follows a cue, and when its action is planned to
+        be executed, if it can be known in advance.
+        @rtype: C{tuple}
+        """
+        if not self._cue_sheet.is_running():
+            return None # triggered alone
+        if cue_item.get_follow() != cue.FOLLOW_AUTO_CONTINUE:
+            return None # waits for its action to be done, or stops there
+        next_cue = self._cue_sheet.get_cue_after(cue_item.get_identifier())
+        if next_cue is None:
+            return None
+        return (next_cue, action_time + cue_item.get_post_wait() +
+                next_cue.get_pre_wait())
+
+    def _look(self):
+        """
+        Looks at the cues whose action is planned within the lookahead.
+        """
+        self._cursor_call = None
+        now = timer.get_sequencer().seconds()
+        while self._cursor is not None:
+            cue_item, action_time = self._cursor
+            if action_time - self._lookahead > now:
+                self._cursor_call = timer.call_at(
+                        action_time - self._lookahead, self._look)
+                return
+            self._schedule(cue_item, action_time, now)
+            self._cursor = self._get_next(cue_item, action_time)
+
+    def _schedule(self, cue_item, action_time, now):
+        """
+        Sends the action of a cue now, or within the guard window.
+        """
+        action = cue_item.get_action()
+        if action is None or action_time <= now:
+            return
+        advance = self._lookahead
+        if not action.can_cancel_ahead():
+            advance = min(self._guard, self._lookahead)
+        if advance <= 0.0:
+            return
+        if action_time - advance <= now:
+            self._send(cue_item, action_time)
+        else:
+            self._ahead[cue_item] = (action_time, timer.call_at(
+                    action_time - advance, self._send, cue_item, action_time))
+
+    def _send(self, cue_item, action_time):
+        if cue_item.get_action().send_ahead(action_time):
+            self._ahead[cue_item] = (action_time, None)
+        else:
+            self._ahead.pop(cue_item, None)
+
+    def cancel(self):
+        """
+        Undoes what was sent ahead and not executed yet, and stops looking
+        ahead until the next cue starts.
+        """
+        if self._cursor_call is not None:
+            self._cursor_call.cancel()
+            self._cursor_call = None
+        self._cursor = None
+        ahead = self._ahead
+        self._ahead = {}
+        for cue_item, (action_time, call) in ahead.items():
+            if call is not None:
+                call.cancel()
+            elif cue_item.get_action() is not None:
+                cue_item.get_action().cancel_ahead()
@@ -0,0 +1,183 @@
+#!/usr/bin/env python
+# -*- coding: utf-8; tab-width: 4; mode: python -*-
+"""
+Natural ordering of cue identifiers.
+
+Cue identifiers are usually numbers, sometimes with decimals or with a
+letter suffix: "1", "1.5", "12a". They sort by their numeric value first
+("2" comes before "10"), then by their suffix. Identifiers that do not start
+with a number sort after all the numbered ones, alphabetically.
+
+Numbers are compared as an (integer part, decimal digits) pair rather than as
+Decimal objects, since sorting large sheets compares them a lot.
+
+The index keeps the sort keys in a L{openshow.cuelist.CueList}, the treap of
+the cue sheet: adding, removing or renaming a cue takes O(log n), instead of
+shifting the keys that follow it.
+"""
+import decimal
+import operator
+import re
+from openshow import cuelist
+
+_NUMBER_RE = re.compile(r"^\s*(\d*)(?:\.(\d*))?(.*)$")
+_NUMBERED = 0
+_NOT_NUMBERED = 1
+_MAX_DECIMALS = 6
+_get_number = operator.itemgetter(0) # of a sort key
+
+
+def _split_number(text):
+    """
+    Returns the (integer part, decimal digits) of the number at the beginning
+    of a string, and what follows it, or None if it does not start with a
+    number.
+    """
+    match = _NUMBER_RE.match(text)
+    integer, decimals, suffix = match.groups()
+    if integer == "" and not decimals:
+        return None
+    # "1.50" is "1.5", and "1.05" sorts before "1.5" as a string
+    return (int(integer or "0"), (decimals or "").rstrip("0")), suffix
+
+
+def to_number(value):
+    """
+    Converts a cue number given as a string, an int, a float or a Decimal to
+    the (category, (integer part, decimal digits)) form used in the keys.
+    @raise: L{ValueError}
+    """
+    if isinstance(value, float):
+        # repr() is exact, but "1e-05" has no digits after a point:
+        value = decimal.Decimal(repr(value))
+    if isinstance(value, decimal.Decimal):
+        text = format(value, "f")
+    else:
+        text = str(value)
+    parsed = _split_number(text)
+    if parsed is None or parsed[1].strip() != "":
+        raise ValueError("Not a cue number: %s" % (value))
+    return (_NUMBERED, parsed[0])
+
+
+def _to_decimal(number):
+    integer, decimals = number[1]
+    return decimal.Decimal("%d.%s" % (integer, decimals or "0"))
+
+
+def parse_cue_number(identifier):
+    """
+    Returns the sort key of a cue identifier.
+
+    The key is a tuple whose first item is itself a (category, number) tuple,
+    so that keys can be compared to plain numbers in range queries.
+    @type identifier: C{str}
+    @rtype: C{tuple}
+    """
+    parsed = _split_number(identifier)
+    if parsed is None:
+        return ((_NOT_NUMBERED, (0, "")), identifier, identifier)
+    number, suffix = parsed
+    return ((_NUMBERED, number), suffix.strip(), identifier)
+
+
+class CueNumberIndex(object):
+    """
+    Cue identifiers, sorted by cue number.
+
+    Queries are binary searches, in O(log n), and so are edits.
+    """
+    def __init__(self):
+        self._keys = cuelist.CueList() # sort keys, sorted
+        self._nodes = {} # identifier -> node in self._keys
+
+    def __len__(self):
+        return len(self._keys)
+
+    def add(self, identifier):
+        """
+        @type identifier: C{str}
+        """
+        key = parse_cue_number(identifier)
+        index = self._keys.bisect_left(key)
+        self._nodes[identifier] = self._keys.insert(index, key)
+
+    def remove(self, identifier):
+        """
+        @type identifier: C{str}
+        @raise: L{RuntimeError}
+        """
+        node = self._nodes.pop(identifier, None)
+        if node is None:
+            raise RuntimeError("No such cue %s" % (identifier))
+        self._keys.remove_node(node)
+
+    def get_identifiers(self):
+        """
+        Returns all the identifiers, in numbering order.
+        @rtype: C{list}
+        """
+        return [key[2] for key in self._keys]
+
+    def get_range(self, first, last):
+        """
+        Returns the identifiers whose number is between first and last,
+        inclusively. "12a" is within the range 10 to 12.
+        @rtype: C{list}
+        """
+        start = self._keys.bisect_left(to_number(first), _get_number)
+        end = self._keys.bisect_right(to_number(last), _get_number)
+        return [self._keys[index][2] for index in range(start, end)]
+
+    def get_first_after(self, number):
+        """
+        Returns the first identifier whose number is greater than the given
+        one, or None.
+        """
+        index = self._keys.bisect_right(to_number(number), _get_number)
+        if index < len(self._keys):
+            key = self._keys[index]
+            if key[0][0] == _NUMBERED:
+                return key[2]
+        return None
+
+    def get_last_before(self, number):
+        """
+        Returns the last identifier whose number is smaller than the given
+        one, or None.
+        """
+        index = self._keys.bisect_left(to_number(number), _get_number)
+        if index > 0:
+            return self._keys[index - 1][2]
+        return None
+
+    def generate_number_after(self, identifier):
+        """
+        Returns a free cue number that sorts right after the given identifier.
+
+        Whole numbers are preferred, then one decimal, then two, etc:
+        after "1" comes "2", unless "2" exists, in which case it is "1.1".
+        For an identifier that is not numbered, it is a number after the
+        greatest numbered cue.
+        @rtype: C{str}
+        @raise: L{RuntimeError}
+        """
+        number = parse_cue_number(identifier)[0]
+        if number[0] != _NUMBERED:
+            index = self._keys.bisect_left((_NOT_NUMBERED,), _get_number)
+            if index == 0:
+                number = (_NUMBERED, (0, ""))
+            else:
+                number = self._keys[index - 1][0]
+        value = _to_decimal(number)
+        after = self.get_first_after(value)
+        limit = None
+        if after is not None:
+            limit = _to_decimal(parse_cue_number(after)[0])
+        for places in range(_MAX_DECIMALS + 1):
+            step = decimal.Decimal(1).scaleb(-places)
+            candidate = (value / step).to_integral_value(
+                    rounding=decimal.ROUND_FLOOR) * step + step
+            if limit is None or candidate < limit:
+                return str(candidate.quantize(step))
+        raise RuntimeError("No cue number left after %s" % (identifier))
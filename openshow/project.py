@@ -9,6 +9,7 @@ Usage:
 from xml.dom import minidom
 import os
 from openshow import cue
+from openshow import triggers
 from openshow.actions import osc
 
 
@@ -73,8 +74,24 @@ class ProjectPersistance(object):
                 name = self._parse_attribute(attr, "name")
                 value = self._parse_attribute(attr, "value")
                 action.set_attribute(name, value)
+            action.prepare()
 
-            _cue = cue.Cue(_identifier, _pre_wait, _post_wait, _title, action, follow=_follow);
+            # Optional trigger on incoming OSC messages
+            _trigger = None
+            trigger_elements = cue_element.getElementsByTagName("trigger")
+            if len(trigger_elements) > 1:
+                raise RuntimeError("Found %d triggers, only one trigger "
+                        "supported." % (len(trigger_elements)))
+            if len(trigger_elements) == 1:
+                trigger_element = trigger_elements[0]
+                _trigger = triggers.Trigger(
+                        self._parse_attribute(trigger_element, "address", ""),
+                        self._parse_attribute(trigger_element, "condition",
+                        triggers.CONDITION_ANY),
+                        self._parse_attribute(trigger_element, "value"),
+                        self._parse_attribute(trigger_element, "index", 0))
+
+            _cue = cue.Cue(_identifier, _pre_wait, _post_wait, _title, action, follow=_follow, trigger=_trigger);
             ret.append(_cue)
         return ret
 
@@ -0,0 +1,387 @@
+#!/usr/bin/env python
+# -*- coding: utf-8; tab-width: 4; mode: python -*-
+"""
+Remote control over OSC.
+
+The OscServer class receives OSC messages over UDP, and over TCP if asked
+to, and calls the handlers of their addresses, found with an
+L{openshow.addresses.AddressTrie}. It decodes the messages itself, without
+building any object but the list of their arguments. The messages of a
+bundle are handled when it arrives, whatever its time tag. A TCP connection is
+closed when it sends an invalid frame, or one of more than MAX_FRAME_SIZE
+bytes.
+
+The RemoteControl class handles these messages for the cue sheet it is
+attached to:
+    /openshow/go
+    /openshow/stop
+    /openshow/select <cue identifier>
+
+Usage:
+    server = OscServer()
+    remote = RemoteControl()
+    remote.register(server)
+    remote.attach(cue_sheet)
+    server.listen_udp(13333)
+"""
+import socket
+import struct
+from twisted.internet import defer
+from twisted.internet import protocol
+from twisted.python import log
+from openshow import addresses
+from openshow.actions import bundles
+from openshow.actions import tcp
+
+ADDRESS_GO = "/openshow/go"
+ADDRESS_STOP = "/openshow/stop"
+ADDRESS_SELECT = "/openshow/select"
+
+RECEIVE_BUFFER_SIZE = 1048576 # bytes of datagrams the kernel keeps for us
+# Bytes a framed packet can take over TCP, as much as the largest datagram:
+MAX_FRAME_SIZE = 65536
+_INT32 = struct.Struct(">i")
+_INT64 = struct.Struct(">q")
+_UINT64 = struct.Struct(">Q")
+_FLOAT = struct.Struct(">f")
+_DOUBLE = struct.Struct(">d")
+_CONSTANTS = {"T": True, "F": False, "N": None, "I": float("inf")}
+
+if bytes is str:
+    def _to_str(data):
+        return data
+else:
+    def _to_str(data):
+        return data.decode("utf-8", "replace")
+
+
+def _read_string(data, offset):
+    """
+    @return: The string at an offset, and the offset after its padding.
+    @rtype: C{tuple}
+    """
+    end = data.index(b"\0", offset)
+    return _to_str(data[offset:end]), (end + 4) & ~3
+
+
+def decode_message(data):
+    """
+    Decodes an OSC message.
+    @type data: C{bytes}
+    @return: Its address, and the list of its arguments.
+    @rtype: C{tuple}
+    @raise: L{RuntimeError} if it is invalid.
+    """
+    try:
+        address, offset = _read_string(data, 0)
+        if offset >= len(data):
+            return address, [] # no type tags, as in old OSC
+        type_tags, offset = _read_string(data, offset)
+        if not type_tags.startswith(","):
+            raise RuntimeError("Invalid OSC type tags %s" % (type_tags))
+        args = []
+        for tag in type_tags[1:]:
+            if tag == "i":
+                args.append(_INT32.unpack_from(data, offset)[0])
+                offset += 4
+            elif tag == "f":
+                args.append(_FLOAT.unpack_from(data, offset)[0])
+                offset += 4
+            elif tag == "s" or tag == "S":
+                value, offset = _read_string(data, offset)
+                args.append(value)
+            elif tag in _CONSTANTS:
+                args.append(_CONSTANTS[tag])
+            elif tag == "h":
+                args.append(_INT64.unpack_from(data, offset)[0])
+                offset += 8
+            elif tag == "d":
+                args.append(_DOUBLE.unpack_from(data, offset)[0])
+                offset += 8
+            elif tag == "t":
+                args.append(_UINT64.unpack_from(data, offset)[0])
+                offset += 8
+            elif tag == "b":
+                size = _INT32.unpack_from(data, offset)[0]
+                offset += 4
+                if size < 0 or offset + size > len(data):
+                    raise RuntimeError("Invalid OSC blob size %d" % (size))
+                args.append(data[offset:offset + size])
+                offset += (size + 3) & ~3
+            elif tag == "c":
+                args.append(chr(_INT32.unpack_from(data, offset)[0]))
+                offset += 4
+            elif tag == "r" or tag == "m":
+                args.append(data[offset:offset + 4])
+                offset += 4
+            else:
+                raise RuntimeError("Unsupported OSC type tag %s" % (tag))
+        return address, args
+    except (ValueError, struct.error) as e:
+        raise RuntimeError("Invalid OSC message: %s" % (e))
+
+
+def decode_packet(data):
+    """
+    Decodes an OSC message, or the messages of a bundle, in order.
+    @type data: C{bytes}
+    @return: List of (address, arguments).
+    @rtype: C{list}
+    @raise: L{RuntimeError} if it is invalid.
+    """
+    if not data.startswith(bundles.BUNDLE_TAG):
+        return [decode_message(data)]
+    messages = []
+    offset = bundles.BUNDLE_HEADER_SIZE
+    while offset < len(data):
+        if offset + bundles.ELEMENT_HEADER_SIZE > len(data):
+            raise RuntimeError("Invalid OSC bundle")
+        size = _INT32.unpack_from(data, offset)[0]
+        offset += bundles.ELEMENT_HEADER_SIZE
+        if size < 0 or offset + size > len(data):
+            raise RuntimeError("Invalid OSC bundle element size %d" % (size))
+        messages.extend(decode_packet(data[offset:offset + size]))
+        offset += size
+    return messages
+
+
+class _UdpReceiverProtocol(protocol.DatagramProtocol):
+    def __init__(self, server):
+        self._server = server
+
+    def datagramReceived(self, data, address):
+        self._server.handle_packet(data)
+
+
+class _TcpReceiverProtocol(protocol.Protocol):
+    """
+    Keeps the chunks of the incomplete frame in a list, and only joins them
+    once the frame is complete, not for each chunk that arrives.
+    """
+    def __init__(self, server, framing):
+        self._server = server
+        self._framing = framing
+        self._chunks = [] # of the incomplete frame, None once dropped
+        self._size = 0 # bytes in the chunks
+        self._needed = 1 # bytes to have before decoding again
+
+    def connectionMade(self):
+        self._server._connections.append(self)
+
+    def dataReceived(self, data):
+        if self._chunks is None:
+            return
+        self._chunks.append(data)
+        self._size += len(data)
+        if self._framing == tcp.FRAMING_SLIP:
+            is_complete = tcp.SLIP_END in data
+        else:
+            is_complete = self._size >= self._needed
+        if not is_complete:
+            if self._size > MAX_FRAME_SIZE:
+                self._drop("frame of more than %d bytes" % (MAX_FRAME_SIZE))
+            return
+        try:
+            packets, rest = tcp.decode_frames(b"".join(self._chunks),
+                    self._framing)
+            if self._framing == tcp.FRAMING_LENGTH:
+                self._needed = tcp.get_length_frame_size(rest)
+        except RuntimeError as e:
+            self._drop(str(e))
+            return
+        self._chunks = [rest]
+        self._size = len(rest)
+        for packet in packets:
+            self._server.handle_packet(packet)
+        if max(self._size, self._needed) > MAX_FRAME_SIZE:
+            self._drop("frame of more than %d bytes" % (MAX_FRAME_SIZE))
+
+    def _drop(self, reason):
+        """
+        Closes the connection, instead of keeping what never ends.
+        """
+        self._chunks = None
+        self._server._error_count += 1
+        log.msg("Closing the OSC connection from %s: %s" % (
+                self.transport.getPeer(), reason))
+        self.transport.loseConnection()
+
+    def connectionLost(self, reason):
+        self._server._connections.remove(self)
+
+
+class _TcpReceiverFactory(protocol.ServerFactory):
+    noisy = False
+
+    def __init__(self, server, framing):
+        self._server = server
+        self._framing = framing
+
+    def buildProtocol(self, address):
+        return _TcpReceiverProtocol(self._server, self._framing)
+
+
+class OscServer(object):
+    """
+    Receives OSC messages, and calls the handlers of their addresses.
+    """
+    def __init__(self, reactor=None):
+        """
+        @param reactor: The reactor to listen with. The global one if None.
+        """
+        if reactor is None:
+            from twisted.internet import reactor
+        self._reactor = reactor
+        self._addresses = addresses.AddressTrie()
+        self._listening_ports = []
+        self._connections = [] # TCP protocols
+        self._message_count = 0
+        self._error_count = 0
+
+    def add_handler(self, address, handler):
+        """
+        Adds a handler to an OSC address.
+        @param address: Address without wildcards, such as "/openshow/go".
+        @type address: C{str}
+        @param handler: Called with the address pattern and the list of
+        arguments of each message that matches it.
+        @raise: L{RuntimeError} if the address is invalid.
+        """
+        self._addresses.add(address, handler)
+
+    def remove_handler(self, address, handler):
+        """
+        @raise: L{RuntimeError} if it was not added.
+        """
+        self._addresses.remove(address, handler)
+
+    def handle_packet(self, data):
+        """
+        Calls the handlers of an OSC message, or of the messages of a bundle.
+        Invalid packets are dropped, and counted.
+        @type data: C{bytes}
+        """
+        try:
+            messages = decode_packet(data)
+        except RuntimeError as e:
+            self._error_count += 1
+            if self._error_count == 1:
+                log.msg("Dropping invalid OSC packets: %s" % (e))
+            return
+        match = self._addresses.match
+        for address, args in messages:
+            self._message_count += 1
+            for handler in match(address):
+                try:
+                    handler(address, args)
+                except Exception:
+                    log.err(None, "Could not handle OSC message %s %s" % (
+                            address, args))
+
+    def get_message_count(self):
+        """
+        Returns how many messages were received so far.
+        @rtype: C{int}
+        """
+        return self._message_count
+
+    def get_error_count(self):
+        """
+        Returns how many invalid packets were dropped so far.
+        @rtype: C{int}
+        """
+        return self._error_count
+
+    def listen_udp(self, port, interface=""):
+        """
+        @type port: C{int}
+        @rtype: L{twisted.internet.interfaces.IListeningPort}
+        @raise: L{twisted.internet.error.CannotListenError}
+        """
+        listening_port = self._reactor.listenUDP(port,
+                _UdpReceiverProtocol(self), interface=interface)
+        # Room for the bursts that arrive while the reactor is busy:
+        try:
+            listening_port.getHandle().setsockopt(socket.SOL_SOCKET,
+                    socket.SO_RCVBUF, RECEIVE_BUFFER_SIZE)
+        except (AttributeError, socket.error):
+            pass
+        self._listening_ports.append(listening_port)
+        return listening_port
+
+    def listen_tcp(self, port, interface="", framing=tcp.FRAMING_SLIP):
+        """
+        @type port: C{int}
+        @param framing: One of the FRAMING_* constants of
+        L{openshow.actions.tcp}.
+        @rtype: L{twisted.internet.interfaces.IListeningPort}
+        @raise: L{twisted.internet.error.CannotListenError}
+        """
+        listening_port = self._reactor.listenTCP(port,
+                _TcpReceiverFactory(self, framing), interface=interface)
+        self._listening_ports.append(listening_port)
+        return listening_port
+
+    def close(self):
+        """
+        Stops listening, and closes the TCP connections.
+        @rtype: L{twisted.internet.defer.Deferred}
+        """
+        listening_ports = self._listening_ports
+        self._listening_ports = []
+        for connection in list(self._connections):
+            connection.transport.loseConnection()
+        return defer.gatherResults([defer.maybeDeferred(
+                listening_port.stopListening)
+                for listening_port in listening_ports])
+
+
+class RemoteControl(object):
+    """
+    Operates a cue sheet with OSC messages.
+    """
+    def __init__(self):
+        self._cue_sheet = None
+
+    def register(self, server):
+        """
+        Adds its handlers to a server.
+        @type server: L{OscServer}
+        """
+        server.add_handler(ADDRESS_GO, self._go_cb)
+        server.add_handler(ADDRESS_STOP, self._stop_cb)
+        server.add_handler(ADDRESS_SELECT, self._select_cb)
+
+    def attach(self, cue_sheet):
+        """
+        Starts to operate a cue sheet, instead of the one it was attached
+        to, if any.
+        @type cue_sheet: L{openshow.cue.CueSheet}
+        """
+        self._cue_sheet = cue_sheet
+
+    def detach(self):
+        self._cue_sheet = None
+
+    def _go_cb(self, address, args):
+        if self._cue_sheet is not None:
+            self._cue_sheet.go()
+
+    def _stop_cb(self, address, args):
+        if self._cue_sheet is not None:
+            self._cue_sheet.stop()
+
+    def _select_cb(self, address, args):
+        if len(args) != 1:
+            log.msg("Ignoring %s without a cue identifier" % (address))
+            return
+        identifier = args[0]
+        if isinstance(identifier, float):
+            identifier = "%g" % (identifier) # sent as 32 bits
+        identifier = str(identifier)
+        if self._cue_sheet is None:
+            return
+        if not self._cue_sheet.has_cue(identifier):
+            log.msg("Ignoring %s %s: no such cue" % (address, identifier))
+            return
+        self._cue_sheet.select_cue(identifier)
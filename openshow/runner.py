@@ -3,15 +3,11 @@
 The main entry to our application, where we parse command line arguments.
 """
 from twisted.python import log
-from twisted.internet import wxreactor
-wxreactor.install()
-# import twisted.internet.reactor only after installing wxreactor:
-from twisted.internet import reactor
 import openshow
-from openshow import gui
 import sys
 import os
 import optparse
+import signal
 
 
 def run():
@@ -21,13 +17,46 @@ def run():
     DEFAULT_OSC_RECEIVE_PORT = 13333
     DEFAULT_PROJECT_FILE = ""
 
-    parser = optparse.OptionParser(usage="%prog",
+    parser = optparse.OptionParser(usage="%prog [project file]",
             version=str(openshow.__version__))
     parser.add_option("-p", "--osc-receive-port", type="int",
             default=DEFAULT_OSC_RECEIVE_PORT,
             help="Receive OSC messages port number (%default)")
+    parser.add_option("-R", "--osc-receive-tcp", action="store_true",
+            help="Also receives OSC messages over TCP, framed with SLIP, on "
+            "the same port number.")
     parser.add_option("-f", "--project-file", type="string",
             default=DEFAULT_PROJECT_FILE, help="XML project file.")
+    parser.add_option("-s", "--simulate", action="store_true",
+            help="Dry-runs the project at full speed, without executing its "
+            "actions, and prints what happens. Does not start the GUI.")
+    parser.add_option("-t", "--start-time", type="string",
+            help="With --simulate, starts at that time, such as 00:43:12.500")
+    parser.add_option("-P", "--precision", type="float", default=0.0,
+            help="Busy-waits for up to that many milliseconds before each "
+            "cue deadline, for more precise timing at the cost of CPU time. "
+            "(%default)")
+    parser.add_option("-S", "--stats-file", type="string",
+            help="Writes the latency statistics of the cues to that file "
+            "when quitting, instead of to the standard output.")
+    parser.add_option("-T", "--trace-file", type="string",
+            help="Writes the trace of the last events of the cues to that "
+            "file when quitting, and when receiving the USR1 signal. With "
+            "--simulate, once the simulation is done.")
+    parser.add_option("-r", "--replay-trace", type="string",
+            help="With --simulate, replays that trace file instead of "
+            "running the project.")
+    parser.add_option("-B", "--no-osc-bundles", action="store_true",
+            help="Sends each OSC message in its own datagram, instead of "
+            "bundling those that leave at once for the same destination.")
+    parser.add_option("-L", "--lookahead", type="float", default=0.0,
+            help="Sends the OSC messages of the cues that many milliseconds "
+            "ahead, in bundles stamped with their planned time, for "
+            "receivers that honor time tags. Those without a cancel_path are "
+            "only sent as early as --lookahead-guard. (%default)")
+    parser.add_option("-G", "--lookahead-guard", type="float", default=0.0,
+            help="How many milliseconds ahead to send the OSC messages that "
+            "cannot be undone if their cue is cancelled. (%default)")
     parser.add_option("-v", "--verbose", action="store_true",
             help="Makes the logging output verbose.")
     (options, args) = parser.parse_args()
@@ -39,27 +68,101 @@ def run():
     if options.verbose:
         verbose = True
 
+    osc_receive_port = options.osc_receive_port
+    project_file = options.project_file
+    if len(args) > 0:
+        project_file = args[0]
+    project_file = os.path.expanduser(project_file)
+
+    if options.simulate:
+        # No need for the GUI nor for the wx reactor:
+        from openshow import simulation
+        from openshow import timer
+        if project_file == "":
+            parser.error("--simulate needs a project file")
+        start_time = None
+        if options.start_time is not None:
+            start_time = timer.parse_time(options.start_time)
+        replay_trace = None
+        if options.replay_trace is not None:
+            replay_trace = os.path.expanduser(options.replay_trace)
+        trace_file = None
+        if options.trace_file is not None:
+            trace_file = os.path.expanduser(options.trace_file)
+        sys.exit(simulation.simulate_project_file(project_file, start_time,
+                replay_trace, trace_file))
+
     # FIXME: for now, let's just make it always verbose
     verbose = True
 
-    osc_receive_port = options.osc_receive_port
-    project_file = options.project_file
+    from twisted.internet import wxreactor
+    wxreactor.install()
+    # import twisted.internet.reactor only after installing wxreactor:
+    from twisted.internet import error
+    from twisted.internet import reactor
+    from openshow import gui
+    from openshow import remote
+    from openshow import timer
+    from openshow.actions import bundles
+    from openshow.actions import osc
+    from openshow.actions import tcp
+    from openshow.actions import udp
+
+    if options.precision > 0.0:
+        timer.set_spin_budget(options.precision / 1000.0)
+    if options.no_osc_bundles:
+        osc.set_bundling(False)
 
     log.startLogging(sys.stdout)
     if verbose:
         print("osc_receive_port %s" % (osc_receive_port))
         print("project_file %s" % (project_file))
-    project_file = os.path.expanduser(project_file)
-    if verbose:
-        print("expanded project_file %s" % (project_file))
 
     # register the App instance with Twisted:
     app = gui.App(0)
     reactor.registerWxApp(app)
 
+    server = remote.OscServer()
+    app.get_frame().get_remote().register(server)
+    app.get_frame().get_triggers().register(server)
+    try:
+        server.listen_udp(osc_receive_port)
+        if options.osc_receive_tcp:
+            server.listen_tcp(osc_receive_port)
+    except error.CannotListenError as e:
+        print("Error: Cannot receive OSC messages: %s" % (e))
+        sys.exit(1)
+
     def _later_load_file():
         app.get_frame().load_cue_sheet(project_file)
 
+    if options.lookahead > 0.0:
+        app.get_frame().get_lookahead().set_lookahead(
+                options.lookahead / 1000.0, options.lookahead_guard / 1000.0)
+
+    def _dump_stats():
+        if options.stats_file is None:
+            app.get_frame().get_stats().dump()
+        else:
+            with open(os.path.expanduser(options.stats_file), "w") as f:
+                app.get_frame().get_stats().dump(f)
+
+    def _dump_trace():
+        app.get_frame().get_trace().dump_to_file(
+                os.path.expanduser(options.trace_file))
+        print("Wrote trace file %s" % (options.trace_file))
+
+    reactor.addSystemEventTrigger("before", "shutdown", _dump_stats)
+    reactor.addSystemEventTrigger("before", "shutdown", bundles.flush_sender)
+    reactor.addSystemEventTrigger("before", "shutdown", udp.close_pool)
+    reactor.addSystemEventTrigger("before", "shutdown", tcp.close_pool)
+    reactor.addSystemEventTrigger("before", "shutdown", server.close)
+    if options.trace_file is not None:
+        reactor.addSystemEventTrigger("before", "shutdown", _dump_trace)
+        if hasattr(signal, "SIGUSR1"):
+            signal.signal(signal.SIGUSR1,
+                    lambda signum, frame: reactor.callFromThread(_dump_trace))
+
     if project_file == "":
         if verbose:
             print("No project file to load")
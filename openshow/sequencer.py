@@ -0,0 +1,297 @@
+#!/usr/bin/env python
+# -*- coding: utf-8; tab-width: 4; mode: python -*-
+"""
+The Sequencer class.
+
+It keeps all the pending calls of the cues - the ends of their pre-waits and
+post-waits - in one priority queue ordered by due time. Only one delayed call
+is given to the clock: the one for the head of the queue. Every time it wakes
+up, it does whatever work is at or before the present time, and goes back to
+sleep until the next deadline.
+
+Inserting and cancelling a call take O(log n). The clock only ever knows about
+one call, however many cues are waiting.
+
+The reactor usually wakes up a little late. In precision mode, the sequencer
+asks to be woken up a little before each deadline - its spin budget - and
+busy-waits for the rest, which costs up to that much CPU time per deadline.
+(Linux has timer file descriptors that are more precise than the poll
+timeout of the reactor, but Python 2 cannot create them.)
+"""
+from twisted.python import log
+
+
+class ScheduledCall(object):
+    """
+    A call in the queue of a L{Sequencer}. Returned by L{Sequencer.call_at}.
+    """
+    __slots__ = ("_sequencer", "time", "order", "function", "args", "kwargs",
+            "index")
+
+    def __init__(self, sequencer, time, order, function, args, kwargs):
+        self._sequencer = sequencer
+        self.time = time
+        self.order = order # ties are called in the order they were added
+        self.function = function
+        self.args = args
+        self.kwargs = kwargs
+        self.index = -1 # in the heap, or -1 once it is due or cancelled
+
+    def getTime(self):
+        """
+        Returns when it is due, in the time of the clock of its sequencer.
+        @rtype: C{float}
+        """
+        return self.time
+
+    def active(self):
+        """
+        Tells if it has not been called nor cancelled yet.
+        @rtype: C{bool}
+        """
+        return self.function is not None
+
+    def cancel(self):
+        """
+        Removes it from the queue. Does nothing if it is not active.
+        """
+        if self.function is None:
+            return
+        self.function = None
+        self.args = None
+        self.kwargs = None
+        if self.index != -1:
+            self._sequencer._remove(self)
+
+    def __lt__(self, other):
+        return (self.time, self.order) < (other.time, other.order)
+
+
+class Sequencer(object):
+    """
+    Schedules calls on a clock, with only one delayed call at a time.
+    """
+    def __init__(self, clock, spin_budget=0.0):
+        """
+        @param clock: The reactor, or a virtual clock.
+        @type clock: L{twisted.internet.interfaces.IReactorTime}
+        @param spin_budget: See L{set_spin_budget}.
+        @type spin_budget: C{float}
+        """
+        self._clock = clock
+        self._spin_budget = spin_budget
+        self._spin_time = 0.0 # total
+        self._heap = [] # of ScheduledCall, a binary min-heap
+        self._count = 0 # calls added so far
+        self._wake_up_call = None # delayed call of the clock
+        self._wake_up_time = None
+        self._is_waking_up = False
+        self._after_wake_up = [] # functions to call once the due calls are done
+
+    def __len__(self):
+        """
+        Returns how many calls are pending.
+        """
+        return len(self._heap)
+
+    def get_clock(self):
+        """
+        @rtype: L{twisted.internet.interfaces.IReactorTime}
+        """
+        return self._clock
+
+    def set_spin_budget(self, spin_budget):
+        """
+        Sets how many seconds before each deadline to wake up and busy-wait
+        for it. 0 disables the precision mode. Never use it with a virtual
+        clock, whose time does not pass while we wait.
+        @type spin_budget: C{float}
+        """
+        self._spin_budget = spin_budget
+        if self._wake_up_call is not None:
+            self._wake_up_call.cancel()
+            self._wake_up_call = None
+            self._wake_up_time = None
+            self._arm()
+
+    def get_spin_budget(self):
+        """
+        @rtype: C{float}
+        """
+        return self._spin_budget
+
+    def get_spin_time(self):
+        """
+        Returns how many seconds were spent busy-waiting so far.
+        @rtype: C{float}
+        """
+        return self._spin_time
+
+    def seconds(self):
+        """
+        Returns the current time of the clock.
+        @rtype: C{float}
+        """
+        return self._clock.seconds()
+
+    def is_waking_up(self):
+        """
+        Tells if it is calling the calls that are due.
+        @rtype: C{bool}
+        """
+        return self._is_waking_up
+
+    def call_after_wake_up(self, function):
+        """
+        Calls a function once the calls that are due now are done, before
+        the sequencer goes back to sleep. Only while it is waking up.
+        @raise: L{RuntimeError} if it is not waking up.
+        """
+        if not self._is_waking_up:
+            raise RuntimeError("The sequencer is not waking up")
+        self._after_wake_up.append(function)
+
+    def call_later(self, delay, function, *args, **kwargs):
+        """
+        Calls a function after a delay.
+        @type delay: C{float}
+        @rtype: L{ScheduledCall}
+        """
+        return self.call_at(self._clock.seconds() + delay, function, *args,
+                **kwargs)
+
+    def call_at(self, when, function, *args, **kwargs):
+        """
+        Calls a function at a given time of the clock.
+        @type when: C{float}
+        @rtype: L{ScheduledCall}
+        """
+        call = ScheduledCall(self, when, self._count, function, args, kwargs)
+        self._count += 1
+        call.index = len(self._heap)
+        self._heap.append(call)
+        self._sift_up(call.index)
+        if self._heap[0] is call:
+            self._arm()
+        return call
+
+    def _remove(self, call):
+        heap = self._heap
+        index = call.index
+        last = heap.pop()
+        call.index = -1
+        if last is not call:
+            heap[index] = last
+            last.index = index
+            if index > 0 and last < heap[(index - 1) // 2]:
+                self._sift_up(index)
+            else:
+                self._sift_down(index)
+        # Unless there is nothing left to do, the wake-up call is left as it
+        # is: if it wakes up too early, it goes back to sleep until the head.
+        if len(heap) == 0 and self._wake_up_call is not None:
+            self._wake_up_call.cancel()
+            self._wake_up_call = None
+            self._wake_up_time = None
+
+    def _arm(self):
+        """
+        Makes sure the clock wakes us up when the head of the queue is due.
+        """
+        if self._is_waking_up:
+            return # done once all the due calls have been called
+        if len(self._heap) == 0:
+            return
+        when = self._heap[0].time
+        if self._wake_up_call is not None:
+            if self._wake_up_time <= when:
+                return
+            self._wake_up_call.cancel()
+        self._wake_up_time = when
+        self._wake_up_call = self._clock.callLater(
+                max(0.0, when - self._spin_budget - self._clock.seconds()),
+                self._wake_up)
+
+    def _spin(self, when):
+        """
+        Busy-waits until a given time, if it is within the spin budget.
+        @return: The current time.
+        """
+        now = self._clock.seconds()
+        if now < when and when - now <= self._spin_budget:
+            started = now
+            while now < when:
+                now = self._clock.seconds()
+            self._spin_time += now - started
+        return now
+
+    def _wake_up(self):
+        self._wake_up_call = None
+        self._wake_up_time = None
+        heap = self._heap
+        if self._spin_budget > 0.0 and heap:
+            now = self._spin(heap[0].time)
+        else:
+            now = self._clock.seconds()
+        due = []
+        while heap and heap[0].time <= now:
+            due.append(heap[0])
+            self._remove(heap[0])
+        self._is_waking_up = True
+        try:
+            for call in due:
+                # A call can be cancelled by one that was due before it.
+                if call.function is None:
+                    continue
+                function, args, kwargs = call.function, call.args, call.kwargs
+                call.function = None
+                call.args = None
+                call.kwargs = None
+                try:
+                    function(*args, **kwargs)
+                except:
+                    log.err(None, "Error in a call of the sequencer")
+            while self._after_wake_up:
+                function = self._after_wake_up.pop(0)
+                try:
+                    function()
+                except:
+                    log.err(None, "Error after a wake-up of the sequencer")
+        finally:
+            self._is_waking_up = False
+            self._after_wake_up = []
+        self._arm()
+
+    def _sift_up(self, index):
+        heap = self._heap
+        call = heap[index]
+        while index > 0:
+            parent_index = (index - 1) // 2
+            parent = heap[parent_index]
+            if not call < parent:
+                break
+            heap[index] = parent
+            parent.index = index
+            index = parent_index
+        heap[index] = call
+        call.index = index
+
+    def _sift_down(self, index):
+        heap = self._heap
+        size = len(heap)
+        call = heap[index]
+        while True:
+            child_index = 2 * index + 1
+            if child_index >= size:
+                break
+            right_index = child_index + 1
+            if right_index < size and heap[right_index] < heap[child_index]:
+                child_index = right_index
+            child = heap[child_index]
+            if not child < call:
+                break
+            heap[index] = child
+            child.index = index
+            index = child_index
+        heap[index] = call
+        call.index = index
@@ -24,6 +24,8 @@ class Signal(object):
         self._slots = WeakValueDictionary()
 
     def __call__(self, *args, **kargs):
+        if len(self._slots) == 0:
+            return # iterating on a WeakValueDictionary is not free
         for key in self._slots:
             func, _ = key
             func(self._slots[key], *args, **kargs)
@@ -0,0 +1,229 @@
+#!/usr/bin/env python
+# -*- coding: utf-8; tab-width: 4; mode: python -*-
+"""
+Dry-runs a cue sheet against a virtual clock.
+
+The waits of the cues are not actually waited for: the virtual clock jumps
+from one scheduled call to the next, so that a three-hour show is replayed in
+seconds. The actions are not executed, only recorded. The result is a
+timestamped log of everything that happened.
+
+A trace recorded during a show, with L{openshow.trace}, can also be replayed:
+its events are posted again to the event bus of the cue sheet, at the same
+times of the virtual clock, so that whatever listens to them - statistics,
+for example - sees the show as it happened.
+
+Usage:
+    PYTHONPATH=$PWD python ./openshow/simulation.py examples/project_01.xml
+    PYTHONPATH=$PWD python ./openshow/simulation.py examples/project_01.xml \
+        trace.bin
+"""
+from twisted.internet import defer
+from twisted.internet import task
+from openshow import cue
+from openshow import project
+from openshow import timer
+from openshow import trace
+
+# Kinds of records that are not cue events:
+RECORD_ACTION = "action"
+RECORD_SHEET_GO = "sheet_go"
+RECORD_SHEET_DONE = "sheet_done"
+
+
+class SimulationRecord(object):
+    """
+    Something that happened during a simulation.
+
+    @ivar time: Seconds since the beginning of the simulation.
+    @ivar kind: One of the EVENT_* constants of L{openshow.events}, or
+    RECORD_ACTION, RECORD_SHEET_GO or RECORD_SHEET_DONE.
+    @ivar identifier: Identifier of the cue, or None.
+    @ivar detail: Extra information, such as the action that was executed.
+    """
+    __slots__ = ("time", "kind", "identifier", "detail")
+
+    def __init__(self, time, kind, identifier=None, detail=None):
+        self.time = time
+        self.kind = kind
+        self.identifier = identifier
+        self.detail = detail
+
+    def __str__(self):
+        ret = "%s %s" % (timer.format_time(self.time), self.kind)
+        if self.identifier is not None:
+            ret += " %s" % (self.identifier)
+        if self.detail is not None:
+            ret += " %s" % (self.detail)
+        return ret
+
+
+class RecordedAction(cue.Action):
+    """
+    Stands for the action of a cue during a simulation.
+    """
+    def __init__(self, simulation, cue_item, action):
+        super(RecordedAction, self).__init__()
+        self._simulation = simulation
+        self._cue_item = cue_item
+        self._action = action
+
+    def execute(self):
+        self._simulation.record(RECORD_ACTION, self._cue_item.get_identifier(),
+                str(self._action))
+        return defer.succeed(None)
+
+    def get_type(self):
+        return self._action.get_type()
+
+
+class Simulation(object):
+    """
+    Runs a cue sheet against a virtual clock.
+    """
+    def __init__(self, cue_sheet):
+        """
+        @type cue_sheet: L{openshow.cue.CueSheet}
+        """
+        self._cue_sheet = cue_sheet
+        self._clock = task.Clock()
+        self._records = []
+
+    def get_clock(self):
+        """
+        @rtype: L{twisted.internet.task.Clock}
+        """
+        return self._clock
+
+    def get_records(self):
+        """
+        @return: List of L{SimulationRecord}.
+        @rtype: C{list}
+        """
+        return self._records
+
+    def record(self, kind, identifier=None, detail=None):
+        self._records.append(SimulationRecord(self._clock.seconds(), kind,
+                identifier, detail))
+
+    def _cue_event_cb(self, event):
+        self.record(event.kind, event.cue.get_identifier())
+
+    def run(self, start_time=None):
+        """
+        Runs the cue sheet from its selected cue until it is done, or from a
+        given time of its timeline. Returns once it is done.
+
+        @param start_time: See L{openshow.cue.CueSheet.go_from_time}.
+        @type start_time: C{float}
+        @return: List of L{SimulationRecord}.
+        @rtype: C{list}
+        @raise: L{RuntimeError} if the cue sheet never gets done.
+        """
+        previous_clock = timer.get_clock()
+        timer.set_clock(self._clock)
+        cues = self._cue_sheet.get_cues()
+        actions = [item.get_action() for item in cues]
+        for item, action in zip(cues, actions):
+            if action is not None:
+                item.set_action(RecordedAction(self, item, action))
+        subscription = self._cue_sheet.get_event_bus().subscribe(
+                self._cue_event_cb)
+        try:
+            self.record(RECORD_SHEET_GO)
+            if start_time is None:
+                d = self._cue_sheet.go()
+            else:
+                d = self._cue_sheet.go_from_time(start_time)
+            done = []
+            d.addCallback(done.append)
+            while not done:
+                calls = self._clock.getDelayedCalls()
+                if len(calls) == 0:
+                    raise RuntimeError("The cue sheet is waiting for "
+                            "something that is not scheduled.")
+                next_time = min(call.getTime() for call in calls)
+                self._clock.advance(max(0.0, next_time - self._clock.seconds()))
+            self.record(RECORD_SHEET_DONE)
+        finally:
+            self._cue_sheet.get_event_bus().unsubscribe(subscription)
+            for item, action in zip(cues, actions):
+                item.set_action(action)
+            timer.set_clock(previous_clock)
+        return self._records
+
+    def replay(self, trace_records):
+        """
+        Posts the events of a trace to the event bus of the cue sheet, at the
+        same times relative to the first one. The cues are not run.
+
+        @param trace_records: List of L{openshow.trace.TraceRecord}, such as
+        returned by L{openshow.trace.read_trace}.
+        @type trace_records: C{list}
+        @return: List of L{SimulationRecord}, whose details are the values of
+        the events.
+        @rtype: C{list}
+        @raise: L{RuntimeError} if a cue of the trace is not in the cue sheet.
+        """
+        previous_clock = timer.get_clock()
+        timer.set_clock(self._clock)
+        bus = self._cue_sheet.get_event_bus()
+        try:
+            if len(trace_records) > 0:
+                started = trace_records[0].time - self._clock.seconds()
+            for trace_record in trace_records:
+                cue_item = self._cue_sheet.get_cue_by_identifier(
+                        trace_record.identifier)
+                self._clock.advance(max(0.0,
+                        trace_record.time - started - self._clock.seconds()))
+                self.record(trace_record.kind, trace_record.identifier,
+                        "%.6f" % (trace_record.value))
+                bus.post(trace_record.kind, cue_item, trace_record.value,
+                        self._clock.seconds())
+        finally:
+            timer.set_clock(previous_clock)
+        return self._records
+
+
+def simulate_project_file(project_file_path, start_time=None,
+        trace_file_path=None, output_trace_file_path=None):
+    """
+    Loads a project file and prints the log of its simulation, or of the
+    replay of a trace file.
+    @param output_trace_file_path: Where to write the trace of the events of
+    the simulation, if anywhere.
+    @return: Exit code.
+    @rtype: C{int}
+    """
+    try:
+        cue_sheet = project.ProjectPersistance().parse_project_file(
+                project_file_path)
+        event_trace = trace.EventTrace()
+        event_trace.attach(cue_sheet)
+        simulation = Simulation(cue_sheet)
+        if trace_file_path is None:
+            records = simulation.run(start_time)
+        else:
+            records = simulation.replay(trace.read_trace(trace_file_path))
+        for record in records:
+            print(str(record))
+        if output_trace_file_path is not None:
+            event_trace.dump_to_file(output_trace_file_path)
+    except RuntimeError as e:
+        print("Error: %s" % (e))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    import sys
+    try:
+        project_file_path = sys.argv[1]
+    except IndexError:
+        print("Usage: %s <XML file path> [trace file path]" % (sys.argv[0]))
+        sys.exit(1)
+    trace_file_path = None
+    if len(sys.argv) > 2:
+        trace_file_path = sys.argv[2]
+    sys.exit(simulate_project_file(project_file_path,
+            trace_file_path=trace_file_path))
@@ -0,0 +1,290 @@
+#!/usr/bin/env python
+# -*- coding: utf-8; tab-width: 4; mode: python -*-
+"""
+Latency statistics of the cues of a cue sheet.
+
+For each phase of a cue, and for each type of action, a histogram counts how
+long it takes from its go to the end of its pre-wait, how late that end is,
+how long the action takes, and how late the end of the post-wait is. The
+values are taken from the events that the cues post to the event bus of their
+cue sheet, and from their times.
+
+The histograms are log-linear, like HDR histograms: each power of two is
+divided in the same number of buckets, so that recording a value is O(1), the
+memory used does not depend on the number of values, and every value is
+known with the same relative precision, from microseconds to minutes.
+
+Usage:
+    cue_stats = stats.CueStats()
+    cue_stats.attach(cue_sheet)
+    cue_sheet.go()
+    ...
+    cue_stats.dump()
+"""
+import array
+import sys
+from openshow import events
+
+PHASE_PRE_WAIT = "pre_wait" # how long from its go to the end of the pre-wait
+PHASE_LATE_START = "late_start" # how late the end of the pre-wait is
+PHASE_ACTION = "action" # how long the action takes
+PHASE_POST_WAIT = "post_wait" # how late the end of the post-wait is
+PHASES = (PHASE_PRE_WAIT, PHASE_LATE_START, PHASE_ACTION, PHASE_POST_WAIT)
+NO_ACTION = "none" # action type of the cues without an action
+
+_PHASE_EVENTS = { # whose value is counted
+        events.EVENT_DONE_PRE_WAIT: PHASE_LATE_START,
+        events.EVENT_DONE_TRIGGER: PHASE_ACTION,
+        events.EVENT_DONE_POST_WAIT: PHASE_POST_WAIT,
+        }
+_EVENTS = list(_PHASE_EVENTS) + [events.EVENT_GO, events.EVENT_CANCELLED]
+
+SUB_BUCKET_BITS = 5 # 32 buckets per power of two: about 3% precision
+_SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+
+
+def _get_bucket_index(value):
+    """
+    Returns the index of the bucket of a value in microseconds.
+    """
+    if value < _SUB_BUCKETS:
+        return value
+    shift = value.bit_length() - SUB_BUCKET_BITS - 1
+    return _SUB_BUCKETS * (shift + 1) + (value >> shift) - _SUB_BUCKETS
+
+
+def _get_bucket_value(index):
+    """
+    Returns the highest value in microseconds that is in a bucket.
+    """
+    if index < _SUB_BUCKETS:
+        return index
+    shift, sub_index = divmod(index - _SUB_BUCKETS, _SUB_BUCKETS)
+    return ((_SUB_BUCKETS + sub_index + 1) << shift) - 1
+
+
+class LatencyHistogram(object):
+    """
+    Counts durations, with a precision of about 3%.
+
+    Durations are given in seconds, and kept in microseconds. Negative ones
+    count as 0.
+    """
+    def __init__(self):
+        self._counts = array.array("l")
+        self._count = 0
+        self._total = 0 # microseconds
+        self._min = None
+        self._max = None
+
+    def record(self, seconds):
+        """
+        Counts a duration.
+        @type seconds: C{float}
+        """
+        value = int(seconds * 1000000)
+        if value < 0:
+            value = 0
+        index = _get_bucket_index(value)
+        counts = self._counts
+        if index >= len(counts):
+            counts.extend([0] * (index + 1 - len(counts)))
+        counts[index] += 1
+        self._count += 1
+        self._total += value
+        if self._min is None or value < self._min:
+            self._min = value
+        if self._max is None or value > self._max:
+            self._max = value
+
+    def add(self, other):
+        """
+        Adds the counts of another histogram to this one.
+        @type other: L{LatencyHistogram}
+        """
+        counts = self._counts
+        if len(other._counts) > len(counts):
+            counts.extend([0] * (len(other._counts) - len(counts)))
+        for index, count in enumerate(other._counts):
+            counts[index] += count
+        self._count += other._count
+        self._total += other._total
+        if other._count > 0:
+            if self._min is None or other._min < self._min:
+                self._min = other._min
+            if self._max is None or other._max > self._max:
+                self._max = other._max
+
+    def get_count(self):
+        """
+        @rtype: C{int}
+        """
+        return self._count
+
+    def get_min(self):
+        """
+        @return: Seconds, or 0.0 if there is no value.
+        @rtype: C{float}
+        """
+        if self._min is None:
+            return 0.0
+        return self._min / 1000000.0
+
+    def get_max(self):
+        """
+        @return: Seconds, or 0.0 if there is no value.
+        @rtype: C{float}
+        """
+        if self._max is None:
+            return 0.0
+        return self._max / 1000000.0
+
+    def get_mean(self):
+        """
+        @return: Seconds, or 0.0 if there is no value.
+        @rtype: C{float}
+        """
+        if self._count == 0:
+            return 0.0
+        return self._total / 1000000.0 / self._count
+
+    def get_value_at_percentile(self, percentile):
+        """
+        Returns the value that the given percentage of the values are lower
+        than or equal to, within the precision of the histogram.
+        @param percentile: From 0 to 100.
+        @type percentile: C{float}
+        @return: Seconds, or 0.0 if there is no value.
+        @rtype: C{float}
+        """
+        if self._count == 0:
+            return 0.0
+        wanted = max(1, int(round(self._count * percentile / 100.0)))
+        seen = 0
+        for index, count in enumerate(self._counts):
+            seen += count
+            if seen >= wanted:
+                return min(_get_bucket_value(index), self._max) / 1000000.0
+        return self.get_max()
+
+    def __str__(self):
+        return "count=%d min=%.3fms p50=%.3fms p99=%.3fms max=%.3fms" % (
+                self._count, self.get_min() * 1000,
+                self.get_value_at_percentile(50) * 1000,
+                self.get_value_at_percentile(99) * 1000,
+                self.get_max() * 1000)
+
+
+class CueStats(object):
+    """
+    Latency histograms per phase and per action type of the cues of a cue
+    sheet.
+    """
+    def __init__(self):
+        self._histograms = {} # (phase, action type) -> LatencyHistogram
+        self._go_times = {} # cue -> time of its go, until its pre-wait ends
+        self._cue_sheet = None
+        self._subscription = None
+
+    def attach(self, cue_sheet):
+        """
+        Starts to count the latencies of the cues of a cue sheet, instead of
+        the one it was attached to, if any. The counts are kept.
+        @type cue_sheet: L{openshow.cue.CueSheet}
+        """
+        self.detach()
+        self._cue_sheet = cue_sheet
+        self._subscription = cue_sheet.get_event_bus().subscribe(
+                self._cue_event_cb, _EVENTS)
+
+    def detach(self):
+        """
+        Stops counting.
+        """
+        if self._cue_sheet is not None:
+            self._cue_sheet.get_event_bus().unsubscribe(self._subscription)
+            self._cue_sheet = None
+            self._subscription = None
+            self._go_times.clear()
+
+    def _cue_event_cb(self, event):
+        kind = event.kind
+        if kind == events.EVENT_GO:
+            self._go_times[event.cue] = event.time
+            return
+        go_time = None
+        if kind in (events.EVENT_DONE_PRE_WAIT, events.EVENT_CANCELLED):
+            go_time = self._go_times.pop(event.cue, None)
+        if kind == events.EVENT_CANCELLED:
+            return
+        action = event.cue.get_action()
+        action_type = None
+        if action is not None:
+            action_type = action.get_type()
+        action_type = action_type or NO_ACTION
+        if go_time is not None and event.time is not None:
+            self.record(PHASE_PRE_WAIT, action_type, event.time - go_time)
+        if event.value is not None:
+            self.record(_PHASE_EVENTS[kind], action_type, event.value)
+
+    def record(self, phase, action_type, seconds):
+        """
+        @param phase: One of the PHASE_* constants.
+        @type action_type: C{str}
+        @type seconds: C{float}
+        """
+        key = (phase, action_type)
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            histogram = LatencyHistogram()
+            self._histograms[key] = histogram
+        histogram.record(seconds)
+
+    def get_action_types(self):
+        """
+        @rtype: C{list}
+        """
+        return sorted(set(key[1] for key in self._histograms))
+
+    def get_histogram(self, phase, action_type=None):
+        """
+        Returns the histogram of a phase, for a type of action or for all of
+        them.
+        @rtype: L{LatencyHistogram}
+        """
+        ret = LatencyHistogram()
+        for key, histogram in self._histograms.items():
+            if key[0] == phase and action_type in (None, key[1]):
+                ret.add(histogram)
+        return ret
+
+    def clear(self):
+        self._histograms.clear()
+
+    def __str__(self):
+        ret = "%-10s %-10s %8s %10s %10s %10s %10s %10s\n" % ("phase",
+                "action", "count", "min (ms)", "p50 (ms)", "p90 (ms)",
+                "p99 (ms)", "max (ms)")
+        for phase in PHASES:
+            for action_type in self.get_action_types():
+                histogram = self._histograms.get((phase, action_type))
+                if histogram is None:
+                    continue
+                ret += "%-10s %-10s %8d %10.3f %10.3f %10.3f %10.3f %10.3f\n" % (
+                        phase, action_type, histogram.get_count(),
+                        histogram.get_min() * 1000,
+                        histogram.get_value_at_percentile(50) * 1000,
+                        histogram.get_value_at_percentile(90) * 1000,
+                        histogram.get_value_at_percentile(99) * 1000,
+                        histogram.get_max() * 1000)
+        return ret
+
+    def dump(self, output=None):
+        """
+        Writes the statistics as a table.
+        @param output: File to write to. The standard output if None.
+        """
+        if output is None:
+            output = sys.stdout
+        output.write(str(self))
+        output.flush()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+# -*- coding: utf-8; tab-width: 4; mode: python -*-
+"""
+Test cases for openshow.addresses
+"""
+from twisted.trial import unittest
+from openshow import addresses
+
+ADDRESSES = ["/openshow/go", "/openshow/stop", "/openshow/select",
+        "/mapmap/paint/1/opacity", "/mapmap/paint/2/opacity",
+        "/mapmap/paint/12/opacity", "/mapmap/paint/1/color"]
+
+
+class TestAddressTrie(unittest.TestCase):
+    def setUp(self):
+        self.trie = addresses.AddressTrie()
+        for address in ADDRESSES:
+            self.trie.add(address, address)
+
+    def _match(self, pattern):
+        return sorted(self.trie.match(pattern))
+
+    def test_01_literal(self):
+        self.assertEqual(self._match("/openshow/go"), ["/openshow/go"])
+        self.assertEqual(self._match("/openshow"), [])
+        self.assertEqual(self._match("/openshow/go/now"), [])
+        self.assertEqual(self._match("openshow/go"), [])
+
+    def test_02_wildcards(self):
+        self.assertEqual(self._match("/openshow/*"), ["/openshow/go",
+                "/openshow/select", "/openshow/stop"])
+        self.assertEqual(self._match("/openshow/s*t"), ["/openshow/select"])
+        self.assertEqual(self._match("/openshow/?o"), ["/openshow/go"])
+        self.assertEqual(self._match("/mapmap/paint/[12]/opacity"), [
+                "/mapmap/paint/1/opacity", "/mapmap/paint/2/opacity"])
+        self.assertEqual(self._match("/mapmap/paint/[!1]/opacity"), [
+                "/mapmap/paint/2/opacity"])
+        self.assertEqual(self._match("/mapmap/paint/[0-9]?/opacity"), [
+                "/mapmap/paint/12/opacity"])
+        self.assertEqual(self._match("/mapmap/paint/1/{opacity,color}"), [
+                "/mapmap/paint/1/color", "/mapmap/paint/1/opacity"])
+        self.assertEqual(self._match("/*/*/*/color"), [
+                "/mapmap/paint/1/color"])
+        # Not closed, so taken literally:
+        self.assertEqual(self._match("/openshow/[go"), [])
+
+    def test_03_add_and_remove(self):
+        self.assertEqual(self._match("/openshow/go"), ["/openshow/go"])
+        self.trie.add("/openshow/go", "another")
+        # The cached handlers are forgotten:
+        self.assertEqual(self._match("/openshow/go"), ["/openshow/go",
+                "another"])
+        self.trie.remove("/openshow/go", "another")
+        self.trie.remove("/mapmap/paint/1/color", "/mapmap/paint/1/color")
+        self.assertEqual(self._match("/openshow/go"), ["/openshow/go"])
+        self.assertEqual(self._match("/mapmap/paint/1/*"), [
+                "/mapmap/paint/1/opacity"])
+        self.assertEqual(self.trie.get_handler_count(), len(ADDRESSES) - 1)
+        self.assertRaises(RuntimeError, self.trie.remove, "/openshow/go",
+                "another")
+        self.assertRaises(RuntimeError, self.trie.add, "/openshow/*", "bad")
+        self.assertRaises(RuntimeError, self.trie.add, "openshow", "bad")
+
+    def test_04_cache_size(self):
+        trie = addresses.AddressTrie(cache_size=2)
+        trie.add("/a", "a")
+        for i in range(10):
+            self.assertEqual(trie.match("/%d" % (i)), ())
+            self.assertEqual(trie.match("/a"), ("a",))
+        self.assertTrue(len(trie._cache) <= 2)
@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+# -*- coding: utf-8; tab-width: 4; mode: python -*-
+"""
+Test cases for openshow.actions.bundles
+"""
+from twisted.trial import unittest
+from twisted.internet import task
+from txosc import osc as txosc
+from openshow import cue
+from openshow import timer
+from openshow.actions import bundles
+from openshow.actions import osc
+from openshow.test import test_osc
+
+
+def _encode(path, *args):
+    return osc.create_message_auto(path, *args).toBinary()
+
+
+class TestBundles(unittest.TestCase):
+    def test_01_encode_bundle(self):
+        packets = [_encode("/a", 1), _encode("/b", "text")]
+        data = bundles.encode_bundle(packets)
+        bundle = txosc.Bundle()
+        bundle.add(txosc.Message("/a", 1))
+        bundle.add(txosc.Message("/b", "text"))
+        self.assertEqual(data, bundle.toBinary())
+        element = txosc._elementFromBinary(data)
+        self.assertEqual([message.address for message in element.elements],
+                ["/a", "/b"])
+
+    def test_02_make_datagrams(self):
+        packets = [_encode("/layer/%03d" % (i), "x" * 80) for i in range(100)]
+        datagrams = bundles.make_datagrams(packets, 1472)
+        self.assertTrue(len(datagrams) < 10)
+        messages = []
+        for datagram in datagrams:
+            self.assertTrue(len(datagram) <= 1472)
+            messages.extend(txosc._elementFromBinary(datagram).elements)
+        self.assertEqual([message.address for message in messages],
+                ["/layer/%03d" % (i) for i in range(100)])
+
+        # Alone, a message is not put in a bundle, even if it is too big:
+        big = _encode("/big", "x" * 2000)
+        self.assertEqual(bundles.make_datagrams([big], 1472), [big])
+        self.assertEqual(bundles.make_datagrams([packets[0], big], 1472),
+                [packets[0], big])
+
+
+class TestBundlingSender(unittest.TestCase):
+    def setUp(self):
+        self.clock = task.Clock()
+        self.pool = test_osc.RecordingPool()
+        self.sender = bundles.BundlingSender(self.pool, reactor=self.clock)
+
+    def test_01_same_turn(self):
+        first = _encode("/first")
+        second = _encode("/second")
+        other = _encode("/other")
+        self.sender.send(first, "127.0.0.1", 12345)
+        self.sender.send(other, "127.0.0.2", 12345)
+        self.sender.send(second, "127.0.0.1", 12345)
+        self.assertEqual(self.pool.sent, [])
+        self.clock.advance(0)
+        self.assertEqual(self.pool.sent, [
+                (bundles.encode_bundle([first, second]), "127.0.0.1", 12345),
+                (other, "127.0.0.2", 12345),
+                ])
+        self.assertEqual(self.sender.get_message_count(), 3)
+        self.assertEqual(self.sender.get_datagram_count(), 2)
+        # The next turn is another bundle:
+        self.sender.send(first, "127.0.0.1", 12345)
+        self.sender.flush()
+        self.assertEqual(self.pool.sent[-1], (first, "127.0.0.1", 12345))
+        self.assertEqual(self.clock.getDelayedCalls(), [])
+
+    def test_02_cue_chain(self):
+        timer.set_clock(self.clock)
+        self.addCleanup(timer.set_clock, None)
+        self.patch(bundles, "_sender", self.sender)
+        cue_sheet = cue.CueSheet()
+        for i in range(10):
+            cue_sheet.append_cue(cue.Cue(str(i + 1), action=osc.OscAction(
+                    "127.0.0.1", 12345, "/mapmap/paint/%d" % (i), [1])))
+        cue_sheet.get_cues()[-1].set_follow(cue.FOLLOW_DO_NOT_CONTINUE)
+        cue_sheet.go()
+        self.clock.pump([0.0] * 5)
+        self.assertEqual(cue_sheet.is_running(), False)
+        # Ten cues without waits, in one datagram:
+        self.assertEqual(self.sender.get_message_count(), 10)
+        self.assertEqual(len(self.pool.sent), 1)
+        bundle = txosc._elementFromBinary(self.pool.sent[0][0])
+        self.assertEqual(len(bundle.elements), 10)
+
+    def test_03_end_of_wake_up(self):
+        timer.set_clock(self.clock)
+        self.addCleanup(timer.set_clock, None)
+        self.patch(bundles, "_sender", self.sender)
+        cue_sheet = cue.CueSheet()
+        for i in range(3):
+            cue_sheet.append_cue(cue.Cue(str(i + 1), action=osc.OscAction(
+                    "127.0.0.1", 12345, "/mapmap/paint/%d" % (i), [1])))
+        cue_sheet.get_cues()[0].set_pre_wait(1.0)
+        cue_sheet.get_cues()[-1].set_follow(cue.FOLLOW_DO_NOT_CONTINUE)
+        sent_times = []
+        self.patch(self.pool, "send", lambda data, host, port:
+                sent_times.append((self.clock.seconds(),
+                timer.get_sequencer().is_waking_up())))
+        cue_sheet.go()
+        self.clock.advance(1.0)
+        # Sent at the deadline, by the wake-up, not in another turn:
+        self.assertEqual(sent_times, [(1.0, True)])
+        self.assertEqual(self.sender.get_message_count(), 3)
+        self.assertEqual(self.clock.getDelayedCalls(), [])
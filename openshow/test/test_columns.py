@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+# -*- coding: utf-8; tab-width: 4; mode: python -*-
+"""
+Test cases for openshow.columns
+"""
+from twisted.trial import unittest
+from openshow import columns
+from openshow import cue
+
+
+class TestCueColumns(unittest.TestCase):
+    def _make_cue_sheet(self, size):
+        cue_sheet = cue.CueSheet()
+        cue_sheet.set_cues([cue.Cue(str(i), 1.0, 2.0) for i in range(size)])
+        cue_sheet.get_cue_by_identifier("3").set_follow(
+                cue.FOLLOW_DO_NOT_CONTINUE)
+        return cue_sheet
+
+    def test_01_bulk_operations(self):
+        cue_sheet = self._make_cue_sheet(500)
+        cols = columns.from_cue_sheet(cue_sheet)
+        self.assertEqual(len(cols), 500)
+        self.assertAlmostEqual(cols.get_total_duration(), 1500.0)
+        self.assertEqual(cols.count_follow(cue.FOLLOW_DO_NOT_CONTINUE), 1)
+
+        cols.scale_waits(0.5)
+        self.assertAlmostEqual(cols.get_total_duration(), 750.0)
+        cols.shift_pre_waits(2.0, 200, 400)
+        self.assertAlmostEqual(cols.get_pre_wait(199), 0.5)
+        self.assertAlmostEqual(cols.get_pre_wait(200), 2.5)
+        self.assertAlmostEqual(cols.get_pre_wait(400), 2.5)
+        self.assertAlmostEqual(cols.get_pre_wait(401), 0.5)
+        cols.shift_pre_waits(-10.0, 0, 0)
+        self.assertEqual(cols.get_pre_wait(0), 0.0)
+
+    def test_02_apply_to_cue_sheet(self):
+        cue_sheet = self._make_cue_sheet(10)
+        cols = columns.from_cue_sheet(cue_sheet)
+        cols.scale_waits(2.0, 5)
+        cols.apply_to_cue_sheet(cue_sheet)
+        self.assertEqual(cue_sheet.get_cue_by_index(4).get_pre_wait(), 1.0)
+        self.assertEqual(cue_sheet.get_cue_by_index(5).get_pre_wait(), 2.0)
+        self.assertEqual(cue_sheet.get_cue_by_index(9).get_post_wait(), 4.0)
+        self.assertEqual(cue_sheet.get_cue_by_index(3).get_follow(),
+                cue.FOLLOW_DO_NOT_CONTINUE)
+
+        cue_sheet.remove_cue("0")
+        self.assertRaises(RuntimeError, cols.apply_to_cue_sheet, cue_sheet)
+
+    def _edit(self):
+        cols = columns.from_cue_sheet(self._make_cue_sheet(100))
+        cols.scale_waits(1.5, 10, 89)
+        cols.shift_pre_waits(-1.25, 0, 49)
+        return [(cols.get_pre_wait(index), cols.get_post_wait(index))
+                for index in range(len(cols))], cols.get_total_duration(5, 94)
+
+    def test_03_without_numpy(self):
+        self.patch(columns, "numpy", None)
+        waits, total = self._edit()
+        self.assertEqual(waits[9], (0.0, 2.0))
+        self.assertEqual(waits[10], (0.25, 3.0))
+        self.assertEqual(waits[50], (1.5, 3.0))
+        self.assertEqual(waits[90], (1.0, 2.0))
+        self.assertAlmostEqual(total, sum(pre_wait + post_wait
+                for pre_wait, post_wait in waits[5:95]))
+        # Nothing to do:
+        columns.CueColumns().scale_waits(2.0)
+
+    def test_04_with_numpy(self):
+        if columns.numpy is None:
+            raise unittest.SkipTest("NumPy is not installed")
+        waits, total = self._edit()
+        columns.CueColumns().scale_waits(2.0)
+        self.assertEqual(columns.CueColumns().get_total_duration(), 0.0)
+        self.patch(columns, "numpy", None)
+        expected_waits, expected_total = self._edit()
+        self.assertEqual(waits, expected_waits)
+        self.assertAlmostEqual(total, expected_total)
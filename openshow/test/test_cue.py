@@ -3,9 +3,14 @@
 """
 Test cases for openshow.cue
 """
+import gc
+import sys
+import types
 from twisted.trial import unittest
 from twisted.internet import defer
+from twisted.internet import task
 from openshow import cue
+from openshow import events
 from openshow import timer
 from openshow.actions import osc
 
@@ -35,6 +40,44 @@ def _get_action(cue_sheet, cue_identifier):
     return cue_sheet.get_cue_by_identifier(cue_identifier).get_action()
 
 
+def _get_stack_depth():
+    depth = 0
+    frame = sys._getframe()
+    while frame is not None:
+        depth += 1
+        frame = frame.f_back
+    return depth
+
+
+def _get_deep_size(obj, excluded):
+    """
+    Returns the number of bytes used by an object and what it owns.
+    Classes, modules, functions and the objects in excluded are shared, so
+    they are not counted.
+    """
+    shared_types = (type, types.ModuleType, types.FunctionType,
+            getattr(types, "ClassType", type))
+    seen = set(id(item) for item in excluded)
+    pending = [obj]
+    total = 0
+    while pending:
+        item = pending.pop()
+        if id(item) in seen or isinstance(item, shared_types):
+            continue
+        seen.add(id(item))
+        total += sys.getsizeof(item)
+        pending.extend(gc.get_referents(item))
+    return total
+
+
+class SignalSlots(object):
+    def __init__(self):
+        self.calls = []
+
+    def slot(self, *args):
+        self.calls.append(args)
+
+
 class TestCue(unittest.TestCase):
     def test_01_cue_attributes(self):
         IDENTIFIER = "identifier"
@@ -127,6 +170,27 @@ class TestCue(unittest.TestCase):
         _cue.cancel()
         return d
 
+    def test_05_signals(self):
+        clock = task.Clock()
+        timer.set_clock(clock)
+        self.addCleanup(timer.set_clock, None)
+        _cue = cue.Cue("1", 1.0, 1.0, "title", DummyAction())
+        cue_sheet = cue.CueSheet()
+        cue_sheet.append_cue(_cue)
+        slots = SignalSlots()
+        for name in ["go", "done_pre_wait", "done_trigger", "done_post_wait"]:
+            getattr(_cue, "signal_" + name).connect(slots.slot)
+        values = []
+        cue_sheet.get_event_bus().subscribe(
+                lambda event: values.append(event.value),
+                [events.EVENT_DONE_PRE_WAIT, events.EVENT_DONE_POST_WAIT])
+        _cue.go()
+        clock.pump([0.5] * 5)
+        # Only the cue, as they always did:
+        self.assertEqual(slots.calls, [(_cue,)] * 4)
+        # The bus gets how late they are:
+        self.assertEqual(values, [0.0, 0.0])
+
 
 class TestCueSheet(unittest.TestCase):
     def test_01_cue_sheet_cues(self):
@@ -274,11 +338,204 @@ class TestCueSheet(unittest.TestCase):
         yield timer.later(1.1)
         self.assertEqual(_get_action(cue_sheet, "1").executed, True)
         self.assertEqual(_get_action(cue_sheet, "2").executed, False)
+        self.assertEqual(_get_action(cue_sheet, "3").executed, False)
 
-        # After four seconds, the second cue should finally be done
-        yield timer.later(3.1)
+        # After three seconds, the second cue should finally be done, and
+        # the last one triggered after its post-wait, without waiting for
+        # its action
+        yield timer.later(1.0)
+        self.assertEqual(_get_action(cue_sheet, "2").executed, True)
+        self.assertEqual(_get_action(cue_sheet, "3").executed, True)
+        self.assertFalse(cue_sheet.is_running())
+
+
+    def test_05_insert_remove_rename(self):
+        cue_sheet = cue.CueSheet()
+        cue_sheet.set_cues([
+                cue.Cue("1", 0.0, 0.0, "title1", DummyAction()),
+                cue.Cue("3", 0.0, 0.0, "title3", DummyAction()),
+        ])
+        cue_sheet.insert_cue(1, cue.Cue("2", 0.0, 0.0, "title2",
+                DummyAction()))
+        self.assertEqual(cue_sheet.get_size(), 3)
+        self.assertEqual(cue_sheet.get_cue_index("1"), 0)
+        self.assertEqual(cue_sheet.get_cue_index("2"), 1)
+        self.assertEqual(cue_sheet.get_cue_index("3"), 2)
+        self.assertEqual(cue_sheet.get_cue_after("2").get_identifier(), "3")
+        self.assertRaises(RuntimeError, cue_sheet.insert_cue, 0,
+                cue.Cue("2", 0.0, 0.0, "duplicate", DummyAction()))
+
+        cue_sheet.rename_cue("3", "3.5")
+        self.assertFalse(cue_sheet.has_cue("3"))
+        self.assertEqual(cue_sheet.get_cue_index("3.5"), 2)
+        self.assertRaises(RuntimeError, cue_sheet.rename_cue, "1", "2")
+
+        cue_sheet.select_cue("1")
+        removed = cue_sheet.remove_cue("1")
+        self.assertEqual(removed.get_identifier(), "1")
+        self.assertFalse(cue_sheet.has_cue("1"))
+        self.assertEqual(cue_sheet.get_cue_index("2"), 0)
+        self.assertEqual(cue_sheet.get_cue_index("3.5"), 1)
+        self.assertEqual(cue_sheet.get_selected_cue_identifier(), "2")
+        self.assertRaises(RuntimeError, cue_sheet.remove_cue, "1")
+
+    def test_06_timeline(self):
+        cue_sheet = cue.CueSheet()
+        cue_sheet.set_cues([
+                cue.Cue("1", 1.0, 2.0),
+                cue.Cue("2", 0.0, 0.0),
+                cue.Cue("3", 0.5, 1.5),
+        ])
+        self.assertEqual(cue_sheet.get_total_duration(), 5.0)
+        self.assertEqual(cue_sheet.get_cue_start_time("3"), 3.0)
+        self.assertEqual(cue_sheet.get_cue_end_time("3"), 5.0)
+        self.assertEqual(cue_sheet.get_cue_at_time(2.9).get_identifier(), "1")
+        self.assertEqual(cue_sheet.get_cue_at_time(3.0).get_identifier(), "3")
+        self.assertIdentical(cue_sheet.get_cue_at_time(5.0), None)
+
+        cue_sheet.get_cue_by_identifier("1").set_post_wait(4.0)
+        self.assertEqual(cue_sheet.get_cue_start_time("3"), 5.0)
+        self.assertEqual(cue_sheet.get_total_duration(), 7.0)
+        cue_sheet.insert_cue(0, cue.Cue("0", 1.0, 0.0))
+        self.assertEqual(cue_sheet.get_cue_start_time("3"), 6.0)
+        cue_sheet.remove_cue("1")
+        self.assertEqual(cue_sheet.get_cue_start_time("3"), 1.0)
+        self.assertEqual(cue_sheet.get_total_duration(), 3.0)
+
+
+    @defer.inlineCallbacks
+    def test_07_go_from_time(self):
+        cue_sheet = cue.CueSheet()
+        cue_sheet.set_cues([
+                cue.Cue("1", 0.0, 1.0, "title1", DummyAction()),
+                cue.Cue("2", 0.5, 1.0, "title2", DummyAction()),
+                cue.Cue("3", 0.0, 1.0, "title3", DummyAction()),
+        ])
+        self.assertRaises(RuntimeError, cue_sheet.go_from_time, 3.5)
+        # In the middle of the post-wait of cue 2:
+        d = cue_sheet.go_from_time(2.0)
+        self.assertEqual(cue_sheet.get_selected_cue_identifier(), "2")
+        yield timer.later(0.1)
+        self.assertEqual(_get_action(cue_sheet, "1").executed, False)
         self.assertEqual(_get_action(cue_sheet, "2").executed, True)
-        # But the last cue should never be triggered
         self.assertEqual(_get_action(cue_sheet, "3").executed, False)
+        yield timer.later(0.5)
+        self.assertEqual(_get_action(cue_sheet, "3").executed, True)
+        yield d
+        self.assertEqual(cue_sheet.is_running(), False)
+
+    def test_08_long_auto_continue_chain(self):
+        NUM_CUES = 100000
+        cue_sheet = cue.CueSheet()
+        cue_sheet.set_cues([cue.Cue(str(i)) for i in range(NUM_CUES)])
+        stack_depths = []
+
+        def _done_cb(event):
+            stack_depths.append(_get_stack_depth())
+
+        cue_sheet.get_event_bus().subscribe(_done_cb,
+                [events.EVENT_DONE_POST_WAIT])
+        results = []
+        cue_sheet.go().addCallback(results.append)
+        # All done right away, without any recursion:
+        self.assertEqual(results, [None])
+        self.assertEqual(len(stack_depths), NUM_CUES)
+        self.assertEqual(min(stack_depths), max(stack_depths))
+        self.assertEqual(cue_sheet.is_running(), False)
+        self.assertEqual(cue_sheet.get_selected_cue_identifier(),
+                str(NUM_CUES - 1))
+
+    def test_09_stop(self):
+        cue_sheet = cue.CueSheet()
+        cue_sheet.set_cues([
+                cue.Cue("1", 0.0, 1.0, "title1", DummyAction()),
+                cue.Cue("2", 0.0, 1.0, "title2", DummyAction()),
+        ])
+        d = cue_sheet.go()
+        cue_sheet.stop()
+        self.assertEqual(cue_sheet.is_running(), False)
+        self.assertEqual(_get_action(cue_sheet, "2").executed, False)
+        return d
+
+    def test_10_no_drift(self):
+        # A clock that always wakes up 30 ms late:
+        clock = task.Clock()
+        timer.set_clock(clock)
+        self.addCleanup(timer.set_clock, None)
+        cue_sheet = cue.CueSheet()
+        cue_sheet.set_cues([cue.Cue(str(i), 0.1, 0.0, "title", DummyAction())
+                for i in range(100)])
+        lateness = []
+
+        def _late_cb(event):
+            lateness.append(event.value)
+
+        cue_sheet.get_event_bus().subscribe(_late_cb, [events.EVENT_LATE])
+        done = []
+        cue_sheet.go().addCallback(done.append)
+        while not done:
+            calls = clock.getDelayedCalls()
+            clock.advance(calls[0].getTime() - clock.seconds() + 0.03)
+        # Planned to be done at 10 seconds: late once, not 100 times.
+        self.assertTrue(clock.seconds() < 10.1)
+        self.assertEqual(len(lateness), 100)
+        self.assertTrue(max(lateness) < 0.031)
+        planned_end = cue_sheet.get_cue_by_index(-1).get_planned_time()
+        self.assertAlmostEqual(planned_end, 10.0, places=6)
+
+    def test_11_remove_running_cue(self):
+        clock = task.Clock()
+        timer.set_clock(clock)
+        self.addCleanup(timer.set_clock, None)
+        cue_sheet = cue.CueSheet()
+        cue_sheet.set_cues([
+                cue.Cue("1", 0.0, 1.0, "title1", DummyAction(),
+                        cue.FOLLOW_AUTO_CONTINUE),
+                cue.Cue("2", 0.0, 1.0, "title2", DummyAction(),
+                        cue.FOLLOW_AUTO_CONTINUE),
+                cue.Cue("3", 0.0, 1.0, "title3", DummyAction()),
+        ])
+        cue_sheet.go()
+        clock.advance(1.5)
+        self.assertTrue(cue_sheet.get_cue_by_identifier("2").is_running())
+        # It goes on with the cue that followed it:
+        removed = cue_sheet.remove_cue("2")
+        self.assertFalse(removed.is_running())
+        self.assertTrue(_get_action(cue_sheet, "3").executed)
+        self.assertEqual(cue_sheet.get_selected_cue_identifier(), "3")
+        clock.advance(1.0)
+        self.assertFalse(cue_sheet.is_running())
+
+        cue_sheet.select_cue("1")
+        cue_sheet.go()
+        cue_sheet.remove_cue("3")
+        cue_sheet.remove_cue("1")
+        self.assertFalse(cue_sheet.is_running())
+        self.assertEqual(cue_sheet.get_size(), 0)
+
+
+class TestCueMemory(unittest.TestCase):
+    def test_01_idle_cue_size(self):
+        cue_sheet = cue.CueSheet()
+        cue_sheet.set_cues([cue.Cue(str(i), 1.0, 1.0, "title")
+                for i in range(100)])
+        sample = cue_sheet.get_cues()[::10]
+        excluded = [cue_sheet, cue_sheet.get_event_bus(), "title", 1.0]
+
+        idle_size = sum(_get_deep_size(item, excluded) for item in sample)
+        for item in sample:
+            # What each cue used to allocate in its constructor:
+            item.go()
+            item.cancel()
+            for name in ["go", "done_trigger", "done_pre_wait",
+                    "done_post_wait", "cancelled", "log"]:
+                getattr(item, "signal_" + name)
+        allocated_size = sum(_get_deep_size(item, excluded) for item in sample)
+
+        idle_size = float(idle_size) / len(sample)
+        allocated_size = float(allocated_size) / len(sample)
+        # About 270 bytes with a 64-bit Python 2.7.
+        # See benchmarks/cue_memory.py for a large cue sheet.
+        self.assertTrue(idle_size < 512)
+        self.assertTrue(idle_size * 4 < allocated_size)
 
-    test_04_follow_when_done.skip = "FIXME: action 2 is never executed, it seems"
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+# -*- coding: utf-8; tab-width: 4; mode: python -*-
+"""
+Test cases for openshow.cuelist
+"""
+import bisect
+import random
+from twisted.trial import unittest
+from openshow import cuelist
+
+
+class TestCueList(unittest.TestCase):
+    def test_01_append_and_index(self):
+        items = cuelist.CueList()
+        nodes = [items.append(i) for i in range(100)]
+        self.assertEqual(len(items), 100)
+        self.assertEqual(list(items), list(range(100)))
+        for i in range(100):
+            self.assertEqual(items[i], i)
+            self.assertEqual(items.index_of(nodes[i]), i)
+        self.assertEqual(items[-1], 99)
+        self.assertRaises(IndexError, items.get_node, 100)
+
+    def test_02_same_as_list(self):
+        rand = random.Random(1234)
+        items = cuelist.CueList()
+        expected = []
+        nodes = {}
+        for value in range(2000):
+            if expected and rand.random() < 0.3:
+                index = rand.randrange(len(expected))
+                if rand.random() < 0.5:
+                    removed = items.pop(index)
+                else:
+                    removed = items.remove_node(nodes[expected[index]])
+                self.assertEqual(removed, expected.pop(index))
+                del nodes[removed]
+            else:
+                # Also out of range, and from the end:
+                index = rand.randrange(-len(expected) - 2, len(expected) + 3)
+                nodes[value] = items.insert(index, value)
+                expected.insert(index, value)
+        self.assertEqual(list(items), expected)
+        self.assertEqual(len(items), len(expected))
+        for index, value in enumerate(expected):
+            self.assertEqual(items.index_of(nodes[value]), index)
+            self.assertEqual(items[index], value)
+
+    def test_03_weights(self):
+        rand = random.Random(4321)
+        items = cuelist.CueList()
+        weights = []
+        nodes = []
+        for i in range(500):
+            weight = float(rand.randrange(0, 4))
+            index = rand.randrange(len(nodes) + 1)
+            nodes.insert(index, items.insert(index, i, weight))
+            weights.insert(index, weight)
+        for i in range(0, 500, 7):
+            weights[i] = 2.5
+            items.set_weight(nodes[i], 2.5)
+        self.assertEqual(items.get_total_weight(), sum(weights))
+        position = 0.0
+        for i, node in enumerate(nodes):
+            self.assertEqual(items.get_weight_before(node), position)
+            if weights[i] > 0.0:
+                self.assertIdentical(items.find_by_weight(position), node)
+                self.assertIdentical(
+                        items.find_by_weight(position + weights[i] - 0.5), node)
+            position += weights[i]
+        self.assertIdentical(items.find_by_weight(position), None)
+        self.assertIdentical(items.find_by_weight(-1.0), None)
+
+    def test_04_bisect(self):
+        rand = random.Random(5678)
+        values = sorted(rand.randrange(100) for i in range(300))
+        items = cuelist.CueList([(value, "x") for value in values])
+        get_value = lambda item: item[0]
+        for value in range(-1, 102):
+            self.assertEqual(items.bisect_left(value, get_value),
+                    bisect.bisect_left(values, value))
+            self.assertEqual(items.bisect_right(value, get_value),
+                    bisect.bisect_right(values, value))
+        self.assertEqual(cuelist.CueList([1, 2, 2, 3]).bisect_right(2), 3)
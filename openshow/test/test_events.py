@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+# -*- coding: utf-8; tab-width: 4; mode: python -*-
+"""
+Test cases for openshow.events
+"""
+from twisted.trial import unittest
+from twisted.internet import defer
+from openshow import cue
+from openshow import events
+
+
+class TestEventBus(unittest.TestCase):
+    def _make_cue_sheet(self, size):
+        cue_sheet = cue.CueSheet()
+        cue_sheet.set_cues([cue.Cue(str(i)) for i in range(size)])
+        return cue_sheet
+
+    def test_01_filter_by_kind(self):
+        cue_sheet = self._make_cue_sheet(3)
+        received = []
+        bus = cue_sheet.get_event_bus()
+        subscription = bus.subscribe(received.append,
+                [events.EVENT_GO, events.EVENT_CANCELLED])
+        cue_sheet.get_cue_by_identifier("1").go()
+        self.assertEqual([(event.kind, event.cue.get_identifier())
+                for event in received], [(events.EVENT_GO, "1")])
+
+        bus.unsubscribe(subscription)
+        cue_sheet.get_cue_by_identifier("2").go()
+        self.assertEqual(len(received), 1)
+
+    def test_02_filter_by_range(self):
+        cue_sheet = self._make_cue_sheet(10)
+        received = []
+        cue_sheet.get_event_bus().subscribe(received.append,
+                [events.EVENT_DONE_POST_WAIT], first=3, last=5)
+        for item in cue_sheet.get_cues():
+            item.go()
+        self.assertEqual([event.cue.get_identifier() for event in received],
+                ["3", "4", "5"])
+
+    def test_03_sheet_signals(self):
+        cue_sheet = self._make_cue_sheet(2)
+        received = []
+
+        class Listener(object):
+            def cue_go_cb(self, cue_item):
+                received.append(cue_item.get_identifier())
+
+        listener = Listener()
+        cue_sheet.signal_cue_go.connect(listener.cue_go_cb)
+        d = cue_sheet.go()
+
+        def _cb(result):
+            self.assertEqual(received, ["0", "1"])
+
+        return d.addCallback(_cb)
+
+    def test_04_removed_cue(self):
+        cue_sheet = self._make_cue_sheet(2)
+        received = []
+        cue_sheet.get_event_bus().subscribe(received.append)
+        removed = cue_sheet.remove_cue("0")
+        removed.go()
+        self.assertEqual(received, [])
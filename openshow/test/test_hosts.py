@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+# -*- coding: utf-8; tab-width: 4; mode: python -*-
+"""
+Test cases for openshow.actions.hosts
+"""
+from twisted.trial import unittest
+from twisted.internet import defer
+from twisted.internet import task
+from openshow.actions import hosts
+
+
+class FakeResolverReactor(task.Clock):
+    """
+    Resolves names when told to.
+    """
+    def __init__(self):
+        task.Clock.__init__(self)
+        self.lookups = [] # (name, Deferred)
+
+    def resolve(self, name):
+        d = defer.Deferred()
+        self.lookups.append((name, d))
+        return d
+
+    def answer(self, address):
+        name, d = self.lookups.pop(0)
+        if isinstance(address, Exception):
+            d.errback(address)
+        else:
+            d.callback(address)
+
+
+class TestHostCache(unittest.TestCase):
+    def setUp(self):
+        self.reactor = FakeResolverReactor()
+        self.cache = hosts.HostCache(ttl=10.0, reactor=self.reactor)
+
+    def test_01_addresses(self):
+        self.assertEqual(self.cache.get_address("192.168.0.1"), "192.168.0.1")
+        self.assertEqual(self.cache.get_address("::1"), "::1")
+        self.assertEqual(self.reactor.lookups, [])
+
+    def test_02_prepare(self):
+        self.cache.prepare("lighting")
+        self.cache.prepare("lighting")
+        self.assertEqual(len(self.reactor.lookups), 1)
+        # Not resolved yet:
+        self.assertEqual(self.cache.get_address("lighting"), None)
+        self.assertEqual(len(self.reactor.lookups), 1)
+        self.reactor.answer("10.0.0.5")
+        self.assertEqual(self.cache.get_address("lighting"), "10.0.0.5")
+        self.cache.prepare("lighting")
+        self.assertEqual(self.reactor.lookups, [])
+
+    def test_03_resolve(self):
+        results = []
+        self.cache.resolve("sound").addCallback(results.append)
+        self.cache.resolve("sound").addCallback(results.append)
+        self.assertEqual(results, [])
+        self.reactor.answer("10.0.0.6")
+        self.assertEqual(results, ["10.0.0.6", "10.0.0.6"])
+        self.cache.resolve("sound").addCallback(results.append)
+        self.assertEqual(len(results), 3)
+
+        failures = []
+        self.cache.resolve("nowhere").addErrback(failures.append)
+        self.reactor.answer(RuntimeError("no such host"))
+        self.assertEqual(len(failures), 1)
+
+    def test_04_ttl(self):
+        self.cache.prepare("video")
+        self.reactor.answer("10.0.0.7")
+        self.reactor.advance(9.0)
+        self.assertEqual(self.cache.get_address("video"), "10.0.0.7")
+        self.assertEqual(self.reactor.lookups, [])
+        # Expired: still used, while resolved again in the background.
+        self.reactor.advance(1.0)
+        self.assertEqual(self.cache.get_address("video"), "10.0.0.7")
+        self.assertEqual(self.cache.get_address("video"), "10.0.0.7")
+        self.assertEqual(len(self.reactor.lookups), 1)
+        self.reactor.answer("10.0.0.8")
+        self.assertEqual(self.cache.get_address("video"), "10.0.0.8")
+        # A failure keeps the address it had:
+        self.reactor.advance(10.0)
+        self.cache.get_address("video")
+        self.reactor.answer(RuntimeError("no DNS server"))
+        self.assertEqual(self.cache.get_address("video"), "10.0.0.8")
+        self.assertEqual(self.reactor.lookups, [])
@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+# -*- coding: utf-8; tab-width: 4; mode: python -*-
+"""
+Test cases for openshow.lookahead
+"""
+import struct
+import time
+from twisted.trial import unittest
+from twisted.internet import task
+from txosc import osc as txosc
+from openshow import cue
+from openshow import lookahead
+from openshow import timer
+from openshow.actions import bundles
+from openshow.actions import osc
+from openshow.actions import udp
+from openshow.test import test_osc
+
+
+def _get_timetag(datagram):
+    """
+    Returns the time tag of a bundle, or None if it is a message.
+    """
+    if not datagram.startswith(bundles.BUNDLE_TAG):
+        return None
+    return struct.unpack(">Q", datagram[8:16])[0]
+
+
+def _get_path(datagram):
+    element = txosc._elementFromBinary(datagram)
+    while isinstance(element, txosc.Bundle):
+        element = element.elements[0]
+    return element.address
+
+
+class TestLookahead(unittest.TestCase):
+    def setUp(self):
+        self.clock = task.Clock()
+        timer.set_clock(self.clock)
+        self.addCleanup(timer.set_clock, None)
+        self.pool = test_osc.RecordingPool()
+        self.patch(udp, "_pool", self.pool)
+        self.patch(osc, "_is_bundling", False)
+        self.sent = [] # (time, path, time tag)
+
+        def _send(packet, host, port):
+            self.sent.append((round(self.clock.seconds(), 6), _get_path(packet),
+                    _get_timetag(packet)))
+
+        self.pool.send = _send
+
+    def _create_cue_sheet(self, cancel_paths):
+        cue_sheet = cue.CueSheet()
+        for i, cancel_path in enumerate(cancel_paths):
+            cue_sheet.append_cue(cue.Cue(str(i + 1), 0.0, 1.0,
+                    action=osc.OscAction("127.0.0.1", 12345, "/go/%d" % (i),
+                    [1], cancel_path)))
+        cue_sheet.get_cues()[-1].set_follow(cue.FOLLOW_DO_NOT_CONTINUE)
+        return cue_sheet
+
+    def assertTimetag(self, sent, planned_time):
+        """
+        Checks that something sent at a time of the virtual clock has the
+        time tag of the time of day it would be at the planned time, had the
+        virtual clock kept up with it.
+        """
+        sent_time, path, timetag = sent
+        expected = bundles.get_timetag(time.time() + planned_time - sent_time)
+        self.assertTrue(abs(timetag - expected) < 2 ** 32 * 0.01)
+
+    def test_01_send_ahead(self):
+        cue_sheet = self._create_cue_sheet(["/undo/0", "/undo/1", "/undo/2"])
+        sender = lookahead.Lookahead(0.25)
+        sender.attach(cue_sheet)
+        cue_sheet.go()
+        # The first one goes right away, as usual:
+        self.assertEqual(self.sent, [(0.0, "/go/0", None)])
+        self.clock.pump([0.25] * 12)
+        self.assertEqual(cue_sheet.is_running(), False)
+        self.assertEqual([(time, path) for time, path, timetag in self.sent],
+                [(0.0, "/go/0"), (0.75, "/go/1"), (1.75, "/go/2")])
+        self.assertTimetag(self.sent[1], 1.0)
+        self.assertTimetag(self.sent[2], 2.0)
+
+    def test_02_cancel(self):
+        cue_sheet = self._create_cue_sheet(["", "/undo/1", "/undo/2"])
+        sender = lookahead.Lookahead(0.25)
+        sender.attach(cue_sheet)
+        cue_sheet.go()
+        self.clock.pump([0.25] * 3)
+        self.assertEqual(len(self.sent), 2)
+        self.assertTrue(sender.is_sent_ahead(cue_sheet.get_cues()[1]))
+        cue_sheet.stop()
+        # Undone, at the same time:
+        self.assertEqual(self.sent[-1][1], "/undo/1")
+        self.assertEqual(self.sent[-1][2], self.sent[-2][2])
+        self.assertFalse(sender.is_sent_ahead(cue_sheet.get_cues()[1]))
+        self.clock.pump([0.25] * 12)
+        self.assertEqual(len(self.sent), 3)
+
+        # Sent again normally next time:
+        cue_sheet.select_cue("2")
+        cue_sheet.go()
+        self.assertEqual(self.sent[-1], (self.clock.seconds(), "/go/1", None))
+
+    def test_03_guard(self):
+        # Without a cancel path, not sent ahead at all:
+        cue_sheet = self._create_cue_sheet(["", "", ""])
+        sender = lookahead.Lookahead(0.25)
+        sender.attach(cue_sheet)
+        cue_sheet.go()
+        self.clock.pump([0.0625] * 56)
+        self.assertEqual(self.sent, [(0.0, "/go/0", None),
+                (1.0, "/go/1", None), (2.0, "/go/2", None)])
+
+        # Or only within the guard window:
+        del self.sent[:]
+        sender.set_lookahead(0.25, 0.125)
+        cue_sheet.select_cue("1")
+        cue_sheet.go()
+        self.clock.pump([0.0625] * 56)
+        self.assertEqual([time for time, path, timetag in self.sent],
+                [3.5, 4.375, 5.375])
+        self.assertEqual(self.clock.getDelayedCalls(), [])
+
+    def test_04_disabled(self):
+        cue_sheet = self._create_cue_sheet(["/undo/0", "/undo/1"])
+        sender = lookahead.Lookahead()
+        sender.attach(cue_sheet)
+        cue_sheet.go()
+        self.clock.pump([0.25] * 8)
+        self.assertEqual([timetag for time, path, timetag in self.sent],
+                [None, None])
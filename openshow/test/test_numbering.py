@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+# -*- coding: utf-8; tab-width: 4; mode: python -*-
+"""
+Test cases for openshow.numbering
+"""
+from twisted.trial import unittest
+from openshow import cue
+from openshow import numbering
+
+
+class TestCueNumberIndex(unittest.TestCase):
+    def test_01_natural_order(self):
+        index = numbering.CueNumberIndex()
+        for identifier in ["10", "intro", "2", "1.5", "12a", "12", "1"]:
+            index.add(identifier)
+        self.assertEqual(index.get_identifiers(),
+                ["1", "1.5", "2", "10", "12", "12a", "intro"])
+        index.remove("10")
+        self.assertEqual(index.get_identifiers(),
+                ["1", "1.5", "2", "12", "12a", "intro"])
+        self.assertRaises(RuntimeError, index.remove, "10")
+
+    def test_02_queries(self):
+        index = numbering.CueNumberIndex()
+        for i in range(1, 201):
+            index.add(str(i))
+        index.add("42.5")
+        index.add("150a")
+        self.assertEqual(index.get_range(100, 102), ["100", "101", "102"])
+        self.assertEqual(index.get_range("149", "150"), ["149", "150", "150a"])
+        self.assertEqual(index.get_first_after("42.3"), "42.5")
+        self.assertEqual(index.get_first_after(42.5), "43")
+        self.assertEqual(index.get_first_after(200), None)
+        self.assertEqual(index.get_last_before(43), "42.5")
+        self.assertEqual(index.get_last_before(1), None)
+
+    def test_03_generate_number_after(self):
+        index = numbering.CueNumberIndex()
+        for identifier in ["1", "2", "2.5", "2.6", "3a"]:
+            index.add(identifier)
+        self.assertEqual(index.generate_number_after("1"), "1.1")
+        self.assertEqual(index.generate_number_after("2.5"), "2.51")
+        self.assertEqual(index.generate_number_after("2.6"), "2.7")
+        self.assertEqual(index.generate_number_after("3a"), "4")
+
+    def test_04_float_numbers(self):
+        self.assertEqual(numbering.to_number(1e-05),
+                numbering.to_number("0.00001"))
+        self.assertEqual(numbering.to_number(2.5), numbering.to_number("2.5"))
+        self.assertRaises(ValueError, numbering.to_number, float("inf"))
+        index = numbering.CueNumberIndex()
+        for identifier in ["0", "0.00001", "0.1"]:
+            index.add(identifier)
+        self.assertEqual(index.get_first_after(1e-06), "0.00001")
+        self.assertEqual(index.get_range(1e-05, 0.1), ["0.00001", "0.1"])
+
+    def test_05_cue_sheet(self):
+        cue_sheet = cue.CueSheet()
+        cue_sheet.set_cues([cue.Cue(str(i)) for i in range(1, 11)])
+        self.assertEqual(cue_sheet.generate_name_for_cue_after("10"), "11")
+        self.assertEqual(cue_sheet.generate_name_for_cue_after("4"), "4.1")
+        cue_sheet.rename_cue("5", "4.5")
+        cues = cue_sheet.get_cues_in_number_range(4, 6)
+        self.assertEqual([item.get_identifier() for item in cues],
+                ["4", "4.5", "6"])
+        self.assertEqual(
+                cue_sheet.get_first_cue_after_number("4.2").get_identifier(),
+                "4.5")
+        cue_sheet.remove_cue("4.5")
+        self.assertEqual(
+                cue_sheet.get_first_cue_after_number("4.2").get_identifier(),
+                "6")
+        self.assertRaises(RuntimeError,
+                cue_sheet.generate_name_for_cue_after, "5")
@@ -0,0 +1,182 @@
+#!/usr/bin/env python
+# -*- coding: utf-8; tab-width: 4; mode: python -*-
+"""
+Test cases for openshow.actions.osc
+"""
+from twisted.trial import unittest
+from twisted.internet import defer
+from openshow import project
+from openshow.actions import bundles
+from openshow.actions import hosts
+from openshow.actions import osc
+from openshow.actions import tcp
+from openshow.actions import udp
+from openshow.test import test_hosts
+from openshow.test import test_project
+
+
+class RecordingPool(object):
+    """
+    Stands for the UDP sender pool.
+    """
+    def __init__(self):
+        self.sent = [] # (packet, host, port)
+
+    def is_closed(self):
+        return False
+
+    def send(self, packet, host, port):
+        self.sent.append((packet, host, port))
+
+    def send_many(self, packet, destinations):
+        for host, port in destinations:
+            self.send(packet, host, port)
+
+    def send_multicast(self, packet, group, port, ttl, loopback):
+        self.sent.append((packet, group, port, ttl, loopback))
+
+
+class RecordingTcpPool(RecordingPool):
+    """
+    Stands for the TCP connection pool.
+    """
+    def send(self, packet, host, port, framing=tcp.FRAMING_SLIP):
+        self.sent.append((packet, host, port, framing))
+
+
+class TestOscAction(unittest.TestCase):
+    def setUp(self):
+        self.sent = []
+
+        def _send_udp_packet(packet, port, host):
+            self.sent.append((packet, port, host))
+            return defer.succeed(None)
+
+        self.patch(osc, "send_udp_packet", _send_udp_packet)
+        self.reactor = test_hosts.FakeResolverReactor()
+        self.patch(hosts, "_cache", hosts.HostCache(reactor=self.reactor))
+
+    def test_01_prepare(self):
+        action = osc.OscAction("localhost", "12345", "/hello",
+                ["1", "2.5", "three", 4])
+        self.assertEqual(action.get_packet(), None)
+        action.prepare()
+        expected = osc.create_message_auto("/hello", "1", "2.5", "three",
+                4).toBinary()
+        self.assertEqual(action.get_packet(), expected)
+        action.execute()
+        action.execute()
+        self.assertEqual(self.sent, [(expected, 12345, "localhost")] * 2)
+
+        # Changing an attribute prepares it again:
+        action.set_args([5])
+        self.assertEqual(action.get_packet(), None)
+        action.execute()
+        self.assertEqual(self.sent[-1][0],
+                osc.create_message_auto("/hello", 5).toBinary())
+
+    def test_02_invalid_port(self):
+        action = osc.OscAction(port="not a port")
+        self.assertRaises(RuntimeError, action.prepare)
+        failures = []
+        action.execute().addErrback(failures.append)
+        self.assertEqual(len(failures), 1)
+        self.assertEqual(self.sent, [])
+
+    def test_04_tcp(self):
+        pool = RecordingTcpPool()
+        self.patch(tcp, "_pool", pool)
+        action = osc.OscAction("10.0.0.5", 12345, "/hello", [1],
+                transport=osc.TRANSPORT_TCP, framing=tcp.FRAMING_LENGTH)
+        action.execute()
+        self.assertEqual(pool.sent, [(action.get_packet(), "10.0.0.5", 12345,
+                tcp.FRAMING_LENGTH)])
+        self.assertEqual(self.sent, [])
+
+        action.set_attribute("transport", "carrier pigeon")
+        self.assertRaises(RuntimeError, action.prepare)
+
+    def test_05_fanout(self):
+        pool = RecordingPool()
+        self.patch(udp, "_pool", pool)
+        action = osc.OscAction("239.255.0.1", 12345, "/hello", [1],
+                multicast_ttl="4", multicast_loopback="false")
+        action.execute()
+        self.assertEqual(pool.sent, [(action.get_packet(), "239.255.0.1",
+                12345, 4, False)])
+
+        del pool.sent[:]
+        action.set_attribute("destinations",
+                "10.0.0.1, 10.0.0.2:7000 lighting")
+        action.execute()
+        # Sent without waiting for the others to be resolved:
+        self.assertEqual(pool.sent, [(action.get_packet(), "10.0.0.1", 12345),
+                (action.get_packet(), "10.0.0.2", 7000)])
+        self.assertEqual([name for name, d in self.reactor.lookups],
+                ["lighting"])
+        self.reactor.answer("10.0.0.3")
+        self.assertEqual(pool.sent[-1], (action.get_packet(), "10.0.0.3",
+                12345))
+        self.assertEqual(self.sent, [])
+
+        action.set_attribute("transport", osc.TRANSPORT_TCP)
+        self.assertRaises(RuntimeError, action.prepare)
+        action.set_attribute("transport", osc.TRANSPORT_UDP)
+        action.set_attribute("multicast_ttl", "256")
+        self.assertRaises(RuntimeError, action.prepare)
+
+    def test_06_argument_types(self):
+        # Attributes read from a project file are unicode in Python 2:
+        action = osc.OscAction("localhost", 12345, u"/hello",
+                [u"caf\xe9", u"7", True, False])
+        action.prepare()
+        packet = action.get_packet()
+        self.assertTrue(b",siTF" in packet)
+        self.assertTrue(b"caf\xc3\xa9" in packet)
+        action.set_args([object()])
+        self.assertRaises(RuntimeError, action.prepare)
+
+    def test_03_prepared_at_load(self):
+        file_path = test_project.make_temporary_file(
+                test_project.PROJECT_DATA)
+        cue_sheet = project.ProjectPersistance().parse_project_file(file_path)
+        for cue_item in cue_sheet.get_cues():
+            self.assertNotEqual(cue_item.get_action().get_packet(), None)
+        # Their host is resolved once:
+        self.assertEqual([name for name, d in self.reactor.lookups],
+                ["localhost"])
+
+
+class TestSendUdpPacket(unittest.TestCase):
+    def setUp(self):
+        self.reactor = test_hosts.FakeResolverReactor()
+        self.patch(hosts, "_cache", hosts.HostCache(reactor=self.reactor))
+        self.pool = RecordingPool()
+        self.sent = self.pool.sent
+        self.patch(udp, "_pool", self.pool)
+        self.patch(bundles, "_sender", bundles.BundlingSender(
+                reactor=self.reactor))
+
+    def test_01_resolved_once(self):
+        results = []
+        osc.send_udp_packet(b"/go", 12345, "lighting").addCallback(
+                results.append)
+        # Sent once resolved, without blocking:
+        self.assertEqual(self.sent, [])
+        self.reactor.answer("10.0.0.5")
+        self.assertEqual(results, [None])
+        self.reactor.advance(0)
+        osc.send_udp_packet(b"/stop", 12345, "lighting")
+        self.reactor.advance(0)
+        self.assertEqual(self.sent, [(b"/go", "10.0.0.5", 12345),
+                (b"/stop", "10.0.0.5", 12345)])
+        self.assertEqual(self.reactor.lookups, [])
+
+    def test_02_without_bundles(self):
+        self.patch(osc, "_is_bundling", True)
+        osc.send_udp_packet(b"/go", 12345, "10.0.0.5")
+        osc.set_bundling(False)
+        # What was pending is sent first:
+        self.assertEqual(self.sent, [(b"/go", "10.0.0.5", 12345)])
+        osc.send_udp_packet(b"/stop", 12345, "10.0.0.5")
+        self.assertEqual(self.sent[-1], (b"/stop", "10.0.0.5", 12345))
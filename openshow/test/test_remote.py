@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+# -*- coding: utf-8; tab-width: 4; mode: python -*-
+"""
+Test cases for openshow.remote
+"""
+import socket
+import struct
+from twisted.trial import unittest
+from twisted.test import proto_helpers
+from txosc import osc as txosc
+from openshow import cue
+from openshow import remote
+from openshow.actions import bundles
+from openshow.actions import tcp
+from openshow.test import test_tcp
+
+
+def _encode(address, *args):
+    return txosc.Message(address, *args).toBinary()
+
+
+class TestDecoding(unittest.TestCase):
+    def test_01_message(self):
+        data = _encode("/openshow/select", 3, 2.5, "three", True, None)
+        address, args = remote.decode_message(data)
+        self.assertEqual(address, "/openshow/select")
+        self.assertEqual(args, [3, 2.5, "three", True, None])
+        # Without type tags:
+        self.assertEqual(remote.decode_message(b"/go\0"), ("/go", []))
+
+    def test_02_bundle(self):
+        data = bundles.encode_bundle([_encode("/go", 1),
+                bundles.encode_bundle([_encode("/stop")])])
+        self.assertEqual(remote.decode_packet(data), [("/go", [1]),
+                ("/stop", [])])
+
+    def test_03_invalid(self):
+        data = _encode("/openshow/select", 3)
+        for invalid in (data[:-2], b"/go\0,x\0\0", b"/go",
+                bundles.encode_bundle([data])[:-4]):
+            self.assertRaises(RuntimeError, remote.decode_packet, invalid)
+
+
+class TestOscServer(unittest.TestCase):
+    def setUp(self):
+        self.server = remote.OscServer()
+        self.addCleanup(self.server.close)
+        self.received = []
+        self.server.add_handler("/openshow/go", lambda address, args:
+                self.received.append((address, args)))
+
+    def test_01_handle_packet(self):
+        self.server.handle_packet(_encode("/openshow/go", 1))
+        self.server.handle_packet(_encode("/openshow/g?"))
+        self.server.handle_packet(_encode("/openshow/stop"))
+        self.server.handle_packet(b"garbage")
+        self.assertEqual(self.received, [("/openshow/go", [1]),
+                ("/openshow/g?", [])])
+        self.assertEqual(self.server.get_message_count(), 3)
+        self.assertEqual(self.server.get_error_count(), 1)
+
+    def test_02_failing_handler(self):
+        def _fail(address, args):
+            raise RuntimeError("failing")
+
+        self.server.add_handler("/openshow/go", _fail)
+        self.server.handle_packet(_encode("/openshow/go"))
+        self.assertEqual(len(self.flushLoggedErrors(RuntimeError)), 1)
+        # The other handlers are still called:
+        self.server.add_handler("/openshow/go", lambda address, args:
+                self.received.append("again"))
+        self.server.handle_packet(_encode("/openshow/go"))
+        self.assertEqual(self.received[-1], "again")
+        self.flushLoggedErrors(RuntimeError)
+
+    def test_03_udp(self):
+        port = self.server.listen_udp(0, "127.0.0.1").getHost().port
+        sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.addCleanup(sender.close)
+        for i in range(100):
+            sender.sendto(_encode("/openshow/go", i), ("127.0.0.1", port))
+        d = test_tcp._wait(lambda: len(self.received) == 100)
+        d.addCallback(lambda result: self.assertEqual(
+                [args[0] for address, args in self.received],
+                list(range(100))))
+        return d
+
+    def test_04_tcp(self):
+        port = self.server.listen_tcp(0, "127.0.0.1").getHost().port
+        pool = tcp.TcpConnectionPool()
+        self.addCleanup(pool.close)
+        for i in range(100):
+            pool.send(_encode("/openshow/go", i), "127.0.0.1", port)
+        d = test_tcp._wait(lambda: len(self.received) == 100)
+        d.addCallback(lambda result: self.assertEqual(
+                [args[0] for address, args in self.received],
+                list(range(100))))
+        return d
+
+    def _connect(self, framing):
+        factory = remote._TcpReceiverFactory(self.server, framing)
+        receiver = factory.buildProtocol(None)
+        receiver.makeConnection(proto_helpers.StringTransport())
+        return receiver
+
+    def test_05_tcp_frames(self):
+        # A packet that arrives in many chunks:
+        receiver = self._connect(tcp.FRAMING_LENGTH)
+        data = tcp.encode_length(_encode("/openshow/go", "x" * 1000))
+        for i in range(0, len(data), 10):
+            receiver.dataReceived(data[i:i + 10])
+        self.assertEqual(len(self.received), 1)
+        self.assertFalse(receiver.transport.disconnecting)
+
+        # Invalid or endless frames close the connection:
+        receiver.dataReceived(struct.pack(">i", -4))
+        self.assertTrue(receiver.transport.disconnecting)
+        receiver = self._connect(tcp.FRAMING_LENGTH)
+        receiver.dataReceived(struct.pack(">i", remote.MAX_FRAME_SIZE))
+        self.assertTrue(receiver.transport.disconnecting)
+        receiver = self._connect(tcp.FRAMING_SLIP)
+        receiver.dataReceived(tcp.encode_slip(_encode("/openshow/go")))
+        self.assertEqual(len(self.received), 2)
+        for i in range(remote.MAX_FRAME_SIZE // 1000):
+            receiver.dataReceived(b"x" * 1000)
+        self.assertFalse(receiver.transport.disconnecting)
+        receiver.dataReceived(b"x" * 1000)
+        self.assertTrue(receiver.transport.disconnecting)
+        receiver.dataReceived(tcp.encode_slip(_encode("/openshow/go")))
+        self.assertEqual(len(self.received), 2)
+        self.assertEqual(self.server.get_error_count(), 3)
+
+
+class TestRemoteControl(unittest.TestCase):
+    def test_01_cue_sheet(self):
+        cue_sheet = cue.CueSheet()
+        for identifier in ("1", "2", "3"):
+            cue_sheet.append_cue(cue.Cue(identifier, 0.0, 1.0))
+        server = remote.OscServer()
+        control = remote.RemoteControl()
+        control.register(server)
+        # Not attached yet:
+        server.handle_packet(_encode("/openshow/go"))
+        self.assertFalse(cue_sheet.is_running())
+
+        control.attach(cue_sheet)
+        server.handle_packet(_encode("/openshow/select", 2))
+        self.assertEqual(cue_sheet.get_selected_cue_identifier(), "2")
+        server.handle_packet(_encode("/openshow/select", 3.0))
+        self.assertEqual(cue_sheet.get_selected_cue_identifier(), "3")
+        server.handle_packet(_encode("/openshow/go"))
+        self.assertTrue(cue_sheet.is_running())
+        server.handle_packet(_encode("/openshow/stop"))
+        self.assertFalse(cue_sheet.is_running())
+
+        # Ignored:
+        server.handle_packet(_encode("/openshow/select", "missing"))
+        server.handle_packet(_encode("/openshow/select"))
+        self.assertEqual(cue_sheet.get_selected_cue_identifier(), "3")
+        self.assertEqual(len(self.flushLoggedErrors()), 0)
@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+# -*- coding: utf-8; tab-width: 4; mode: python -*-
+"""
+Test cases for openshow.sequencer
+"""
+import random
+from twisted.trial import unittest
+from twisted.internet import defer
+from twisted.internet import task
+from openshow import sequencer
+from openshow import timer
+
+
+class TestSequencer(unittest.TestCase):
+    def test_01_order(self):
+        clock = task.Clock()
+        seq = sequencer.Sequencer(clock)
+        called = []
+        seq.call_later(2.0, called.append, "b")
+        seq.call_later(1.0, called.append, "a")
+        seq.call_later(2.0, called.append, "c")
+        seq.call_later(3.0, called.append, "d")
+        # The clock only knows about the head of the queue:
+        self.assertEqual(len(clock.getDelayedCalls()), 1)
+        self.assertEqual(clock.getDelayedCalls()[0].getTime(), 1.0)
+        clock.advance(1.0)
+        self.assertEqual(called, ["a"])
+        clock.advance(1.5)
+        self.assertEqual(called, ["a", "b", "c"])
+        clock.advance(10.0)
+        self.assertEqual(called, ["a", "b", "c", "d"])
+        self.assertEqual(len(seq), 0)
+        self.assertEqual(len(clock.getDelayedCalls()), 0)
+
+    def test_02_cancel(self):
+        clock = task.Clock()
+        seq = sequencer.Sequencer(clock)
+        called = []
+        first = seq.call_later(1.0, called.append, "a")
+        second = seq.call_later(1.0, called.append, "b")
+        # A due call can cancel another one that is due at the same time:
+        seq.call_later(0.5, second.cancel)
+        first.cancel()
+        self.assertFalse(first.active())
+        first.cancel() # does nothing
+        clock.advance(2.0)
+        self.assertEqual(called, [])
+        self.assertFalse(second.active())
+
+        # Many random calls, half of them cancelled:
+        calls = []
+        expected = []
+        for i in range(1000):
+            when = random.random() * 100.0
+            calls.append((when, seq.call_later(when, called.append, when)))
+        for index, (when, call) in enumerate(calls):
+            if index % 2 == 0:
+                call.cancel()
+            else:
+                expected.append(when)
+        self.assertEqual(len(seq), 500)
+        clock.advance(100.0)
+        self.assertEqual(called, sorted(expected))
+
+    def test_03_called_while_waking_up(self):
+        clock = task.Clock()
+        seq = sequencer.Sequencer(clock)
+        called = []
+
+        def _first():
+            called.append("first")
+            seq.call_later(0.0, called.append, "now")
+            seq.call_later(1.0, called.append, "later")
+
+        seq.call_later(1.0, _first)
+        clock.advance(1.0)
+        self.assertEqual(called, ["first", "now"])
+        clock.advance(1.0)
+        self.assertEqual(called, ["first", "now", "later"])
+
+    def test_04_precision(self):
+        seq = sequencer.Sequencer(timer.get_clock(), 0.005)
+        deferred = defer.Deferred()
+        lateness = []
+
+        def _cb(when):
+            lateness.append(seq.seconds() - when)
+            if len(lateness) < 20:
+                when += 0.01
+                seq.call_at(when, _cb, when)
+            else:
+                deferred.callback(None)
+
+        def _check(result):
+            lateness.sort()
+            self.assertTrue(lateness[0] >= 0.0)
+            self.assertTrue(lateness[10] < 0.001)
+            self.assertTrue(seq.get_spin_time() > 0.0)
+
+        when = seq.seconds() + 0.01
+        seq.call_at(when, _cb, when)
+        deferred.addCallback(_check)
+        return deferred
+
+    def test_05_no_spin_with_virtual_clock(self):
+        timer.set_spin_budget(0.01)
+        self.addCleanup(timer.set_spin_budget, 0.0)
+        self.assertEqual(timer.get_sequencer().get_spin_budget(), 0.01)
+        timer.set_clock(task.Clock())
+        self.addCleanup(timer.set_clock, None)
+        self.assertEqual(timer.get_sequencer().get_spin_budget(), 0.0)
+
+    def test_06_call_after_wake_up(self):
+        clock = task.Clock()
+        seq = sequencer.Sequencer(clock)
+        called = []
+
+        def _due(name):
+            called.append(name)
+            if name == "a":
+                seq.call_after_wake_up(lambda: called.append("after"))
+
+        seq.call_later(1.0, _due, "a")
+        seq.call_later(1.0, _due, "b")
+        seq.call_later(2.0, _due, "c")
+        clock.advance(1.0)
+        self.assertEqual(called, ["a", "b", "after"])
+        clock.advance(1.0)
+        self.assertEqual(called, ["a", "b", "after", "c"])
+        self.assertRaises(RuntimeError, seq.call_after_wake_up, called.pop)
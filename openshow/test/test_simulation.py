@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+# -*- coding: utf-8; tab-width: 4; mode: python -*-
+"""
+Test cases for openshow.simulation
+"""
+import time
+from twisted.trial import unittest
+from twisted.internet import defer
+from twisted.internet import task
+from openshow import cue
+from openshow import events
+from openshow import simulation
+from openshow import timer
+
+
+class DummyAction(cue.Action):
+    def __init__(self):
+        super(DummyAction, self).__init__()
+        self.executed = False
+
+    def execute(self):
+        self.executed = True
+        return defer.succeed(None)
+
+
+def _create_cue_sheet(count, pre_wait, post_wait):
+    cue_sheet = cue.CueSheet()
+    for i in range(count):
+        _cue = cue.Cue(str(i + 1), pre_wait=pre_wait, post_wait=post_wait)
+        _cue.set_action(DummyAction())
+        cue_sheet.append_cue(_cue)
+    cue_sheet.get_cues()[-1].set_follow(cue.FOLLOW_DO_NOT_CONTINUE)
+    return cue_sheet
+
+
+class TestSimulation(unittest.TestCase):
+    def test_01_three_hour_show(self):
+        # 1080 cues of 10 seconds each: three hours.
+        cue_sheet = _create_cue_sheet(1080, 4.0, 6.0)
+        cues = cue_sheet.get_cues()
+        actions = [item.get_action() for item in cues]
+        started = time.time()
+        records = simulation.Simulation(cue_sheet).run()
+        self.failUnless(time.time() - started < 30.0)
+
+        self.failUnlessEqual(records[0].kind, simulation.RECORD_SHEET_GO)
+        self.failUnlessEqual(records[-1].kind, simulation.RECORD_SHEET_DONE)
+        self.failUnlessAlmostEqual(records[-1].time, 3 * 60 * 60.0, places=3)
+        executed = [record for record in records
+                if record.kind == simulation.RECORD_ACTION]
+        self.failUnlessEqual(len(executed), 1080)
+        self.failUnlessEqual(executed[1].identifier, "2")
+        self.failUnlessAlmostEqual(executed[1].time, 14.0, places=3)
+        goes = [record for record in records
+                if record.kind == events.EVENT_GO]
+        self.failUnlessAlmostEqual(goes[2].time, 20.0, places=3)
+
+        # Nothing was actually executed, and everything was put back:
+        for item, action in zip(cues, actions):
+            self.failUnless(item.get_action() is action)
+            self.failIf(action.executed)
+        self.failIf(isinstance(timer.get_clock(), task.Clock))
+
+    def test_02_start_time(self):
+        cue_sheet = _create_cue_sheet(10, 4.0, 6.0)
+        records = simulation.Simulation(cue_sheet).run(start_time=45.0)
+        executed = [record.identifier for record in records
+                if record.kind == simulation.RECORD_ACTION]
+        # cue 5 spans 40 to 50 seconds: it starts right away with what is left
+        # of its post-wait, and the earlier cues are not triggered.
+        self.failUnlessEqual(executed, ["5", "6", "7", "8", "9", "10"])
+        self.failUnlessAlmostEqual(records[1].time, 0.0, places=3)
+        self.failUnlessAlmostEqual(records[-1].time, 55.0, places=3)
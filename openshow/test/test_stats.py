@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+# -*- coding: utf-8; tab-width: 4; mode: python -*-
+"""
+Test cases for openshow.stats
+"""
+import random
+from twisted.trial import unittest
+from twisted.internet import defer
+from twisted.internet import task
+from openshow import cue
+from openshow import stats
+from openshow import timer
+
+
+class SlowAction(cue.Action):
+    """
+    Takes 0.25 second, on the clock of openshow.timer.
+    """
+    def execute(self):
+        return timer.later(0.25)
+
+    def get_type(self):
+        return "slow"
+
+
+class TestLatencyHistogram(unittest.TestCase):
+    def test_01_percentiles(self):
+        histogram = stats.LatencyHistogram()
+        self.assertEqual(histogram.get_value_at_percentile(50), 0.0)
+        values = [random.random() for i in range(10000)]
+        for value in values:
+            histogram.record(value)
+        histogram.record(-1.0) # counts as 0
+        values.append(0.0)
+        values.sort()
+        self.assertEqual(histogram.get_count(), 10001)
+        self.assertEqual(histogram.get_min(), 0.0)
+        self.assertAlmostEqual(histogram.get_max(), values[-1], places=5)
+        for percentile in (10, 50, 90, 99, 99.9):
+            expected = values[int(len(values) * percentile / 100.0) - 1]
+            value = histogram.get_value_at_percentile(percentile)
+            self.assertTrue(abs(value - expected) <= expected * 0.04 + 1e-6)
+        # Its size depends on the range of the values, not on their number:
+        self.assertTrue(len(histogram._counts) < 32 * 20)
+
+    def test_02_add(self):
+        first = stats.LatencyHistogram()
+        second = stats.LatencyHistogram()
+        first.record(0.001)
+        second.record(2.0)
+        second.record(0.000010)
+        first.add(second)
+        self.assertEqual(first.get_count(), 3)
+        self.assertAlmostEqual(first.get_min(), 0.000010)
+        self.assertAlmostEqual(first.get_max(), 2.0)
+        self.assertAlmostEqual(first.get_value_at_percentile(50), 0.001,
+                places=4)
+
+
+class TestCueStats(unittest.TestCase):
+    def test_01_cue_sheet(self):
+        clock = task.Clock()
+        timer.set_clock(clock)
+        self.addCleanup(timer.set_clock, None)
+        cue_sheet = cue.CueSheet()
+        cue_sheet.set_cues([
+                cue.Cue("1", 0.0, 1.0, "title1", SlowAction()),
+                cue.Cue("2", 0.5, 0.0, "title2", None,
+                        cue.FOLLOW_WHEN_DONE),
+                cue.Cue("3", 0.0, 1.0, "title3", SlowAction(),
+                        cue.FOLLOW_DO_NOT_CONTINUE),
+        ])
+        cue_stats = stats.CueStats()
+        cue_stats.attach(cue_sheet)
+        cue_sheet.go()
+        clock.pump([0.1] * 40)
+        self.assertEqual(cue_sheet.is_running(), False)
+
+        self.assertEqual(cue_stats.get_action_types(), ["none", "slow"])
+        action = cue_stats.get_histogram(stats.PHASE_ACTION, "slow")
+        self.assertEqual(action.get_count(), 2)
+        # The clock only wakes up every 0.1 second:
+        self.assertAlmostEqual(action.get_min(), 0.3, places=2)
+        self.assertEqual(cue_stats.get_histogram(stats.PHASE_LATE_START
+                ).get_count(), 3)
+        # From the go of cue 2 to the end of its pre-wait: it goes 0.1 second
+        # late, and its pre-wait still ends when planned.
+        pre_wait = cue_stats.get_histogram(stats.PHASE_PRE_WAIT, "none")
+        self.assertEqual(pre_wait.get_count(), 1)
+        self.assertAlmostEqual(pre_wait.get_min(), 0.4, places=2)
+        late = cue_stats.get_histogram(stats.PHASE_POST_WAIT, "slow")
+        self.assertTrue(late.get_max() > 0.0)
+        self.assertTrue(late.get_max() < 0.1)
+        self.assertTrue("post_wait" in str(cue_stats))
+
+        cue_stats.detach()
+        cue_sheet.select_cue("1")
+        cue_sheet.go()
+        clock.pump([0.1] * 40)
+        # Not counted once detached:
+        self.assertEqual(cue_stats.get_histogram(stats.PHASE_ACTION
+                ).get_count(), 3)
@@ -0,0 +1,166 @@
+#!/usr/bin/env python
+# -*- coding: utf-8; tab-width: 4; mode: python -*-
+"""
+Test cases for openshow.actions.tcp
+"""
+from twisted.trial import unittest
+from twisted.internet import defer
+from twisted.internet import protocol
+from twisted.internet import reactor
+from twisted.test import proto_helpers
+from openshow.actions import tcp
+
+
+def _wait(condition, timeout=5.0):
+    """
+    Returns a Deferred that fires once a condition is true.
+    """
+    d = defer.Deferred()
+    started = reactor.seconds()
+
+    def _check():
+        if condition():
+            d.callback(None)
+        elif reactor.seconds() - started > timeout:
+            d.errback(RuntimeError("Timed out"))
+        else:
+            reactor.callLater(0.01, _check)
+
+    _check()
+    return d
+
+
+class _ReceiverProtocol(protocol.Protocol):
+    def connectionMade(self):
+        self.factory.connections.append(self)
+
+    def dataReceived(self, data):
+        self.factory.data.append(data)
+
+    def connectionLost(self, reason):
+        self.factory.connections.remove(self)
+
+
+class _ReceiverFactory(protocol.ServerFactory):
+    """
+    Keeps what the senders send.
+    """
+    protocol = _ReceiverProtocol
+
+    def __init__(self):
+        self.data = []
+        self.connections = []
+
+    def get_packets(self):
+        packets, rest = tcp.decode_slip(b"".join(self.data))
+        return packets
+
+
+class TestFraming(unittest.TestCase):
+    def test_01_slip(self):
+        packet = b"/go\0,s\0\0\xc0\xdb\0\0"
+        data = tcp.encode_slip(packet) + tcp.encode_slip(b"/stop\0\0\0")
+        self.assertEqual(data.count(tcp.SLIP_END), 4)
+        packets, rest = tcp.decode_slip(data + b"\xc0/inc")
+        self.assertEqual(packets, [packet, b"/stop\0\0\0"])
+        self.assertEqual(rest, b"/inc")
+
+    def test_02_length(self):
+        self.assertEqual(tcp.encode_frame(b"/go\0", tcp.FRAMING_LENGTH),
+                b"\0\0\0\x04/go\0")
+        self.assertRaises(RuntimeError, tcp.decode_length,
+                b"\0\0\0\x04/go\0\xff\xff\xff\xfc")
+
+
+class TestTcpConnectionPool(unittest.TestCase):
+    def setUp(self):
+        self.receiver = _ReceiverFactory()
+        self.listening_port = reactor.listenTCP(0, self.receiver,
+                interface="127.0.0.1")
+        self.port = self.listening_port.getHost().port
+        self.pool = tcp.TcpConnectionPool(max_queued=3)
+        self.addCleanup(self._close)
+
+    def _close(self):
+        d = self.pool.close()
+        for connection in list(self.receiver.connections):
+            connection.transport.loseConnection()
+        d.addCallback(lambda result: _wait(
+                lambda: not self.receiver.connections))
+        d.addCallback(lambda result: self.listening_port.stopListening())
+        return d
+
+    def test_01_pipelined(self):
+        for index in range(10):
+            self.pool.send(str(index).encode("ascii"), "127.0.0.1",
+                    self.port)
+        # Kept until connected:
+        self.assertEqual(self.pool.get_queued_count("127.0.0.1", self.port),
+                3)
+        d = _wait(lambda: len(self.receiver.get_packets()) == 3)
+
+        def _connected(result):
+            self.assertTrue(self.pool.is_connected("127.0.0.1", self.port))
+            for index in range(10, 20):
+                self.pool.send(str(index).encode("ascii"), "127.0.0.1",
+                        self.port)
+            return _wait(lambda: len(self.receiver.get_packets()) == 13)
+
+        def _received(result):
+            # The oldest ones were dropped, and the rest arrived in order,
+            # on one connection:
+            self.assertEqual(self.receiver.get_packets(), [
+                    str(index).encode("ascii")
+                    for index in [7, 8, 9] + list(range(10, 20))])
+            self.assertEqual(self.pool.get_connection_count(), 1)
+            self.assertEqual(len(self.receiver.connections), 1)
+
+        d.addCallback(_connected)
+        d.addCallback(_received)
+        return d
+
+    def test_02_reconnect(self):
+        self.pool.send(b"first", "127.0.0.1", self.port)
+        d = _wait(lambda: len(self.receiver.get_packets()) == 1)
+
+        def _drop(result):
+            self.receiver.connections[0].transport.loseConnection()
+            return _wait(lambda: not self.pool.is_connected("127.0.0.1",
+                    self.port))
+
+        def _send_again(result):
+            self.pool.send(b"second", "127.0.0.1", self.port)
+            return _wait(lambda: len(self.receiver.get_packets()) == 2)
+
+        def _received(result):
+            self.assertEqual(self.receiver.get_packets(), [b"first",
+                    b"second"])
+            self.assertEqual(self.pool.get_connection_count(), 1)
+
+        d.addCallback(_drop)
+        d.addCallback(_send_again)
+        d.addCallback(_received)
+        return d
+
+    def test_03_close(self):
+        self.pool.send(b"first", "127.0.0.1", self.port)
+        d = _wait(lambda: self.pool.is_connected("127.0.0.1", self.port))
+
+        def _close(result):
+            d = self.pool.close()
+            self.assertRaises(RuntimeError, self.pool.send, b"second",
+                    "127.0.0.1", self.port)
+            return d
+
+        d.addCallback(_close)
+        d.addCallback(lambda result: self.assertEqual(
+                self.pool.get_connection_count(), 0))
+        return d
+
+    def test_04_close_while_connecting(self):
+        memory_reactor = proto_helpers.MemoryReactor()
+        pool = tcp.TcpConnectionPool(reactor=memory_reactor)
+        pool.send(b"first", "127.0.0.1", self.port)
+        pool.close()
+        # The first attempt is stopped, not only the next ones:
+        self.assertTrue(memory_reactor.connectors[0]._disconnected)
@@ -3,7 +3,10 @@
 """
 Test cases for openshow.timer
 """
+import time
 from twisted.trial import unittest
+from twisted.internet import defer
+from twisted.internet import task
 from openshow import timer
 
 class TestTimer(unittest.TestCase):
@@ -18,3 +21,101 @@ class TestTimer(unittest.TestCase):
 
         d.addCallback(_cb, 2)
         return d
+
+    def test_02_parse_time(self):
+        self.assertEqual(timer.parse_time("00:43:12.500"), 2592.5)
+        self.assertEqual(timer.parse_time("1:00"), 60.0)
+        self.assertEqual(timer.parse_time("2.25"), 2.25)
+        self.assertRaises(ValueError, timer.parse_time, "abc")
+
+    def test_03_time_source(self):
+        now = [100.0]
+        timer.set_time_source(lambda: now[0])
+        self.addCleanup(timer.set_time_source, None)
+        timer_a = timer.Timer()
+        now[0] = 102.5
+        self.assertEqual(timer_a.elapsed(), 2.5)
+        # Setting the time of day does not change the elapsed time:
+        wall_time = timer.to_wall_time(110.0)
+        self.assertAlmostEqual(wall_time - time.time(), 7.5, places=2)
+        self.assertAlmostEqual(timer.from_wall_time(wall_time), 110.0,
+                places=2)
+
+    def test_04_monotonic(self):
+        source = timer.get_time_source()
+        previous = source()
+        for i in range(10000):
+            now = source()
+            self.assertTrue(now >= previous)
+            previous = now
+
+    def test_05_drift_and_jitter(self):
+        """
+        Schedules thousands of calls, each one 1 ms after the planned time of
+        the previous one, and compares when they are called with when they
+        were planned.
+        """
+        NUM_EVENTS = 2000
+        INTERVAL = 0.001
+        deferred = defer.Deferred()
+        lateness = []
+        first = timer.get_clock().seconds() + INTERVAL
+
+        def _cb(index):
+            planned = first + index * INTERVAL
+            lateness.append(timer.get_clock().seconds() - planned)
+            if index + 1 < NUM_EVENTS:
+                timer.call_at(planned + INTERVAL, _cb, index + 1)
+            else:
+                deferred.callback(None)
+
+        def _median(values):
+            return sorted(values)[len(values) // 2]
+
+        def _check(result):
+            self.assertEqual(len(lateness), NUM_EVENTS)
+            self.assertTrue(min(lateness) >= 0.0)
+            # Jitter: most calls are about as late as the typical one.
+            ordered = sorted(lateness)
+            p50 = ordered[len(ordered) // 2]
+            p99 = ordered[len(ordered) * 99 // 100]
+            self.assertTrue(p99 - p50 < 5 * INTERVAL,
+                    "p50 %.6f p99 %.6f" % (p50, p99))
+            # Drift: lateness does not add up from one call to the next, or
+            # 2000 of them would be late by more than an interval at the end.
+            drift = _median(lateness[-200:]) - _median(lateness[:200])
+            self.assertTrue(drift < INTERVAL, "drift %.6f" % (drift))
+
+        timer.call_at(first, _cb, 0)
+        deferred.addCallback(_check)
+        return deferred
+
+    def test_06_precision(self):
+        # On a virtual clock, it is called right when it is due:
+        clock = task.Clock()
+        timer.set_clock(clock)
+        self.addCleanup(timer.set_clock, None)
+        timer_a = timer.Timer()
+        called = []
+        timer.later(1.0).addCallback(lambda result: called.append(
+                timer_a.elapsed()))
+        clock.advance(0.999)
+        self.assertEqual(called, [])
+        clock.advance(0.001)
+        self.assertEqual(called, [1.0])
+
+        # With the reactor, in precision mode, never early, and hardly late
+        # unless the machine is busy:
+        timer.set_clock(None)
+        timer.set_spin_budget(0.002)
+        self.addCleanup(timer.set_spin_budget, 0.0)
+        timer_b = timer.Timer()
+        d = timer.later(0.1)
+
+        def _cb(result):
+            elapsed = timer_b.elapsed()
+            self.assertTrue(elapsed >= 0.1)
+            self.assertTrue(elapsed < 0.15)
+
+        d.addCallback(_cb)
+        return d
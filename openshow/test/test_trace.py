@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+# -*- coding: utf-8; tab-width: 4; mode: python -*-
+"""
+Test cases for openshow.trace
+"""
+from twisted.trial import unittest
+from twisted.internet import task
+from openshow import cue
+from openshow import events
+from openshow import simulation
+from openshow import stats
+from openshow import timer
+from openshow import trace
+
+
+class StringOutput(object):
+    def __init__(self):
+        self.text = ""
+
+    def write(self, text):
+        self.text += text
+
+
+def _create_cue_sheet():
+    cue_sheet = cue.CueSheet()
+    cue_sheet.set_cues([
+            cue.Cue("1", 0.5, 1.0, "title1"),
+            cue.Cue("2", 0.0, 0.5, "title2", None, cue.FOLLOW_DO_NOT_CONTINUE),
+    ])
+    return cue_sheet
+
+
+class TestEventTrace(unittest.TestCase):
+    def setUp(self):
+        self.clock = task.Clock()
+        timer.set_clock(self.clock)
+        self.addCleanup(timer.set_clock, None)
+
+    def test_01_record(self):
+        cue_sheet = _create_cue_sheet()
+        event_trace = trace.EventTrace()
+        event_trace.attach(cue_sheet)
+        cue_sheet.go()
+        self.clock.pump([0.25] * 12)
+        kinds = [(record.kind, record.identifier)
+                for record in event_trace.get_records()]
+        self.assertEqual(kinds, [
+                (events.EVENT_GO, "1"),
+                (events.EVENT_DONE_PRE_WAIT, "1"),
+                (events.EVENT_DONE_TRIGGER, "1"),
+                (events.EVENT_DONE_POST_WAIT, "1"),
+                (events.EVENT_GO, "2"),
+                (events.EVENT_DONE_PRE_WAIT, "2"),
+                (events.EVENT_DONE_TRIGGER, "2"),
+                (events.EVENT_DONE_POST_WAIT, "2"),
+                ])
+        records = event_trace.get_records()
+        self.assertEqual(records[0].time, 0.0)
+        self.assertEqual(records[1].time, 0.5)
+        self.assertEqual(records[-1].time, 2.0)
+
+        event_trace.detach()
+        cue_sheet.select_cue("1")
+        cue_sheet.go()
+        self.clock.pump([0.25] * 12)
+        self.assertEqual(len(event_trace), 8)
+
+    def test_02_ring_buffer(self):
+        event_trace = trace.EventTrace(capacity=4)
+        cue_item = cue.Cue("1")
+        for i in range(10):
+            self.clock.advance(1.0)
+            event_trace.record(events.EVENT_GO, cue_item, None,
+                    self.clock.seconds())
+        event_trace.record("not recorded", cue_item, None,
+                self.clock.seconds())
+        self.assertEqual(len(event_trace), 4)
+        self.assertEqual(event_trace.get_count(), 10)
+        # Only the last ones are kept, oldest first:
+        self.assertEqual([record.time for record in event_trace.get_records()],
+                [7.0, 8.0, 9.0, 10.0])
+
+    def test_03_dump_and_read(self):
+        event_trace = trace.EventTrace(capacity=3)
+        first = cue.Cue(u"1.5")
+        second = cue.Cue(u"intro é")
+        event_trace.record(events.EVENT_GO, first, None, 0.0)
+        event_trace.record(events.EVENT_LATE, second, 0.002, 0.5)
+        event_trace.record(events.EVENT_DONE_PRE_WAIT, first, 0.001, 1.0)
+        event_trace.record(events.EVENT_CANCELLED, second, None, 1.5)
+        file_path = self.mktemp()
+        event_trace.dump_to_file(file_path)
+
+        records = trace.read_trace(file_path)
+        self.assertEqual([(record.time, record.kind, record.identifier,
+                record.value) for record in records], [
+                (0.5, events.EVENT_LATE, u"intro é", 0.002),
+                (1.0, events.EVENT_DONE_PRE_WAIT, u"1.5", 0.001),
+                (1.5, events.EVENT_CANCELLED, u"intro é", 0.0),
+                ])
+        output = StringOutput()
+        trace.print_trace(file_path, output)
+        lines = output.text.splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertTrue(lines[0].startswith("00h:00m:00s.000 late"))
+        self.assertTrue(lines[2].startswith("00h:00m:01s.000 cancelled"))
+
+        with open(file_path, "rb") as f:
+            data = f.read()
+        with open(file_path, "wb") as f:
+            f.write(data[:-1])
+        self.assertRaises(RuntimeError, trace.read_trace, file_path)
+        with open(file_path, "wb") as f:
+            f.write(b"not a trace")
+        self.assertRaises(RuntimeError, trace.read_trace, file_path)
+
+    def test_04_replay(self):
+        cue_sheet = _create_cue_sheet()
+        event_trace = trace.EventTrace()
+        event_trace.attach(cue_sheet)
+        self.clock.advance(100.0)
+        cue_sheet.go()
+        self.clock.pump([0.25] * 12)
+        event_trace.detach()
+        file_path = self.mktemp()
+        event_trace.dump_to_file(file_path)
+
+        cue_stats = stats.CueStats()
+        cue_stats.attach(cue_sheet)
+        sim = simulation.Simulation(cue_sheet)
+        records = sim.replay(trace.read_trace(file_path))
+        self.assertEqual(len(records), 8)
+        self.assertEqual(records[0].time, 0.0)
+        self.assertEqual(records[-1].time, 2.0)
+        self.assertEqual(records[1].kind, events.EVENT_DONE_PRE_WAIT)
+        # Whatever listens to the bus sees the events again:
+        self.assertEqual(cue_stats.get_histogram(stats.PHASE_POST_WAIT
+                ).get_count(), 2)
+        self.assertTrue(timer.get_clock() is self.clock)
+
+        cue_sheet.remove_cue("2")
+        self.assertRaises(RuntimeError, simulation.Simulation(cue_sheet).replay,
+                trace.read_trace(file_path))
+
+    def test_05_time_of_the_event(self):
+        cue_sheet = _create_cue_sheet()
+        event_trace = trace.EventTrace()
+        event_trace.attach(cue_sheet)
+        events_seen = []
+        cue_sheet.get_event_bus().subscribe(events_seen.append)
+        cue_sheet.go()
+        self.clock.pump([0.25] * 3)
+        cue_sheet.get_cues()[0].cancel() # and the next one starts
+        expected = [
+                (events.EVENT_GO, 0.0),
+                (events.EVENT_DONE_PRE_WAIT, 0.5),
+                (events.EVENT_DONE_TRIGGER, 0.5),
+                (events.EVENT_CANCELLED, 0.75),
+                (events.EVENT_GO, 0.75),
+                (events.EVENT_DONE_PRE_WAIT, 0.75),
+                (events.EVENT_DONE_TRIGGER, 0.75),
+                ]
+        self.assertEqual([(record.kind, record.time)
+                for record in event_trace.get_records()], expected)
+        # The subscribers get the same times:
+        self.assertEqual([(event.kind, event.time)
+                for event in events_seen], expected)
+
+        # The clock is not read to record:
+        event_trace.record(events.EVENT_LATE, cue.Cue("1"), 0.002, 12.5)
+        self.assertEqual(event_trace.get_records()[-1].time, 12.5)
@@ -0,0 +1,188 @@
+#!/usr/bin/env python
+# -*- coding: utf-8; tab-width: 4; mode: python -*-
+"""
+Test cases for openshow.triggers
+"""
+from twisted.trial import unittest
+from twisted.internet import defer
+from twisted.internet import task
+from txosc import osc as txosc
+from openshow import cue
+from openshow import project
+from openshow import remote
+from openshow import timer
+from openshow import triggers
+from openshow.test import test_project
+
+PROJECT_DATA = """<?xml version="1.0"?>
+<project>
+    <cue identifier="1" title="Open the curtain" post_wait="1.0">
+        <action type="osc">
+            <attr name="path" value="/curtain/open" />
+        </action>
+        <trigger address="/sensor/1" condition="above" value="0.5" />
+    </cue>
+</project>
+"""
+
+
+class FailingCue(cue.Cue):
+    def go(self, offset=0.0, planned_time=None):
+        return defer.fail(RuntimeError("Cannot start"))
+
+
+class TestTriggerIndex(unittest.TestCase):
+    def setUp(self):
+        self.clock = task.Clock()
+        timer.set_clock(self.clock)
+        self.addCleanup(timer.set_clock, None)
+        self.cue_sheet = cue.CueSheet()
+        self.started = []
+        self.cue_sheet.signal_cue_go.connect(self._cue_go_cb)
+        self.index = triggers.TriggerIndex()
+
+    def _cue_go_cb(self, cue_item):
+        self.started.append(cue_item.get_identifier())
+
+    def _add_cue(self, identifier, trigger, post_wait=1.0):
+        cue_item = cue.Cue(identifier, 0.0, post_wait, trigger=trigger)
+        cue_item.set_follow(cue.FOLLOW_DO_NOT_CONTINUE)
+        self.cue_sheet.append_cue(cue_item)
+        return cue_item
+
+    def test_01_conditions(self):
+        self._add_cue("any", triggers.Trigger("/button"))
+        self._add_cue("red", triggers.Trigger("/color",
+                triggers.CONDITION_EQUAL, "red"))
+        self._add_cue("two", triggers.Trigger("/color",
+                triggers.CONDITION_EQUAL, "2", 1))
+        self._add_cue("up", triggers.Trigger("/sensor",
+                triggers.CONDITION_ABOVE, 0.5), 0.0)
+        self._add_cue("down", triggers.Trigger("/sensor",
+                triggers.CONDITION_BELOW, "0.2"), 0.0)
+        self.index.attach(self.cue_sheet)
+        self.assertEqual(self.index.get_trigger_count(), 5)
+
+        self.index.handle_message("/button", [])
+        self.index.handle_message("/color", ["blue", 2])
+        self.index.handle_message("/color", ["red"])
+        self.assertEqual(self.started, ["any", "two", "red"])
+
+        del self.started[:]
+        # The first value only sets where it starts from:
+        for value in (0.8, 0.4, 0.6, 0.7, 0.1, 0.3, 0.1, 0.5):
+            self.index.handle_message("/sensor", [value])
+        self.assertEqual(self.started, ["up", "down", "down"])
+        self.assertFalse(self.cue_sheet.is_running())
+
+    def test_02_armed(self):
+        self._add_cue("1", triggers.Trigger("/button"))
+        self.index.attach(self.cue_sheet)
+        self.index.handle_message("/button", [])
+        self.index.handle_message("/button", [])
+        # Not again while it runs:
+        self.assertEqual(self.started, ["1"])
+        self.clock.advance(1.0)
+        self.index.handle_message("/button", [])
+        self.assertEqual(self.started, ["1", "1"])
+
+    def test_03_changes(self):
+        cue_item = self._add_cue("1", triggers.Trigger("/a"))
+        self.index.attach(self.cue_sheet)
+        cue_item.set_trigger(triggers.Trigger("/b"))
+        self.index.handle_message("/a", [])
+        self.index.handle_message("/b", [])
+        self.assertEqual(self.started, ["1"])
+        self.clock.advance(1.0)
+        cue_item.set_trigger(None)
+        self.index.handle_message("/b", [])
+        self.assertEqual(self.index.get_trigger_count(), 0)
+        # Removed cues are not started:
+        cue_item.set_trigger(triggers.Trigger("/b"))
+        self.cue_sheet.remove_cue("1")
+        self.assertEqual(self.index.get_trigger_count(), 0)
+        self.index.handle_message("/b", [])
+        self.assertFalse(cue_item.is_running())
+        self.assertEqual(self.index.get_trigger_count(), 0)
+        self.index.detach()
+        self.assertEqual(self.index.get_trigger_count(), 0)
+
+    def test_04_many_thresholds(self):
+        for i in range(1000):
+            self._add_cue(str(i), triggers.Trigger("/sensor",
+                    triggers.CONDITION_ABOVE, i), 0.0)
+        self.index.attach(self.cue_sheet)
+        self.index.handle_message("/sensor", [10.5])
+        self.index.handle_message("/sensor", [13.5])
+        self.assertEqual(self.started, ["11", "12", "13"])
+
+    def test_05_invalid(self):
+        self.assertRaises(RuntimeError, triggers.Trigger, "/sensor/*")
+        self.assertRaises(RuntimeError, triggers.Trigger, "/sensor", "near")
+        self.assertRaises(RuntimeError, triggers.Trigger, "/sensor",
+                triggers.CONDITION_ABOVE, "high")
+
+    def test_06_server(self):
+        server = remote.OscServer()
+        self.index.register(server)
+        self._add_cue("1", triggers.Trigger("/sensor/1",
+                triggers.CONDITION_EQUAL, 1))
+        self.index.attach(self.cue_sheet)
+        server.handle_packet(txosc.Message("/sensor/*", 1).toBinary())
+        self.assertEqual(self.started, ["1"])
+        self.index.detach()
+        self.assertEqual(server._addresses.get_handler_count(), 0)
+
+    def test_07_added_later(self):
+        self.index.attach(self.cue_sheet)
+        self._add_cue("1", triggers.Trigger("/button"))
+        self.assertEqual(self.index.get_trigger_count(), 1)
+        self.index.handle_message("/button", [])
+        self.assertEqual(self.started, ["1"])
+
+    def test_08_reached_by_the_cue_sheet(self):
+        self._add_cue("1", None).set_follow(cue.FOLLOW_AUTO_CONTINUE)
+        self._add_cue("2", triggers.Trigger("/button"), 2.0)
+        self._add_cue("3", None)
+        self.index.attach(self.cue_sheet)
+        self.index.handle_message("/button", [])
+        self.assertRaises(RuntimeError, self.cue_sheet.get_cue_by_identifier(
+                "2").go)
+        # The cue sheet goes on without the cue its trigger started:
+        self.cue_sheet.go()
+        self.clock.advance(1.0)
+        self.assertEqual(self.started, ["2", "1"])
+        self.assertFalse(self.cue_sheet.is_running())
+        self.assertEqual(self.cue_sheet.get_selected_cue_identifier(), "3")
+        # Its trigger is armed again once it is done:
+        self.clock.advance(1.0)
+        self.index.handle_message("/button", [])
+        self.assertEqual(self.started, ["2", "1", "2"])
+
+    def test_09_project(self):
+        file_path = test_project.make_temporary_file(PROJECT_DATA)
+        cue_sheet = project.ProjectPersistance().parse_project_file(file_path)
+        trigger = cue_sheet.get_cue_by_identifier("1").get_trigger()
+        self.assertEqual(trigger.get_address(), "/sensor/1")
+        self.assertEqual(trigger.get_condition(), triggers.CONDITION_ABOVE)
+        self.assertEqual(trigger.get_value(), 0.5)
+
+    def test_10_failure(self):
+        self.cue_sheet.append_cue(FailingCue("1",
+                trigger=triggers.Trigger("/button")))
+        self.index.attach(self.cue_sheet)
+        self.index.handle_message("/button", [])
+        self.assertEqual(len(self.flushLoggedErrors(RuntimeError)), 1)
+
+    def test_11_threshold_added_later(self):
+        self._add_cue("any", triggers.Trigger("/sensor"), 0.0)
+        self.index.attach(self.cue_sheet)
+        self.index.handle_message("/sensor", [0.0])
+        self._add_cue("up", triggers.Trigger("/sensor",
+                triggers.CONDITION_ABOVE, 0.5), 0.0)
+        # Its previous value was not kept:
+        self.index.handle_message("/sensor", [1.0])
+        self.assertEqual(self.started, ["any", "any"])
+        self.index.handle_message("/sensor", [0.0])
+        self.index.handle_message("/sensor", [1.0])
+        self.assertEqual(self.started, ["any", "any", "any", "any", "up"])
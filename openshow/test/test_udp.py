@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+# -*- coding: utf-8; tab-width: 4; mode: python -*-
+"""
+Test cases for openshow.actions.udp
+"""
+import os
+import socket
+from twisted.trial import unittest
+from openshow.actions import udp
+
+FD_DIRECTORY = "/proc/self/fd"
+
+
+def _create_receiver():
+    receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    receiver.bind(("127.0.0.1", 0))
+    receiver.settimeout(1.0)
+    return receiver
+
+
+class TestUdpSenderPool(unittest.TestCase):
+    def setUp(self):
+        self.pool = udp.UdpSenderPool(max_connected=2)
+        self.addCleanup(self.pool.close)
+        self.receivers = [_create_receiver() for i in range(3)]
+        for receiver in self.receivers:
+            self.addCleanup(receiver.close)
+
+    def test_01_send(self):
+        port = self.receivers[0].getsockname()[1]
+        self.pool.send(b"first", "127.0.0.1", port)
+        self.pool.send(b"second", "127.0.0.1", port)
+        self.assertEqual(self.receivers[0].recv(64), b"first")
+        self.assertEqual(self.receivers[0].recv(64), b"second")
+        self.assertEqual(self.pool.get_socket_count(), 1)
+
+    def test_02_max_connected(self):
+        for index, receiver in enumerate(self.receivers):
+            self.pool.send(str(index).encode("ascii"), "127.0.0.1",
+                    receiver.getsockname()[1])
+        for index, receiver in enumerate(self.receivers):
+            self.assertEqual(receiver.recv(64), str(index).encode("ascii"))
+        # Two connected sockets, and one shared by the other destinations:
+        self.assertEqual(self.pool.get_socket_count(), 3)
+        self.pool.send(b"again", "127.0.0.1",
+                self.receivers[2].getsockname()[1])
+        self.assertEqual(self.receivers[2].recv(64), b"again")
+        self.assertEqual(self.pool.get_socket_count(), 3)
+
+    def test_03_close(self):
+        port = self.receivers[0].getsockname()[1]
+        self.pool.send(b"first", "127.0.0.1", port)
+        d = self.pool.close()
+        self.assertEqual(self.pool.get_socket_count(), 0)
+        self.assertRaises(RuntimeError, self.pool.send, b"second",
+                "127.0.0.1", port)
+        return d
+
+    def test_04_constant_fd_count(self):
+        if not os.path.isdir(FD_DIRECTORY):
+            raise unittest.SkipTest("Cannot count file descriptors here")
+        port = self.receivers[0].getsockname()[1]
+        self.pool.send(b"/ping", "127.0.0.1", port)
+        fd_count = len(os.listdir(FD_DIRECTORY))
+        for i in range(10000):
+            self.pool.send(b"/ping", "127.0.0.1", port)
+        self.assertEqual(len(os.listdir(FD_DIRECTORY)), fd_count)
+        self.assertEqual(self.pool.get_socket_count(), 1)
+
+    def test_05_default_pool(self):
+        pool = udp.get_pool()
+        self.assertTrue(udp.get_pool() is pool)
+        pool.send(b"/ping", "127.0.0.1", self.receivers[0].getsockname()[1])
+        d = udp.close_pool()
+        self.assertTrue(pool.is_closed())
+        self.assertFalse(udp.get_pool() is pool)
+        return d
+
+    def test_06_send_many(self):
+        destinations = [("127.0.0.1", receiver.getsockname()[1])
+                for receiver in self.receivers]
+        self.pool.send_many(b"/all", destinations)
+        self.pool.send_many(b"/again", destinations)
+        for receiver in self.receivers:
+            self.assertEqual(receiver.recv(64), b"/all")
+            self.assertEqual(receiver.recv(64), b"/again")
+        # From the shared socket only:
+        self.assertEqual(self.pool.get_socket_count(), 1)
+
+    def test_07_multicast(self):
+        self.assertTrue(udp.is_multicast("239.255.0.1"))
+        self.assertFalse(udp.is_multicast("10.0.0.1"))
+        self.assertFalse(udp.is_multicast("ff02::1"))
+        receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.addCleanup(receiver.close)
+        receiver.settimeout(1.0)
+        try:
+            receiver.bind(("", 0))
+            receiver.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP,
+                    socket.inet_aton("239.255.0.1") +
+                    socket.inet_aton("0.0.0.0"))
+            self.pool.send_multicast(b"/all", "239.255.0.1",
+                    receiver.getsockname()[1], 1, True)
+            data = receiver.recv(64)
+        except (socket.error, socket.timeout) as e:
+            raise unittest.SkipTest("No multicast here: %s" % (e))
+        self.assertEqual(data, b"/all")
+        self.pool.send_multicast(b"/again", "239.255.0.1",
+                receiver.getsockname()[1], 1, True)
+        self.assertEqual(receiver.recv(64), b"/again")
+        self.assertEqual(self.pool.get_socket_count(), 1)
@@ -1,10 +1,229 @@
 #!/usr/bin/env python
 """
 The Timer class.
+
+Cues and timers get the time and schedule their calls through the clock of
+this module. It is the reactor, unless a simulation replaces it with a
+virtual clock, such as L{twisted.internet.task.Clock}. Their calls all go to
+the one L{openshow.sequencer.Sequencer} of that clock.
+
+The reactor tells the time of day, which jumps when the system clock is set
+and slews when NTP adjusts it. When the reactor is the clock, the time is
+rather read from a monotonic, high-resolution time source; the reactor is only
+used to sleep. Convert to and from the time of day with L{to_wall_time} and
+L{from_wall_time}, for cues that are at a given time of day.
 """
+import ctypes
+import ctypes.util
+import sys
 import time
 from twisted.internet import reactor
 from twisted.internet import defer
+from twisted.python import log
+from openshow import sequencer
+
+CLOCK_MONOTONIC = 1 # from <linux/time.h>
+
+
+class _TimeSpec(ctypes.Structure):
+    _fields_ = [("tv_sec", ctypes.c_long), ("tv_nsec", ctypes.c_long)]
+
+
+def _get_default_time_source():
+    """
+    Returns the best monotonic time source there is.
+    """
+    # Python 3
+    for name in ("perf_counter", "monotonic"):
+        if hasattr(time, name):
+            return getattr(time, name)
+    # Python 2 has none, but we can ask the C library on Linux
+    if sys.platform.startswith("linux"):
+        try:
+            library = ctypes.CDLL(ctypes.util.find_library("rt") or
+                    ctypes.util.find_library("c"), use_errno=True)
+            clock_gettime = library.clock_gettime
+        except (OSError, AttributeError):
+            pass
+        else:
+            # No argtypes, and a reference made once: checking and converting
+            # the arguments at each call would take most of its time.
+            spec = _TimeSpec()
+            spec_reference = ctypes.byref(spec)
+
+            def _monotonic():
+                if clock_gettime(CLOCK_MONOTONIC, spec_reference) != 0:
+                    raise OSError(ctypes.get_errno(), "clock_gettime failed")
+                return spec.tv_sec + spec.tv_nsec * 1e-9
+
+            return _monotonic
+    log.msg("Warning: no monotonic clock. Using the time of day.")
+    return time.time
+
+
+class SourceClock(object):
+    """
+    A clock whose time comes from a time source, and that sleeps with the
+    reactor.
+
+    Its delayed calls are given to the reactor as delays, not as times, so
+    that the reactor and the time source do not need to agree on the time.
+    If the reactor wakes up too early, L{openshow.sequencer.Sequencer} goes
+    back to sleep.
+    """
+    def __init__(self, time_source, reactor_time=None):
+        """
+        @param time_source: Returns the time in seconds.
+        @type time_source: C{callable}
+        @param reactor_time: What sleeps. The reactor if None.
+        @type reactor_time: L{twisted.internet.interfaces.IReactorTime}
+        """
+        self._time_source = time_source
+        self._reactor_time = reactor_time
+        if self._reactor_time is None:
+            self._reactor_time = reactor
+
+    def seconds(self):
+        return self._time_source()
+
+    def callLater(self, delay, function, *args, **kwargs):
+        return self._reactor_time.callLater(delay, function, *args, **kwargs)
+
+    def getDelayedCalls(self):
+        return self._reactor_time.getDelayedCalls()
+
+
+_time_source = _get_default_time_source()
+_clock = None # None means the reactor, with the time source
+_source_clock = None # created when first needed
+_sequencer = None # created when first needed
+_spin_budget = 0.0 # precision mode of the sequencer, if the reactor is the clock
+
+
+def get_time_source():
+    """
+    Returns the function that tells the time when the reactor is the clock.
+    @rtype: C{callable}
+    """
+    return _time_source
+
+
+def set_time_source(time_source):
+    """
+    Changes the function that tells the time when the reactor is the clock.
+    None for the default monotonic one.
+    @type time_source: C{callable}
+    """
+    global _time_source
+    global _source_clock
+    global _sequencer
+    if time_source is None:
+        time_source = _get_default_time_source()
+    _time_source = time_source
+    if _clock is None:
+        _source_clock = None
+        _sequencer = None
+
+
+def to_wall_time(seconds):
+    """
+    Converts a time of the current clock to a time of day, as returned by
+    C{time.time()}.
+    @type seconds: C{float}
+    @rtype: C{float}
+    """
+    return time.time() + seconds - get_clock().seconds()
+
+
+def from_wall_time(wall_time):
+    """
+    Converts a time of day, as returned by C{time.time()}, to a time of the
+    current clock. Give it to L{call_at} to call something at that time of
+    day. Convert it again if the system clock was set in the meantime.
+    @type wall_time: C{float}
+    @rtype: C{float}
+    """
+    return get_clock().seconds() + wall_time - time.time()
+
+
+def get_clock():
+    """
+    Returns the clock used by cues and timers.
+    @rtype: L{twisted.internet.interfaces.IReactorTime}
+    """
+    global _source_clock
+    if _clock is None:
+        if _source_clock is None:
+            _source_clock = SourceClock(_time_source)
+        return _source_clock
+    return _clock
+
+
+def set_clock(clock):
+    """
+    Makes cues and timers use another clock. None to use the reactor again.
+    @type clock: L{twisted.internet.interfaces.IReactorTime}
+    """
+    global _clock
+    global _sequencer
+    if clock is not None and clock is _source_clock:
+        clock = None # what get_clock() returns for the reactor
+    _clock = clock
+    # Calls already scheduled stay with the sequencer of their clock.
+    _sequencer = None
+
+
+def get_sequencer():
+    """
+    Returns the sequencer of the current clock.
+    @rtype: L{openshow.sequencer.Sequencer}
+    """
+    global _sequencer
+    if _sequencer is None:
+        if _clock is None:
+            _sequencer = sequencer.Sequencer(get_clock(), _spin_budget)
+        else:
+            # The time of a virtual clock does not pass while we spin.
+            _sequencer = sequencer.Sequencer(get_clock())
+    return _sequencer
+
+
+def set_spin_budget(spin_budget):
+    """
+    Enables the precision mode of the sequencer when the reactor is the
+    clock: it wakes up that many seconds before each deadline, and busy-waits
+    for the rest. 0 to disable it.
+    See L{openshow.sequencer.Sequencer.set_spin_budget}.
+    @type spin_budget: C{float}
+    """
+    global _spin_budget
+    _spin_budget = spin_budget
+    if _clock is None and _sequencer is not None:
+        _sequencer.set_spin_budget(spin_budget)
+
+
+def get_spin_budget():
+    """
+    @rtype: C{float}
+    """
+    return _spin_budget
+
+
+def call_later(delay, function, *args, **kwargs):
+    """
+    Calls a function after a delay, using the sequencer of the current clock.
+    @rtype: L{openshow.sequencer.ScheduledCall}
+    """
+    return get_sequencer().call_later(delay, function, *args, **kwargs)
+
+
+def call_at(when, function, *args, **kwargs):
+    """
+    Calls a function at a given time of the current clock.
+    @type when: C{float}
+    @rtype: L{openshow.sequencer.ScheduledCall}
+    """
+    return get_sequencer().call_at(when, function, *args, **kwargs)
 
 
 def later(delay):
@@ -20,10 +239,40 @@ def later(delay):
     def _callable(ret):
         ret.callback(None)
 
-    delayed_call = reactor.callLater(delay, _callable, ret)
+    call_later(delay, _callable, ret)
     return ret
 
 
+def parse_time(text):
+    """
+    Parses a time such as "00:43:12.500", "43:12.5" or "12.5".
+
+    @return: Duration in seconds.
+    @rtype: C{float}
+    @raise: L{ValueError}
+    """
+    ret = 0.0
+    for part in text.strip().split(":"):
+        ret = ret * 60.0 + float(part)
+    if ret < 0.0:
+        raise ValueError("Negative time: %s" % (text))
+    return ret
+
+
+def format_time(seconds):
+    """
+    Readable representation of a duration, such as "00h:43m:12s.500".
+    @type seconds: C{float}
+    @rtype: C{str}
+    """
+    hours, rem = divmod(seconds, 3600.0)
+    minutes, rem = divmod(rem, 60.0)
+    seconds, ms = divmod(rem, 1.0)
+    ms = ms * 1000
+    return "{:0>2}h:{:0>2}m:{:0>2}s.{:0>3}".format(
+            int(hours), int(minutes), int(seconds), int(ms))
+
+
 class Timer(object):
     """
     Measures how much time passed since reset.
@@ -32,11 +281,14 @@ class Timer(object):
         self._started = 0.0
         self.reset()
 
-    def reset(self):
+    def reset(self, elapsed=0.0):
         """
         Resets the timer.
+
+        @param elapsed: How many seconds it should tell have already elapsed.
+        @type elapsed: C{float}
         """
-        self._started = self._now()
+        self._started = self._now() - elapsed
 
     def elapsed(self):
         """
@@ -47,18 +299,13 @@ class Timer(object):
         return ret
 
     def _now(self):
-        return time.time()
+        return get_clock().seconds()
 
     def __str__(self):
         """
         Readable representation of the elapsed time.
         """
-        hours, rem = divmod(self.elapsed(), 3600.0)
-        minutes, rem = divmod(rem, 60.0)
-        seconds, ms = divmod(rem, 1.0)
-        ms = ms * 1000
-        return "{:0>2}h:{:0>2}m:{:0>2}s.{:0>3}".format(
-                int(hours), int(minutes), int(seconds), int(ms))
+        return format_time(self.elapsed())
 
 
 if __name__ == '__main__':
@@ -0,0 +1,291 @@
+#!/usr/bin/env python
+# -*- coding: utf-8; tab-width: 4; mode: python -*-
+"""
+Trace of the events of the cues of a cue sheet.
+
+The last events are always recorded in a ring buffer of fixed size, made of
+typed arrays: recording an event stores four numbers, and allocates nothing.
+The trace can be written to a file at any time, and read back later to print
+it, or to replay it with L{openshow.simulation.Simulation.replay}.
+
+Usage:
+    PYTHONPATH=$PWD python ./openshow/trace.py trace.bin
+
+File format, little-endian:
+    header: "OSTRACE1", number of identifiers (uint32), number of events
+        (uint32)
+    identifiers: length (uint16) and UTF-8 bytes of each cue identifier
+    events, one array after the other, in chronological order: times
+        (float64), identifier numbers (int32), kind codes (int8), values
+        (float64)
+"""
+import array
+import struct
+import sys
+from openshow import events
+from openshow import timer
+
+DEFAULT_CAPACITY = 65536 # events
+MAGIC = b"OSTRACE1"
+_HEADER = struct.Struct("<8sII")
+_LENGTH = struct.Struct("<H")
+
+KIND_CODES = {
+        events.EVENT_GO: 0,
+        events.EVENT_DONE_TRIGGER: 1,
+        events.EVENT_DONE_PRE_WAIT: 2,
+        events.EVENT_DONE_POST_WAIT: 3,
+        events.EVENT_CANCELLED: 4,
+        events.EVENT_LATE: 5,
+        }
+KIND_VALUES = dict((code, kind) for kind, code in KIND_CODES.items())
+
+
+def _to_little_endian(values):
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+
+def _to_bytes(values):
+    if hasattr(values, "tobytes"):
+        return values.tobytes() # Python 3
+    return values.tostring()
+
+
+class TraceRecord(object):
+    """
+    An event read from a trace file.
+
+    @ivar time: Seconds, in the time of the clock of L{openshow.timer} when
+    it was recorded.
+    @ivar kind: One of the EVENT_* constants of L{openshow.events}.
+    @ivar identifier: Identifier of the cue.
+    @ivar value: Value of the event, or 0.0.
+    """
+    __slots__ = ("time", "kind", "identifier", "value")
+
+    def __init__(self, time, kind, identifier, value):
+        self.time = time
+        self.kind = kind
+        self.identifier = identifier
+        self.value = value
+
+    def __str__(self):
+        return "%s %s %s %.6f" % (timer.format_time(self.time), self.kind,
+                self.identifier, self.value)
+
+
+class EventTrace(object):
+    """
+    Ring buffer of the last events of the cues of a cue sheet.
+    """
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        """
+        @param capacity: How many events to keep.
+        @type capacity: C{int}
+        """
+        self._capacity = capacity
+        self._times = array.array("d", [0.0]) * capacity
+        self._codes = array.array("b", [0]) * capacity
+        self._values = array.array("d", [0.0]) * capacity
+        self._identifiers = [None] * capacity
+        self._next = 0 # index where to write the next event
+        self._count = 0 # events recorded so far
+        self._cue_sheet = None
+
+    def __len__(self):
+        """
+        Returns how many events are in the buffer.
+        """
+        return min(self._count, self._capacity)
+
+    def get_capacity(self):
+        """
+        @rtype: C{int}
+        """
+        return self._capacity
+
+    def get_count(self):
+        """
+        Returns how many events were recorded, including the ones that were
+        overwritten since.
+        @rtype: C{int}
+        """
+        return self._count
+
+    def attach(self, cue_sheet):
+        """
+        Starts to record the events of a cue sheet, instead of the one it was
+        attached to, if any. The events already recorded are kept.
+        @type cue_sheet: L{openshow.cue.CueSheet}
+        """
+        self.detach()
+        self._cue_sheet = cue_sheet
+        cue_sheet.get_event_bus().set_recorder(self.record)
+
+    def detach(self):
+        """
+        Stops recording.
+        """
+        if self._cue_sheet is not None:
+            self._cue_sheet.get_event_bus().set_recorder(None)
+            self._cue_sheet = None
+
+    def record(self, kind, cue, value, time):
+        """
+        Records an event. Events of other kinds than those in KIND_CODES are
+        ignored. The clock is not read: the time comes from the cue, which
+        already knows it.
+        @param time: When it happened, in the time of the clock of
+        L{openshow.timer}.
+        @type time: C{float}
+        """
+        try:
+            code = KIND_CODES[kind]
+        except KeyError:
+            return
+        index = self._next
+        self._times[index] = time
+        self._codes[index] = code
+        self._identifiers[index] = cue.get_identifier()
+        self._values[index] = value or 0.0
+        index += 1
+        if index == self._capacity:
+            index = 0
+        self._next = index
+        self._count += 1
+
+    def _get_order(self):
+        """
+        Returns the indices of the events in the buffer, oldest first.
+        """
+        if self._count < self._capacity:
+            return range(self._count)
+        return list(range(self._next, self._capacity)) + list(
+                range(self._next))
+
+    def get_records(self):
+        """
+        Returns the events in the buffer, oldest first.
+        @return: List of L{TraceRecord}.
+        @rtype: C{list}
+        """
+        return [TraceRecord(self._times[index],
+                KIND_VALUES[self._codes[index]], self._identifiers[index],
+                self._values[index])
+                for index in self._get_order()]
+
+    def dump(self, output):
+        """
+        Writes the events in the buffer to a file.
+        @param output: File open for writing bytes.
+        """
+        order = self._get_order()
+        numbers = {} # identifier -> its number in the file
+        identifiers = []
+        for index in order:
+            identifier = self._identifiers[index]
+            if identifier not in numbers:
+                numbers[identifier] = len(identifiers)
+                identifiers.append(identifier)
+        output.write(_HEADER.pack(MAGIC, len(identifiers), len(order)))
+        for identifier in identifiers:
+            if not isinstance(identifier, bytes):
+                identifier = identifier.encode("utf-8")
+            output.write(_LENGTH.pack(len(identifier)))
+            output.write(identifier)
+        output.write(_to_bytes(_to_little_endian(array.array("d",
+                [self._times[index] for index in order]))))
+        output.write(_to_bytes(_to_little_endian(array.array("i",
+                [numbers[self._identifiers[index]] for index in order]))))
+        output.write(_to_bytes(array.array("b",
+                [self._codes[index] for index in order])))
+        output.write(_to_bytes(_to_little_endian(array.array("d",
+                [self._values[index] for index in order]))))
+
+    def dump_to_file(self, file_path):
+        """
+        Writes the events in the buffer to a file.
+        @type file_path: C{str}
+        """
+        with open(file_path, "wb") as output:
+            self.dump(output)
+
+
+def _read_array(data, offset, typecode, count):
+    values = array.array(typecode)
+    end = offset + values.itemsize * count
+    if end > len(data):
+        raise RuntimeError("Truncated trace file")
+    if hasattr(values, "frombytes"):
+        values.frombytes(data[offset:end]) # Python 3
+    else:
+        values.fromstring(data[offset:end])
+    return _to_little_endian(values), end
+
+
+def read_trace(file_path):
+    """
+    Reads a trace file written by L{EventTrace.dump_to_file}.
+    @return: List of L{TraceRecord}, oldest first.
+    @rtype: C{list}
+    @raise: L{RuntimeError} if it is not a valid trace file.
+    """
+    with open(file_path, "rb") as f:
+        data = f.read()
+    if len(data) < _HEADER.size:
+        raise RuntimeError("Not a trace file: %s" % (file_path))
+    magic, num_identifiers, num_records = _HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise RuntimeError("Not a trace file: %s" % (file_path))
+    offset = _HEADER.size
+    identifiers = []
+    for i in range(num_identifiers):
+        if offset + _LENGTH.size > len(data):
+            raise RuntimeError("Truncated trace file")
+        length = _LENGTH.unpack_from(data, offset)[0]
+        offset += _LENGTH.size
+        try:
+            identifiers.append(data[offset:offset + length].decode("utf-8"))
+        except UnicodeDecodeError:
+            raise RuntimeError("Corrupted trace file: %s" % (file_path))
+        offset += length
+    times, offset = _read_array(data, offset, "d", num_records)
+    numbers, offset = _read_array(data, offset, "i", num_records)
+    codes, offset = _read_array(data, offset, "b", num_records)
+    values, offset = _read_array(data, offset, "d", num_records)
+    try:
+        return [TraceRecord(times[i], KIND_VALUES[codes[i]],
+                identifiers[numbers[i]], values[i])
+                for i in range(num_records)]
+    except (KeyError, IndexError):
+        raise RuntimeError("Corrupted trace file: %s" % (file_path))
+
+
+def print_trace(file_path, output=None):
+    """
+    Prints the events of a trace file, with times relative to the first one.
+    @param output: File to write to. The standard output if None.
+    """
+    if output is None:
+        output = sys.stdout
+    records = read_trace(file_path)
+    if len(records) > 0:
+        started = records[0].time
+        for record in records:
+            record.time -= started
+            output.write("%s\n" % (record))
+
+
+if __name__ == "__main__":
+    try:
+        trace_file_path = sys.argv[1]
+    except IndexError:
+        print("Usage: %s <trace file path>" % (sys.argv[0]))
+        sys.exit(1)
+    try:
+        print_trace(trace_file_path)
+    except RuntimeError as e:
+        print("Error: %s" % (e))
+        sys.exit(1)
@@ -0,0 +1,311 @@
+#!/usr/bin/env python
+# -*- coding: utf-8; tab-width: 4; mode: python -*-
+"""
+Cues triggered by incoming OSC messages.
+
+A cue can have a L{Trigger}: it then starts on its own, without the rest of
+its cue sheet, when an OSC message with that address arrives, and one of its
+arguments meets a condition:
+    any: whatever its value
+    equal: it is equal to a value
+    above: it goes above a threshold, such as a sensor crossing it
+    below: it goes below a threshold
+
+The TriggerIndex class keeps the triggers of the cues of a cue sheet by
+address, and within an address, by argument: a dict of the expected values,
+and sorted lists of the thresholds. A message only looks at the triggers of
+its address, and finds those that fire with one lookup, or with a bisection
+between its previous and its new value, whatever the number of triggers.
+
+A trigger is armed unless its cue is running. The first value received at
+an address only sets where it starts from: crossing a threshold needs two.
+The previous values are only kept for the arguments that have an above or
+below trigger, so one added to a new argument of an address that already
+receives messages also waits for a first value, and fires one message later.
+
+Usage:
+    index = TriggerIndex()
+    index.register(osc_server)
+    index.attach(cue_sheet)
+"""
+import bisect
+from twisted.python import log
+from openshow import addresses
+from openshow import events
+
+CONDITION_ANY = "any"
+CONDITION_EQUAL = "equal"
+CONDITION_ABOVE = "above"
+CONDITION_BELOW = "below"
+CONDITIONS = (CONDITION_ANY, CONDITION_EQUAL, CONDITION_ABOVE,
+        CONDITION_BELOW)
+
+
+def _get_key(value):
+    """
+    Returns what a value is compared with: numbers are compared as floats,
+    whatever their type, and so are the strings that are numbers.
+    """
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return value
+
+
+def _get_number(value):
+    """
+    @return: A float, or None if it is not a number.
+    """
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class Trigger(object):
+    """
+    Condition on incoming OSC messages that starts a cue.
+    """
+    __slots__ = ("_address", "_condition", "_value", "_index")
+
+    def __init__(self, address, condition=CONDITION_ANY, value=None, index=0):
+        """
+        @param address: OSC address, without wildcards.
+        @type address: C{str}
+        @param condition: One of the CONDITION_* constants.
+        @param value: Value to be equal to, or threshold to cross.
+        @param index: Which argument of the message is compared.
+        @type index: C{int}
+        @raise: L{RuntimeError} if it is invalid.
+        """
+        if not address.startswith("/") or addresses.is_pattern(address):
+            raise RuntimeError("Invalid trigger address %s" % (address))
+        if condition not in CONDITIONS:
+            raise RuntimeError("Unknown trigger condition %s" % (condition))
+        if condition in (CONDITION_ABOVE, CONDITION_BELOW):
+            value = _get_number(value)
+            if value is None:
+                raise RuntimeError("The %s condition needs a number" % (
+                        condition))
+        self._address = address
+        self._condition = condition
+        self._value = value
+        self._index = int(index)
+
+    def __str__(self):
+        return "Trigger(%s %s %s %s)" % (self._address, self._condition,
+                self._value, self._index)
+
+    def get_address(self):
+        """
+        @rtype: C{str}
+        """
+        return self._address
+
+    def get_condition(self):
+        """
+        @rtype: C{str}
+        """
+        return self._condition
+
+    def get_value(self):
+        return self._value
+
+    def get_index(self):
+        """
+        @rtype: C{int}
+        """
+        return self._index
+
+
+class _AddressTriggers(object):
+    """
+    The triggers of one address.
+    """
+    def __init__(self, trigger_index, address):
+        self._trigger_index = trigger_index
+        self.address = address
+        self.count = 0
+        self._any = [] # cues
+        self._equal = {} # argument index -> {value key -> list of cues}
+        # argument index -> (sorted thresholds, cues in the same order):
+        self._above = {}
+        self._below = {}
+        self._last_values = {} # argument index -> float
+
+    def _get_thresholds(self, trigger):
+        if trigger.get_condition() == CONDITION_ABOVE:
+            by_index = self._above
+        else:
+            by_index = self._below
+        thresholds = by_index.get(trigger.get_index())
+        if thresholds is None:
+            thresholds = ([], [])
+            by_index[trigger.get_index()] = thresholds
+        return thresholds
+
+    def add(self, cue_item, trigger):
+        condition = trigger.get_condition()
+        if condition == CONDITION_ANY:
+            self._any.append(cue_item)
+        elif condition == CONDITION_EQUAL:
+            self._equal.setdefault(trigger.get_index(), {}).setdefault(
+                    _get_key(trigger.get_value()), []).append(cue_item)
+        else:
+            values, cues = self._get_thresholds(trigger)
+            position = bisect.bisect_right(values, trigger.get_value())
+            values.insert(position, trigger.get_value())
+            cues.insert(position, cue_item)
+        self.count += 1
+
+    def remove(self, cue_item, trigger):
+        condition = trigger.get_condition()
+        if condition == CONDITION_ANY:
+            self._any.remove(cue_item)
+        elif condition == CONDITION_EQUAL:
+            by_value = self._equal[trigger.get_index()]
+            key = _get_key(trigger.get_value())
+            by_value[key].remove(cue_item)
+            if not by_value[key]:
+                del by_value[key]
+        else:
+            values, cues = self._get_thresholds(trigger)
+            first = bisect.bisect_left(values, trigger.get_value())
+            last = bisect.bisect_right(values, trigger.get_value())
+            position = first + cues[first:last].index(cue_item)
+            del values[position]
+            del cues[position]
+        self.count -= 1
+
+    def handle(self, pattern, args):
+        """
+        Starts the cues whose condition the arguments of a message meet.
+        """
+        fired = list(self._any)
+        for index, by_value in self._equal.items():
+            if index < len(args):
+                fired.extend(by_value.get(_get_key(args[index]), ()))
+        if self._above or self._below:
+            for index in set(self._above) | set(self._below):
+                if index >= len(args):
+                    continue
+                value = _get_number(args[index])
+                if value is None:
+                    continue
+                previous = self._last_values.get(index)
+                self._last_values[index] = value
+                if previous is None:
+                    continue
+                if value > previous and index in self._above:
+                    # Thresholds in [previous, value):
+                    values, cues = self._above[index]
+                    fired.extend(cues[bisect.bisect_left(values, previous):
+                            bisect.bisect_left(values, value)])
+                elif value < previous and index in self._below:
+                    # Thresholds in (value, previous]:
+                    values, cues = self._below[index]
+                    fired.extend(cues[bisect.bisect_right(values, value):
+                            bisect.bisect_right(values, previous)])
+        for cue_item in fired:
+            self._trigger_index._fire(cue_item)
+
+
+class TriggerIndex(object):
+    """
+    Starts the cues of a cue sheet when the OSC messages of their triggers
+    arrive.
+    """
+    def __init__(self):
+        self._cue_sheet = None
+        self._subscription = None
+        self._server = None
+        self._addresses = {} # address -> _AddressTriggers
+        self._indexed = {} # cue -> trigger it is indexed with
+
+    def register(self, server):
+        """
+        Receives the messages of a server.
+        @type server: L{openshow.remote.OscServer}
+        """
+        self._server = server
+        for address, entry in self._addresses.items():
+            server.add_handler(address, entry.handle)
+
+    def attach(self, cue_sheet):
+        """
+        Starts to index the triggers of the cues of a cue sheet, instead of
+        those of the one it was attached to, if any.
+        @type cue_sheet: L{openshow.cue.CueSheet}
+        """
+        self.detach()
+        self._cue_sheet = cue_sheet
+        self._subscription = cue_sheet.get_event_bus().subscribe(
+                self._cue_changed_cb, [events.EVENT_CHANGED,
+                events.EVENT_ADDED, events.EVENT_REMOVED])
+        for cue_item in cue_sheet.get_cues():
+            self._index(cue_item)
+
+    def detach(self):
+        if self._cue_sheet is not None:
+            self._cue_sheet.get_event_bus().unsubscribe(self._subscription)
+            self._cue_sheet = None
+            self._subscription = None
+            for cue_item in list(self._indexed.keys()):
+                self._unindex(cue_item)
+
+    def get_trigger_count(self):
+        """
+        Returns how many cues have a trigger.
+        @rtype: C{int}
+        """
+        return len(self._indexed)
+
+    def handle_message(self, address, args):
+        """
+        Handles an OSC message that does not come from the server.
+        @param address: Address, without wildcards.
+        @type address: C{str}
+        @type args: C{list}
+        """
+        entry = self._addresses.get(address)
+        if entry is not None:
+            entry.handle(address, args)
+
+    def _cue_changed_cb(self, event):
+        if event.kind == events.EVENT_REMOVED:
+            self._unindex(event.cue)
+        elif self._indexed.get(event.cue) is not event.cue.get_trigger():
+            self._unindex(event.cue)
+            self._index(event.cue)
+
+    def _index(self, cue_item):
+        trigger = cue_item.get_trigger()
+        if trigger is None:
+            return
+        address = trigger.get_address()
+        entry = self._addresses.get(address)
+        if entry is None:
+            entry = _AddressTriggers(self, address)
+            self._addresses[address] = entry
+            if self._server is not None:
+                self._server.add_handler(address, entry.handle)
+        entry.add(cue_item, trigger)
+        self._indexed[cue_item] = trigger
+
+    def _unindex(self, cue_item):
+        trigger = self._indexed.pop(cue_item, None)
+        if trigger is None:
+            return
+        address = trigger.get_address()
+        entry = self._addresses[address]
+        entry.remove(cue_item, trigger)
+        if entry.count == 0:
+            del self._addresses[address]
+            if self._server is not None:
+                self._server.remove_handler(address, entry.handle)
+
+    def _fire(self, cue_item):
+        if not cue_item.is_running(): # armed
+            d = cue_item.go()
+            d.addErrback(log.err, "Cue %s triggered by OSC failed" % (
+                    cue_item.get_identifier()))
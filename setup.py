@@ -20,7 +20,7 @@ setup(
         "scripts/openshow", 
         ],
     license="LGPL",
-    packages = ["openshow", "openshow/test"],
+    packages = ["openshow", "openshow/actions", "openshow/test"],
     long_description = """OpenShow is a show control app to trigger theatrical cues at a specific time..""",
     classifiers = [
         "Framework :: Twisted",